@@ -7,13 +7,16 @@ from flask_cors import CORS
 from config import Config
 from auth import require_auth
 from db import get_db
+from json_provider import install_json_provider
+from compression import install_compression
 
 # Import blueprints
 from routes.plaid import bp as plaid_bp
 from routes.score import bp as score_bp
 from routes.lender import bp as lender_bp
-from routes.data import bp as data_bp
+from routes.data import NEXT_CURSOR_HEADER, bp as data_bp
 from routes.sandbox_loader import bp as sandbox_loader_bp
+from routes.jobs import bp as jobs_bp
 
 # Configure logging
 logging.basicConfig(
@@ -25,12 +28,23 @@ logger = logging.getLogger(__name__)
 # Create Flask app
 app = Flask(__name__)
 
+# Use orjson for responses when available (stdlib fallback)
+install_json_provider(app)
+
+# gzip/brotli responses when COMPRESSION_ENABLED is set
+install_compression(app)
+
 # Configure CORS for localhost frontend ports
+# (asgi_app.py applies the same policy to its async routes)
+CORS_ORIGINS = ["http://localhost:3000", "http://localhost:5173", "http://localhost:8000"]
+CORS_METHODS = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
+CORS_EXPOSE_HEADERS = [NEXT_CURSOR_HEADER]
 CORS(
     app,
-    origins=["http://localhost:3000", "http://localhost:5173", "http://localhost:8000"],
+    origins=CORS_ORIGINS,
     supports_credentials=True,
-    methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"]
+    methods=CORS_METHODS,
+    expose_headers=CORS_EXPOSE_HEADERS
 )
 
 
@@ -43,19 +57,66 @@ except ValueError as e:
 
 # Create MongoDB indexes on startup
 def ensure_indexes():
-    """Create MongoDB indexes for optimal query performance."""
+    """Create MongoDB indexes and verify the main query shapes use them."""
     try:
         db = get_db()
         
-        # Indexes for sandbox storage (using user_id field)
-        from services.sandbox_storage_service import ensure_indexes as ensure_sandbox_indexes
-        ensure_sandbox_indexes(db)
+        # All index declarations live in the index manager
+        from services.index_manager import run_index_self_check
+        run_index_self_check(db)
         
     except Exception as e:
         logger.warning(f"Failed to create MongoDB indexes (non-fatal): {e}")
 
-# Create indexes
-ensure_indexes()
+# Start background job workers (sandbox loads, Plaid syncs)
+def start_job_workers():
+    """Start the in-process job worker pool (JOB_WORKERS threads, 0 to disable)."""
+    try:
+        from services.job_queue import start_workers
+        start_workers(get_db())
+    except Exception as e:
+        logger.warning(f"Failed to start job workers (non-fatal): {e}")
+
+# Periodically refresh stale Plaid items in the background (REFRESH_SCHEDULER_ENABLED)
+def start_refresh_scheduler():
+    """Start the Plaid refresh scheduler; only one process schedules at a time."""
+    try:
+        from services.refresh_scheduler import start_refresh_scheduler as start_scheduler
+        start_scheduler(get_db())
+    except Exception as e:
+        logger.warning(f"Failed to start refresh scheduler (non-fatal): {e}")
+
+def start_background_services():
+    """Start this process's background threads.
+
+    Checks whether the legacy key migration (`python migrate.py
+    --legacy-user-keys`) has completed, then starts the job workers and the
+    refresh scheduler.
+    """
+    try:
+        # Reads match userId as well until the migration is recorded as complete
+        from services.repository import watch_legacy_key_migration
+        watch_legacy_key_migration(get_db())
+    except Exception as e:
+        logger.warning(f"Failed to check user key migration state (non-fatal): {e}")
+    start_job_workers()
+    start_refresh_scheduler()
+
+def stop_background_services(timeout=None):
+    """Stop scheduling and claiming jobs, waiting up to timeout for in-flight jobs.
+
+    Jobs still running after that are reclaimed by another worker once their
+    lease (JOB_LEASE_SECONDS) expires.
+    """
+    from services.job_queue import stop_workers
+    from services.refresh_scheduler import stop_refresh_scheduler
+    stop_refresh_scheduler(timeout)
+    stop_workers(timeout)
+
+# Under gunicorn (gunicorn.conf.py sets DEFER_STARTUP) these run per worker after fork instead
+if not Config.DEFER_STARTUP:
+    ensure_indexes()
+    start_background_services()
 
 # Register blueprints
 app.register_blueprint(plaid_bp)
@@ -63,6 +124,7 @@ app.register_blueprint(score_bp)
 app.register_blueprint(lender_bp)
 app.register_blueprint(data_bp)
 app.register_blueprint(sandbox_loader_bp)
+app.register_blueprint(jobs_bp)
 
 
 @app.route("/", methods=["GET"])
@@ -75,9 +137,11 @@ def root():
         "GET /api/me": "Get current user info (auth required)",
         "POST /api/plaid/link-token": "Create Plaid link token (auth required) - Uses REST API",
         "POST /api/plaid/exchange": "Exchange Plaid public token (auth required) - Uses REST API",
-        "POST /api/plaid/transactions/sync": "Sync transactions from Plaid (auth required) - Uses REST API",
-        "POST /api/plaid/balances/sync": "Sync balances from Plaid (auth required) - Uses REST API",
+        "POST /api/plaid/transactions/sync": "Queue a transactions sync from Plaid (auth required) - 202 + job_id",
+        "POST /api/plaid/balances/sync": "Queue a balances sync from Plaid (auth required) - 202 + job_id",
         "POST /api/plaid/income/sync": "Sync income from Plaid (auth required) - May not be available",
+        "POST /api/sandbox/load": "Queue a sandbox file load (auth required) - 202 + job_id",
+        "GET /api/jobs/<job_id>": "Background job status and result (auth required)",
         "GET /api/transactions": "Get stored transactions (auth required)",
         "GET /api/balances": "Get stored balances (auth required)",
         "GET /api/income": "Get stored income (auth required)",
@@ -0,0 +1,348 @@
+"""ASGI entrypoint: async handlers for the I/O-bound routes, Flask for the rest.
+
+Under WSGI every request holds a thread while it waits on MongoDB or Plaid.
+This app serves the hot I/O-bound routes as Quart coroutines instead. They
+use Motor for MongoDB and httpx (plaid_post_async) for Plaid, so one worker
+process can hold hundreds of concurrent slow calls:
+
+- GET /api/data/accounts, /api/data/summary (with the same ETag handling)
+- GET /api/data/transactions, /api/transactions (keyset pages)
+- GET /api/jobs/<job_id>
+- POST /api/plaid/link-token, /api/plaid/exchange
+- POST /api/plaid/transactions/sync, /api/plaid/balances/sync (enqueue only;
+  the sync itself runs on the job workers, as under WSGI)
+
+The handlers call the same helpers as the blueprints (auth, ETags, query
+parsing, response bodies from routes.responses and the route modules), and
+the Quart app installs the same JSON provider, compression hook and CORS
+policy, so responses match the Flask app. Every other route, including the Gemini routes (already capped
+by GEMINI_MAX_CONCURRENCY) and CORS preflights, is passed to the Flask app
+through asgiref's WsgiToAsgi, which runs it on a thread pool. Without
+Quart, Motor or httpx installed, the whole API is served that way.
+
+Usage (from backend/):
+    pip install -r requirements.txt  # quart, quart-cors, motor, httpx, asgiref, hypercorn
+    hypercorn asgi_app:app --bind 0.0.0.0:5000 --workers 4
+"""
+import asyncio
+import logging
+from functools import wraps
+
+from app import (
+    CORS_EXPOSE_HEADERS,
+    CORS_METHODS,
+    CORS_ORIGINS,
+    app as flask_app,
+    stop_background_services,
+)
+from auth import auth_failure, authenticate_async, get_jwks
+from compression import compress_bytes, install_compression, mark_encoded, response_encoding
+from config import Config
+from db import MOTOR_AVAILABLE, close_async_client as close_motor_client, get_async_db
+from http_cache import is_not_modified, request_etag, set_cache_headers
+from json_provider import install_json_provider
+from routes.data import summary_response, transactions_page_args, transactions_page_response
+from routes.jobs import job_accepted, job_status_response
+from routes.plaid import (
+    exchange_response,
+    exchanged_item,
+    link_token_response,
+    missing_public_token,
+    plaid_not_connected,
+)
+from routes.responses import error, invalid_token, server_error
+from services import repository
+from services.data_version_service import get_data_version_async
+from services.ingest_jobs import PLAID_BALANCES_SYNC, PLAID_TRANSACTIONS_SYNC
+from services.job_queue import enqueue_async, get_job_async
+from services.plaid_client import (
+    HTTPX_AVAILABLE,
+    close_async_client as close_http_client,
+    get_async_client,
+    link_token_request,
+    plaid_post_async,
+)
+from services.summary_service import get_summary_async
+
+logger = logging.getLogger(__name__)
+
+# Try to import quart - make it optional (without it every route goes to Flask)
+QUART_AVAILABLE = False
+try:
+    from quart import Quart, g, make_response, request
+    from quart.wrappers.response import DataBody
+    from quart_cors import cors
+    QUART_AVAILABLE = True
+except ImportError:
+    logger.info("quart not available, serving the Flask app only. Install with: pip install quart quart-cors")
+
+# Try to import asgiref - required to serve the Flask routes over ASGI
+ASGIREF_AVAILABLE = False
+try:
+    from asgiref.wsgi import WsgiToAsgi
+    ASGIREF_AVAILABLE = True
+except ImportError:
+    logger.warning("asgiref not available, asgi_app cannot serve the Flask routes. Install with: pip install asgiref")
+
+# Longest wait for in-flight jobs when the server shuts down
+DRAIN_TIMEOUT_SECONDS = 30
+
+ASYNC_ROUTES_AVAILABLE = QUART_AVAILABLE and MOTOR_AVAILABLE and HTTPX_AVAILABLE
+
+
+def require_auth_async(f):
+    """require_auth for coroutines: verifies the JWT and sets g.user.
+
+    The JWKS is fetched at startup; if that failed, authenticate_async
+    fetches it off the event loop.
+    """
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        try:
+            g.user = await authenticate_async(request)
+        except Exception as e:
+            return auth_failure(e)
+        if not g.user.get("sub"):
+            return invalid_token()
+        return await f(*args, **kwargs)
+    return decorated
+
+
+def conditional_get_async(f):
+    """http_cache.conditional_get for coroutines (apply below require_auth_async)."""
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        user_id = g.user["sub"]
+        try:
+            version = await get_data_version_async(get_async_db(), user_id)
+            etag = request_etag(request, user_id, version)
+        except Exception as e:
+            logger.warning(f"Skipping conditional GET for {request.path}: {e}")
+            return await f(*args, **kwargs)
+
+        if is_not_modified(request, etag):
+            response = await make_response("", 304)
+        else:
+            response = await make_response(await f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        set_cache_headers(response, etag)
+        return response
+    return decorated
+
+
+async def compress_async_response(response):
+    """compression.compress_response for Quart responses (in-memory bodies only)."""
+    if not isinstance(response.response, DataBody):
+        return response
+    encoding = response_encoding(response, request)
+    if encoding is None:
+        return response
+    data = await response.get_data()
+    if len(data) < Config.COMPRESSION_MIN_SIZE:
+        return response
+    response.set_data(compress_bytes(data, encoding))
+    mark_encoded(response, encoding)
+    return response
+
+
+def create_async_app():
+    """Build the Quart app serving the async routes.
+
+    It shares the Flask app's JSON provider, compression and CORS policy, and
+    its views return the same (body, status[, headers]) tuples as the
+    blueprints, built by the same helpers.
+    """
+    async_app = Quart(__name__)
+    install_json_provider(async_app)
+    install_compression(async_app, compress_async_response)
+    # Preflights never reach Quart (the dispatcher sends OPTIONS to Flask)
+    async_app = cors(
+        async_app,
+        allow_origin=CORS_ORIGINS,
+        allow_credentials=True,
+        allow_methods=CORS_METHODS,
+        expose_headers=CORS_EXPOSE_HEADERS
+    )
+
+    @async_app.before_serving
+    async def startup():
+        # Fetch the JWKS once up front so no request blocks the loop on it
+        try:
+            await asyncio.to_thread(get_jwks)
+        except Exception as e:
+            logger.warning(f"Could not prefetch JWKS (will retry on first request): {e}")
+        get_async_db()
+        get_async_client()
+
+    @async_app.after_serving
+    async def shutdown():
+        await close_http_client()
+        close_motor_client()
+        await asyncio.to_thread(stop_background_services, DRAIN_TIMEOUT_SECONDS)
+
+    # ---------------------- Data ----------------------
+    @async_app.route("/api/data/accounts", methods=["GET"])
+    @require_auth_async
+    @conditional_get_async
+    async def get_data_accounts():
+        try:
+            return await repository.find_accounts_async(get_async_db(), g.user["sub"]), 200
+        except Exception as e:
+            return server_error("fetching accounts", e)
+
+    @async_app.route("/api/data/summary", methods=["GET"])
+    @require_auth_async
+    @conditional_get_async
+    async def get_data_summary():
+        try:
+            return summary_response(await get_summary_async(get_async_db(), g.user["sub"]))
+        except Exception as e:
+            return server_error("computing summary", e)
+
+    async def transactions_page(default_limit: int):
+        try:
+            page = transactions_page_args(request.args, default_limit)
+            result, next_cursor = await repository.find_transactions_page_async(
+                get_async_db(), g.user["sub"], **page
+            )
+        except ValueError as e:
+            return error("invalid_request", str(e), 400)
+        except Exception as e:
+            return server_error("fetching transactions", e)
+        return transactions_page_response(result, next_cursor)
+
+    @async_app.route("/api/data/transactions", methods=["GET"])
+    @require_auth_async
+    async def get_data_transactions():
+        return await transactions_page(Config.TRANSACTIONS_PAGE_DEFAULT)
+
+    @async_app.route("/api/transactions", methods=["GET"])
+    @require_auth_async
+    async def get_transactions():
+        return await transactions_page(100)
+
+    # ---------------------- Jobs ----------------------
+    @async_app.route("/api/jobs/<job_id>", methods=["GET"])
+    @require_auth_async
+    async def get_job_status(job_id: str):
+        try:
+            job = await get_job_async(get_async_db(), g.user["sub"], job_id)
+        except Exception as e:
+            return server_error(f"fetching job {job_id}", e)
+        return job_status_response(job, job_id)
+
+    # ---------------------- Plaid ----------------------
+    @async_app.route("/api/plaid/link-token", methods=["POST"])
+    @require_auth_async
+    async def get_link_token():
+        try:
+            link_token_resp, err = await plaid_post_async(
+                "/link/token/create", link_token_request(g.user["sub"])
+            )
+        except Exception as e:
+            return server_error("creating link token", e, code="plaid_error")
+        return link_token_response(link_token_resp, err)
+
+    @async_app.route("/api/plaid/exchange", methods=["POST"])
+    @require_auth_async
+    async def exchange_token():
+        user_id = g.user["sub"]
+        data = await request.get_json(silent=True)
+        if not data or "public_token" not in data:
+            return missing_public_token()
+
+        try:
+            exchange_resp, err = await plaid_post_async(
+                "/item/public_token/exchange", {"public_token": data["public_token"]}
+            )
+            item, failure = exchanged_item(exchange_resp, err)
+            if failure:
+                return failure
+            access_token, item_id = item
+            await repository.save_plaid_item_async(get_async_db(), user_id, access_token, item_id)
+        except Exception as e:
+            return server_error("exchanging Plaid token", e, code="plaid_error")
+        logger.info(f"Stored Plaid access token for user {user_id}, item_id: {item_id}")
+        return exchange_response(item_id)
+
+    async def enqueue_sync(job_type: str, action: str):
+        user_id = g.user["sub"]
+        try:
+            db = get_async_db()
+            item = await repository.get_plaid_item_async(db, user_id)
+            if not item or "access_token" not in item:
+                return plaid_not_connected()
+            # Fetch and store on a job worker; repeat clicks join the active job
+            return job_accepted(await enqueue_async(db, user_id, job_type))
+        except Exception as e:
+            return server_error(action, e, code="plaid_error")
+
+    @async_app.route("/api/plaid/transactions/sync", methods=["POST"])
+    @require_auth_async
+    async def sync_transactions():
+        return await enqueue_sync(PLAID_TRANSACTIONS_SYNC, "syncing transactions")
+
+    @async_app.route("/api/plaid/balances/sync", methods=["POST"])
+    @require_auth_async
+    async def sync_balances():
+        return await enqueue_sync(PLAID_BALANCES_SYNC, "syncing balances")
+
+    return async_app
+
+
+class AsgiDispatcher:
+    """Sends requests for the async routes to Quart and everything else to Flask.
+
+    Lifespan events go to Quart when it is in use (its before/after_serving
+    hooks open the clients and drain jobs); otherwise shutdown still drains
+    the job workers here.
+    """
+
+    def __init__(self, async_app, fallback):
+        self.async_app = async_app
+        self.fallback = fallback
+        self._adapter = async_app.url_map.bind("localhost") if async_app is not None else None
+
+    def _is_async_route(self, scope) -> bool:
+        if self._adapter is None or scope["method"] == "OPTIONS":
+            return False
+        try:
+            self._adapter.match(scope["path"], method=scope["method"])
+            return True
+        except Exception:
+            # NotFound / MethodNotAllowed: not ours
+            return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            if self.async_app is not None:
+                await self.async_app(scope, receive, send)
+            else:
+                await self._lifespan(receive, send)
+        elif scope["type"] == "http" and self._is_async_route(scope):
+            await self.async_app(scope, receive, send)
+        else:
+            await self.fallback(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await asyncio.to_thread(stop_background_services, DRAIN_TIMEOUT_SECONDS)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+if not ASGIREF_AVAILABLE:
+    raise ImportError("asgi_app requires asgiref to serve the Flask routes. Install with: pip install asgiref")
+
+if ASYNC_ROUTES_AVAILABLE:
+    app = AsgiDispatcher(create_async_app(), WsgiToAsgi(flask_app))
+    logger.info("ASGI app: async Mongo/Plaid routes on Quart, other routes on Flask")
+else:
+    app = AsgiDispatcher(None, WsgiToAsgi(flask_app))
+    logger.info("ASGI app: serving the Flask app (install quart, motor and httpx for async routes)")
@@ -1,8 +1,9 @@
 """Auth0 JWT verification middleware."""
+import asyncio
 import logging
 import requests
 from functools import wraps
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 import jwt
 from flask import request, g, jsonify
 from config import Config
@@ -110,7 +111,7 @@ def get_token_auth_header(request) -> str:
 
 
 def get_jwks() -> Dict:
-    """Fetch and cache JWKS from Auth0.
+    """Fetch and cache JWKS from Auth0 (or AUTH0_JWKS_URL if set).
     
     Returns:
         JWKS dictionary
@@ -118,6 +119,10 @@ def get_jwks() -> Dict:
     global _jwks_cache
     if _jwks_cache is None:
         jwks_url = f"https://{Config.AUTH0_DOMAIN}/.well-known/jwks.json"
+        if Config.AUTH0_JWKS_URL:
+            # Config.validate() refuses the override outside development/test
+            logger.warning(f"Using JWKS from AUTH0_JWKS_URL override: {Config.AUTH0_JWKS_URL}")
+            jwks_url = Config.AUTH0_JWKS_URL
         try:
             response = requests.get(jwks_url, timeout=10)
             response.raise_for_status()
@@ -325,6 +330,56 @@ def verify_jwt(token: str) -> Dict:
         raise ValueError(f"Token verification failed: {e}")
 
 
+def auth_error_body(code: str, message: str) -> Dict:
+    """JSON body of the 401 returned when authentication fails."""
+    return {
+        "error": {
+            "code": code,
+            "message": message,
+            "help": "This endpoint requires authentication. Provide an Auth0 JWT token in the Authorization header: Authorization: Bearer <your-token>",
+            "public_endpoints": [
+                "GET / - API documentation",
+                "GET /health - Health check"
+            ],
+            "documentation": "See GET / for full API documentation"
+        }
+    }
+
+
+def authenticate(req) -> Dict:
+    """Verify the request's Bearer token and return its decoded payload.
+
+    Shared by require_auth and the async routes in asgi_app.py.
+
+    Raises:
+        ValueError: If the header is missing/malformed or the token is invalid
+    """
+    return verify_jwt(get_token_auth_header(req))
+
+
+async def authenticate_async(req) -> Dict:
+    """authenticate() for coroutines (the async routes in asgi_app.py).
+
+    If the JWKS is not cached yet (e.g. the startup prefetch failed), it is
+    fetched on a worker thread so a slow Auth0 response never blocks the
+    event loop. Verification itself is CPU-only.
+
+    Raises:
+        ValueError: If the header is missing/malformed or the token is invalid
+    """
+    if _jwks_cache is None:
+        await asyncio.to_thread(get_jwks)
+    return authenticate(req)
+
+
+def auth_failure(e: Exception) -> Tuple[Dict, int]:
+    """(body, status) of the 401 for an exception raised during authentication."""
+    if isinstance(e, ValueError):
+        return auth_error_body("authentication_failed", str(e)), 401
+    logger.error(f"Authentication error: {e}")
+    return auth_error_body("authentication_error", "Authentication failed"), 401
+
+
 def require_auth(f):
     """Decorator to require JWT authentication.
     
@@ -334,37 +389,10 @@ def require_auth(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         try:
-            token = get_token_auth_header(request)
-            payload = verify_jwt(token)
-            g.user = payload
+            g.user = authenticate(request)
             return f(*args, **kwargs)
-        except ValueError as e:
-            return jsonify({
-                "error": {
-                    "code": "authentication_failed",
-                    "message": str(e),
-                    "help": "This endpoint requires authentication. Provide an Auth0 JWT token in the Authorization header: Authorization: Bearer <your-token>",
-                    "public_endpoints": [
-                        "GET / - API documentation",
-                        "GET /health - Health check"
-                    ],
-                    "documentation": "See GET / for full API documentation"
-                }
-            }), 401
         except Exception as e:
-            logger.error(f"Authentication error: {e}")
-            return jsonify({
-                "error": {
-                    "code": "authentication_error",
-                    "message": "Authentication failed",
-                    "help": "This endpoint requires authentication. Provide an Auth0 JWT token in the Authorization header: Authorization: Bearer <your-token>",
-                    "public_endpoints": [
-                        "GET / - API documentation",
-                        "GET /health - Health check"
-                    ],
-                    "documentation": "See GET / for full API documentation"
-                }
-            }), 401
+            body, status = auth_failure(e)
+            return jsonify(body), status
     
     return decorated_function
-
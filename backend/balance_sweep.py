@@ -0,0 +1,34 @@
+"""Refresh balances for every connected Plaid item in one batch sweep.
+
+Usage:
+    python balance_sweep.py [--workers N]
+
+Prints the batch summary (items, succeeded, failed, accounts, write counts)
+and the per-item errors as JSON.
+"""
+import argparse
+import json
+import logging
+
+from config import Config
+from db import get_db
+from services.balance_batch_service import refresh_all_balances
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Refresh balances for all connected Plaid items")
+    parser.add_argument("--workers", type=int, default=Config.BALANCE_BATCH_WORKERS,
+                        help="Concurrent Plaid calls (default: BALANCE_BATCH_WORKERS)")
+    args = parser.parse_args()
+
+    result = refresh_all_balances(get_db(), max_workers=args.workers)
+    print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
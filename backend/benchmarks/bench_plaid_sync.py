@@ -0,0 +1,104 @@
+"""Benchmark Plaid sync throughput against the local Plaid emulator.
+
+Starts plaid_emulator.py in-process, points the Plaid client at it, and runs
+`--items` syncs (transactions + balances, as the plaid_refresh job does) at
+each concurrency level. Reports syncs/second and per-sync latency
+percentiles, plus how many calls the emulator failed on purpose. With
+--ingest the fetched data is also written through the ingest coordinator
+(needs MONGODB_URI; uses synthetic user IDs under "bench|").
+
+Usage (from backend/):
+    python benchmarks/bench_plaid_sync.py [--items 200] [--concurrency 1,4,16]
+        [--latency-ms 150] [--error-rate 0.02] [--transactions 500] [--ingest]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from config import Config  # noqa: E402
+from plaid_emulator import PlaidEmulator, start_emulator  # noqa: E402
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def run_level(items: int, concurrency: int, ingest: bool) -> dict:
+    # Imported after PLAID_BASE_URL is set so the client targets the emulator
+    from services.scoring_service import get_balance, get_transactions
+
+    db = None
+    if ingest:
+        from db import get_db
+        from services.ingest_coordinator import ingest_plaid_balances, ingest_plaid_transactions
+        db = get_db()
+
+    def sync(i: int):
+        started = time.perf_counter()
+        token = f"access-sandbox-bench-{i}"
+        transactions, err = get_transactions(token)
+        ok = err is None
+        balances, err = get_balance(token)
+        ok = ok and err is None
+        if ingest and ok:
+            user_id = f"bench|{i}"
+            ingest_plaid_transactions(db, user_id, transactions)
+            ingest_plaid_balances(db, user_id, balances.get("accounts", []))
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(sync, range(items)))
+    elapsed = time.perf_counter() - started
+    latencies = [latency for latency, _ in results]
+    return {
+        "concurrency": concurrency,
+        "syncs_per_sec": items / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "failed": sum(1 for _, ok in results if not ok),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated worker counts")
+    parser.add_argument("--latency-ms", type=float, default=150)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--transactions", type=int, default=None, help="Transactions per item")
+    parser.add_argument("--ingest", action="store_true", help="Also write through the ingest coordinator")
+    args = parser.parse_args()
+
+    emulator = PlaidEmulator(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        transactions=args.transactions,
+        seed=42,
+    )
+    server = start_emulator(emulator)
+    Config.PLAID_BASE_URL = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"Plaid emulator at {Config.PLAID_BASE_URL}: {len(emulator.transactions)} transactions/item, "
+          f"latency {args.latency_ms}+/-{args.jitter_ms}ms, error rate {args.error_rate}")
+
+    print(f"\n{'workers':>8} {'syncs/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'mean ms':>10} {'failed':>8}")
+    for level in (int(c) for c in args.concurrency.split(",") if c.strip()):
+        r = run_level(args.items, level, args.ingest)
+        print(f"{r['concurrency']:>8} {r['syncs_per_sec']:>10.1f} {r['p50_ms']:>10.1f} "
+              f"{r['p95_ms']:>10.1f} {r['mean_ms']:>10.1f} {r['failed']:>8}")
+
+    print(f"\nEmulator stats: {emulator.stats()}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
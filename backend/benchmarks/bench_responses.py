@@ -0,0 +1,150 @@
+"""Benchmark JSON response serialization and compression for the data endpoints.
+
+Compares Flask's stock provider (stdlib json, sorted keys) with the app's
+provider from json_provider.py on payloads shaped like the responses of
+/api/data/transactions, /api/data/accounts and /api/data/summary, built from
+sandbox_output.json. Then reports the bytes on the wire with each
+content-coding the compression layer can apply, and the time it takes.
+
+Usage (from backend/):
+    python benchmarks/bench_responses.py [--rows 500] [--repeat 200]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+from json_provider import StdlibJSONProvider, ORJSON_AVAILABLE, get_json_provider_class  # noqa: E402
+from compression import BROTLI_AVAILABLE, compress_bytes  # noqa: E402
+
+SANDBOX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "sandbox_output.json")
+
+
+def build_payloads(rows: int) -> dict:
+    """Endpoint-shaped payloads, with transactions repeated up to `rows`."""
+    with open(SANDBOX_PATH, "r") as f:
+        sandbox = json.load(f)
+
+    now = datetime.utcnow().isoformat()
+    raw_txns = sandbox["get_transactions"]["transactions"]
+    transactions = []
+    for i in range(rows):
+        txn = dict(raw_txns[i % len(raw_txns)])
+        txn["transaction_id"] = f"{txn.get('transaction_id')}-{i}"
+        transactions.append({
+            "user_id": "auth0|benchmark",
+            "transaction_id": txn["transaction_id"],
+            "account_id": txn.get("account_id"),
+            "date": txn.get("date"),
+            "authorized_date": txn.get("authorized_date"),
+            "name": txn.get("name"),
+            "amount": txn.get("amount"),
+            "category": txn.get("category"),
+            "merchant_name": txn.get("merchant_name"),
+            "pending": txn.get("pending", False),
+            "payment_channel": txn.get("payment_channel"),
+            "raw": txn,
+            "updatedAt": now,
+        })
+
+    accounts = [
+        {"user_id": "auth0|benchmark", **acc, "updatedAt": now}
+        for acc in sandbox["get_accounts"]["accounts"]
+    ]
+    summary = {
+        "ok": True,
+        "totals": {"balance": 12345.67, "spend30d": 2345.6, "income30d": 4000.0},
+        "monthlySpend": [{"month": f"2025-{m:02d}", "spend": 1000.0 + m} for m in range(1, 13)],
+        "topCategories": [{"category": f"CATEGORY_{i}", "amount": 100.0 * i} for i in range(5)],
+    }
+    return {
+        f"/api/data/transactions (limit={rows})": transactions,
+        "/api/data/accounts": accounts,
+        "/api/data/summary": summary,
+    }
+
+
+def time_provider(provider_class, payload, repeat: int) -> tuple:
+    """Median and p95 milliseconds to build a response, plus body size in bytes."""
+    app = Flask("bench")
+    app.json = provider_class(app)
+    samples = []
+    with app.app_context():
+        size = len(app.json.response(payload).get_data())
+        for _ in range(repeat):
+            start = time.perf_counter()
+            app.json.response(payload).get_data()
+            samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1], size
+
+
+def time_compression(body: bytes, encoding: str, repeat: int) -> tuple:
+    """Median milliseconds to compress body, plus the compressed size in bytes."""
+    samples = []
+    size = len(compress_bytes(body, encoding))
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compress_bytes(body, encoding)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), size
+
+
+def report_bandwidth(payloads: dict, repeat: int) -> None:
+    """Bytes on the wire per content-coding for each endpoint payload."""
+    encodings = ["gzip"] + (["br"] if BROTLI_AVAILABLE else [])
+    if not BROTLI_AVAILABLE:
+        print("brotli not installed; only measuring gzip (pip install Brotli)\n")
+
+    app = Flask("bench")
+    app.json = get_json_provider_class()(app)
+    print("Bandwidth (body size per Content-Encoding)")
+    with app.app_context():
+        for endpoint, payload in payloads.items():
+            body = app.json.response(payload).get_data()
+            print(endpoint)
+            print(f"  {'identity':<8} {len(body) / 1024:8.1f} KB")
+            for encoding in encodings:
+                median, size = time_compression(body, encoding, max(1, repeat // 10))
+                saved = 100 * (1 - size / len(body))
+                print(f"  {encoding:<8} {size / 1024:8.1f} KB   {saved:5.1f}% saved   "
+                      f"compress median {median:8.3f} ms")
+            print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500, help="transactions in the listing payload")
+    parser.add_argument("--repeat", type=int, default=200, help="timed iterations per case")
+    args = parser.parse_args()
+
+    providers = [("flask default", DefaultJSONProvider), ("stdlib (app)", StdlibJSONProvider)]
+    if ORJSON_AVAILABLE:
+        providers.append(("orjson (app)", get_json_provider_class()))
+    else:
+        print("orjson not installed; only comparing stdlib providers (pip install orjson)\n")
+
+    payloads = build_payloads(args.rows)
+    for endpoint, payload in payloads.items():
+        print(endpoint)
+        baseline = None
+        for name, provider_class in providers:
+            median, p95, size = time_provider(provider_class, payload, args.repeat)
+            baseline = baseline or median
+            print(f"  {name:<14} median {median:8.3f} ms   p95 {p95:8.3f} ms   "
+                  f"{size / 1024:8.1f} KB   {baseline / median:5.2f}x")
+        print()
+
+    report_bandwidth(payloads, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Opt-in response compression (gzip, or brotli when available).
+
+Buffered responses are compressed in one shot once they reach
+COMPRESSION_MIN_SIZE. Streamed responses (NDJSON export, SSE) are wrapped in
+an incremental compressor that flushes after every chunk, so clients still
+receive each chunk as soon as it is produced.
+"""
+import logging
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from flask import request
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Try to import brotli - make it optional
+BROTLI_AVAILABLE = False
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    logger.info("brotli not available, responses will only be gzip-compressed. Install with: pip install Brotli")
+
+# Media types worth compressing
+COMPRESSIBLE_MIMETYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "text/event-stream",
+    "text/html",
+    "text/plain",
+    "text/csv",
+)
+
+
+class _Encoder:
+    """Incremental compressor for one response body."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=Config.COMPRESSION_BROTLI_QUALITY)
+        else:
+            # wbits=31 -> gzip container
+            self._gz = zlib.compressobj(Config.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._br.process(data)
+        return self._gz.compress(data)
+
+    def flush(self) -> bytes:
+        """Emit everything compressed so far without ending the stream."""
+        if self.encoding == "br":
+            return self._br.flush()
+        return self._gz.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._br.finish()
+        return self._gz.flush(zlib.Z_FINISH)
+
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    """Compress a complete body with the given content-coding ("gzip" or "br")."""
+    encoder = _Encoder(encoding)
+    return encoder.compress(data) + encoder.finish()
+
+
+def _compress_stream(chunks: Iterable, encoding: str) -> Iterator[bytes]:
+    encoder = _Encoder(encoding)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            if not chunk:
+                continue
+            data = encoder.compress(chunk) + encoder.flush()
+            if data:
+                yield data
+        yield encoder.finish()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def _choose_encoding(accept_encodings) -> Optional[str]:
+    if BROTLI_AVAILABLE and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def response_encoding(response, req) -> Optional[str]:
+    """Content-coding to apply to a response, or None to send it as is.
+
+    Shared by the Flask hook below and the async routes in asgi_app.py.
+    Adds Vary: Accept-Encoding to any response whose type is compressible.
+    """
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or req.method == "HEAD"
+    ):
+        return None
+    response.vary.add("Accept-Encoding")
+    return _choose_encoding(req.accept_encodings)
+
+
+def mark_encoded(response, encoding: str) -> None:
+    """Set Content-Encoding after the body was compressed."""
+    response.headers["Content-Encoding"] = encoding
+    # The encoded bytes differ from the identity representation
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def compress_response(response):
+    """after_request hook: compress the response body when worthwhile."""
+    if response.direct_passthrough:
+        return response
+    encoding = response_encoding(response, request)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < Config.COMPRESSION_MIN_SIZE:
+            return response
+        response.set_data(compress_bytes(data, encoding))
+
+    mark_encoded(response, encoding)
+    return response
+
+
+def install_compression(app, hook=compress_response) -> None:
+    """Register the compression hook if COMPRESSION_ENABLED is set.
+
+    Args:
+        app: Flask application (or the Quart app, with its async hook)
+        hook: after_request hook that compresses a response
+    """
+    if not Config.COMPRESSION_ENABLED:
+        return
+    app.after_request(hook)
+    logger.info(f"Response compression enabled ({'br, ' if BROTLI_AVAILABLE else ''}gzip)")
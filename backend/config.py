@@ -1,10 +1,16 @@
 """Configuration management for OpenScore backend."""
+import logging
 import os
 from typing import List
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# FLASK_ENV values in which AUTH0_JWKS_URL may point at a local stand-in
+JWKS_OVERRIDE_ENVS = ("development", "test", "testing")
+
 
 class Config:
     """Application configuration loaded from environment variables.
@@ -19,6 +25,9 @@ class Config:
     
     # Flask
     FLASK_ENV: str = os.getenv("FLASK_ENV", "development")
+    # Skip app.py's import-time startup (index check, job workers, scheduler). gunicorn.conf.py
+    # sets this and runs those steps itself: once in the master, then per worker after fork.
+    DEFER_STARTUP: bool = os.getenv("DEFER_STARTUP", "false").lower() in ("1", "true", "yes")
     
     # Auth0
     # Should match frontend: domain = 'dev-10rq6pvfm662krqd.us.auth0.com'
@@ -26,15 +35,31 @@ class Config:
     AUTH0_DOMAIN: str = os.getenv("AUTH0_DOMAIN", "")
     AUTH0_AUDIENCE: str = os.getenv("AUTH0_AUDIENCE", "")
     AUTH0_ALGORITHMS: List[str] = ["RS256"]
+    # Overrides https://AUTH0_DOMAIN/.well-known/jwks.json (loadtest.py serves a local stand-in).
+    # Tokens signed by that key are accepted, so validate() refuses it outside JWKS_OVERRIDE_ENVS.
+    AUTH0_JWKS_URL: str = os.getenv("AUTH0_JWKS_URL", "")
     
     # MongoDB
     MONGODB_URI: str = os.getenv("MONGODB_URI", "")
     MONGODB_DBNAME: str = os.getenv("MONGODB_DBNAME", "openscore")
+    # Run explain() on the main query shapes at startup and log any COLLSCAN/SORT fallbacks
+    INDEX_SELF_CHECK: bool = os.getenv("INDEX_SELF_CHECK", "true").lower() in ("1", "true", "yes")
+    # Transaction listings are keyset-paged; page size is clamped to TRANSACTIONS_PAGE_MAX
+    TRANSACTIONS_PAGE_DEFAULT: int = int(os.getenv("TRANSACTIONS_PAGE_DEFAULT", "50"))
+    TRANSACTIONS_PAGE_MAX: int = int(os.getenv("TRANSACTIONS_PAGE_MAX", "500"))
+    # Most recent transactions fed to the scoring model
+    SCORING_TRANSACTION_LIMIT: int = int(os.getenv("SCORING_TRANSACTION_LIMIT", "500"))
+    # Documents fetched per cursor round-trip by the /api/data/export stream
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+    # Per-process cache of dashboard summaries (keyed on each user's data version)
+    SUMMARY_CACHE_MAX_ENTRIES: int = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "1024"))
     
     # Plaid
     PLAID_CLIENT_ID: str = os.getenv("PLAID_CLIENT_ID", "")
     PLAID_SECRET: str = os.getenv("PLAID_SECRET", "")
     PLAID_ENV: str = os.getenv("PLAID_ENV", "sandbox")
+    # Overrides the PLAID_ENV host, e.g. http://127.0.0.1:8765 for the local plaid_emulator.py
+    PLAID_BASE_URL: str = os.getenv("PLAID_BASE_URL", "")
     # Plaid products to request access to (e.g., "transactions", "auth", "identity", "income")
     # Format: comma-separated string like "transactions" or "transactions,auth,identity"
     _plaid_products_str = os.getenv("PLAID_PRODUCTS", "transactions")
@@ -43,13 +68,86 @@ class Config:
     # Format: comma-separated string like "US" or "US,CA,GB"
     _plaid_country_codes_str = os.getenv("PLAID_COUNTRY_CODES", "US")
     PLAID_COUNTRY_CODES: List[str] = [c.strip() for c in _plaid_country_codes_str.split(",") if c.strip()]
+    # Concurrent Plaid calls per process, wait for a free slot, and the timeout ceiling
+    # (actual per-endpoint timeouts adapt to observed latency, see the resilience settings)
+    PLAID_MAX_CONCURRENCY: int = int(os.getenv("PLAID_MAX_CONCURRENCY", "16"))
+    PLAID_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("PLAID_QUEUE_TIMEOUT_SECONDS", "2"))
+    PLAID_TIMEOUT_SECONDS: float = float(os.getenv("PLAID_TIMEOUT_SECONDS", "30"))
+    # Concurrent Plaid calls per process under asgi_app.py (coroutines are cheap; this bounds upstream load)
+    ASYNC_PLAID_MAX_CONCURRENCY: int = int(os.getenv("ASYNC_PLAID_MAX_CONCURRENCY", "200"))
+    # Token bucket per client_id for batch calls: sustained requests/second, burst, and max wait for a token
+    PLAID_RATE_LIMIT_PER_SECOND: float = float(os.getenv("PLAID_RATE_LIMIT_PER_SECOND", "10"))
+    PLAID_RATE_LIMIT_BURST: float = float(os.getenv("PLAID_RATE_LIMIT_BURST", "20"))
+    PLAID_RATE_LIMIT_WAIT_SECONDS: float = float(os.getenv("PLAID_RATE_LIMIT_WAIT_SECONDS", "60"))
+    # Batch balance refresh: concurrent /accounts/balance/get calls and items per bulk write
+    BALANCE_BATCH_WORKERS: int = int(os.getenv("BALANCE_BATCH_WORKERS", "8"))
+    BALANCE_BATCH_CHUNK_SIZE: int = int(os.getenv("BALANCE_BATCH_CHUNK_SIZE", "100"))
     
     # Gemini
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
+    GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.5-flash-lite")
+    # Response cache: identical (model, prompt) pairs are served from cache for this long
+    GEMINI_CACHE_TTL_SECONDS: int = int(os.getenv("GEMINI_CACHE_TTL_SECONDS", "3600"))
+    # Max entries held in the in-process LRU tier (0 disables caching entirely)
+    GEMINI_CACHE_MAX_ENTRIES: int = int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", "256"))
+    # Concurrency cap and timeouts for upstream Gemini calls
+    GEMINI_MAX_CONCURRENCY: int = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+    GEMINI_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("GEMINI_QUEUE_TIMEOUT_SECONDS", "2"))
+    GEMINI_TIMEOUT_SECONDS: float = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "30"))
+    # Use a local deterministic stand-in instead of calling Gemini (tests/offline dev)
+    GEMINI_USE_STUB: bool = os.getenv("GEMINI_USE_STUB", "false").lower() in ("1", "true", "yes")
+
+    # Resilience guards for Plaid and Gemini: consecutive failures that open the circuit,
+    # seconds before a half-open probe, and adaptive timeouts (p99 latency x multiplier,
+    # floored at the minimum, capped at PLAID_TIMEOUT_SECONDS / GEMINI_TIMEOUT_SECONDS)
+    CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_RESET_SECONDS: float = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+    ADAPTIVE_TIMEOUT_MULTIPLIER: float = float(os.getenv("ADAPTIVE_TIMEOUT_MULTIPLIER", "3"))
+    ADAPTIVE_TIMEOUT_MIN_SECONDS: float = float(os.getenv("ADAPTIVE_TIMEOUT_MIN_SECONDS", "2"))
+
+    # Score snapshots (score + financial digest reused by analyze/chat)
+    SCORE_SNAPSHOT_TTL_SECONDS: int = int(os.getenv("SCORE_SNAPSHOT_TTL_SECONDS", "900"))
+    # Approximate token budget for the financial context rendered into chat prompts
+    CHAT_CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "400"))
+    # Chat sessions: idle expiry, turns kept verbatim, and cap on the folded summary of older turns
+    CHAT_SESSION_TTL_SECONDS: int = int(os.getenv("CHAT_SESSION_TTL_SECONDS", "86400"))
+    CHAT_SESSION_MAX_TURNS: int = int(os.getenv("CHAT_SESSION_MAX_TURNS", "8"))
+    CHAT_SESSION_SUMMARY_MAX_CHARS: int = int(os.getenv("CHAT_SESSION_SUMMARY_MAX_CHARS", "1500"))
+    
+    # Response compression (opt-in): gzip, or brotli when installed and accepted
+    COMPRESSION_ENABLED: bool = os.getenv("COMPRESSION_ENABLED", "false").lower() in ("1", "true", "yes")
+    # Buffered responses smaller than this (bytes) are sent uncompressed
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    COMPRESSION_GZIP_LEVEL: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_BROTLI_QUALITY: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
     
     # Sandbox data loading
     SANDBOX_JSON_PATH: str = os.getenv("SANDBOX_JSON_PATH", "sandbox_output.json")
-    
+    # Files at least this large are parsed incrementally (requires ijson) instead of json.load
+    SANDBOX_STREAM_THRESHOLD_BYTES: int = int(os.getenv("SANDBOX_STREAM_THRESHOLD_BYTES", str(5 * 1024 * 1024)))
+    # Documents per bulk write when streaming a sandbox file
+    INGEST_BATCH_SIZE: int = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+    # Raw snapshot retention: newest N per user (0 keeps all), plus an optional TTL (0 disables)
+    RAW_SNAPSHOT_KEEP: int = int(os.getenv("RAW_SNAPSHOT_KEEP", "5"))
+    RAW_SNAPSHOT_TTL_DAYS: int = int(os.getenv("RAW_SNAPSHOT_TTL_DAYS", "0"))
+
+    # Background jobs (sandbox loads, Plaid syncs): worker threads per web process
+    # (0 leaves jobs to a separate `python worker.py`), claim polling, lease and retries
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_POLL_INTERVAL_SECONDS: float = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "1.0"))
+    JOB_LEASE_SECONDS: int = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETRY_BASE_SECONDS: float = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+    # Finished jobs are kept this long for status polling
+    JOB_RETENTION_HOURS: int = int(os.getenv("JOB_RETENTION_HOURS", "24"))
+
+    # Scheduled Plaid refresh: every tick, queue refresh jobs for up to REFRESH_BATCH_SIZE
+    # items not refreshed within REFRESH_STALE_AFTER_SECONDS (stalest first)
+    REFRESH_SCHEDULER_ENABLED: bool = os.getenv("REFRESH_SCHEDULER_ENABLED", "false").lower() in ("1", "true", "yes")
+    REFRESH_TICK_SECONDS: float = float(os.getenv("REFRESH_TICK_SECONDS", "60"))
+    REFRESH_STALE_AFTER_SECONDS: int = int(os.getenv("REFRESH_STALE_AFTER_SECONDS", str(6 * 3600)))
+    REFRESH_BATCH_SIZE: int = int(os.getenv("REFRESH_BATCH_SIZE", "20"))
+
     # Data encryption (Fernet key for encrypting access tokens)
     DATA_ENCRYPTION_KEY: str = os.getenv("DATA_ENCRYPTION_KEY", "")
     
@@ -65,3 +163,14 @@ class Config:
         if missing:
             raise ValueError(f"Missing required environment variables: {', '.join(missing)}")
 
+        if cls.AUTH0_JWKS_URL:
+            if cls.FLASK_ENV not in JWKS_OVERRIDE_ENVS:
+                raise ValueError(
+                    f"AUTH0_JWKS_URL is only allowed when FLASK_ENV is one of {', '.join(JWKS_OVERRIDE_ENVS)} "
+                    f"(FLASK_ENV={cls.FLASK_ENV}); unset it to verify tokens against Auth0"
+                )
+            logger.warning(
+                f"AUTH0_JWKS_URL is set: tokens signed by keys from {cls.AUTH0_JWKS_URL} are trusted "
+                f"instead of https://{cls.AUTH0_DOMAIN}/. Local testing only."
+            )
+
@@ -7,9 +7,20 @@ from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Try to import motor - make it optional (only needed by the async app, asgi_app.py)
+MOTOR_AVAILABLE = False
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+    MOTOR_AVAILABLE = True
+except ImportError:
+    logger.debug("motor not available, async MongoDB access is disabled. Install with: pip install motor")
+
 # Singleton MongoDB client
 _client: MongoClient = None
 
+# Singleton Motor client for the async app (bound to the event loop it was created on)
+_async_client = None
+
 
 def get_client() -> MongoClient:
     """Get or create the MongoDB client.
@@ -52,3 +63,51 @@ def get_collection(name: str):
     """
     db = get_db()
     return db[name]
+
+
+def close_client() -> None:
+    """Close the MongoDB client; the next get_client() call opens a new one.
+
+    Used by the gunicorn master after its startup checks, so no connection
+    pool is open when workers are forked.
+    """
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+def reset_client() -> None:
+    """Forget a client inherited across fork() without touching its sockets.
+
+    PyMongo clients are not fork-safe: a forked worker must create its own
+    client (the parent still owns the inherited one's connections).
+    """
+    global _client
+    _client = None
+
+
+def get_async_db():
+    """Get the configured database through Motor, for use from coroutines.
+
+    Call from inside the event loop that will use it; the client is created
+    on first use.
+
+    Returns:
+        AsyncIOMotorDatabase instance
+    """
+    global _async_client
+    if not MOTOR_AVAILABLE:
+        raise RuntimeError("motor is not installed. Install with: pip install motor")
+    if _async_client is None:
+        _async_client = AsyncIOMotorClient(Config.MONGODB_URI, tlsCAFile=certifi.where())
+        logger.info("Motor client created")
+    return _async_client[Config.MONGODB_DBNAME]
+
+
+def close_async_client() -> None:
+    """Close the Motor client, if one was created."""
+    global _async_client
+    if _async_client is not None:
+        _async_client.close()
+        _async_client = None
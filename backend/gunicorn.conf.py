@@ -0,0 +1,115 @@
+"""gunicorn settings for serving the API in production.
+
+Usage (from backend/):
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Worker models (GUNICORN_WORKER_CLASS):
+- gthread (default): WEB_CONCURRENCY processes x GUNICORN_THREADS threads.
+  Needs no extra packages. Concurrency is bounded by the thread count, so
+  size threads for the share of requests that wait on Plaid, Gemini or MongoDB.
+- gevent: each worker serves up to GUNICORN_WORKER_CONNECTIONS requests as
+  greenlets, so requests blocked on upstream I/O cost little. Needs
+  `pip install gevent`. The app is then not preloaded, because gevent must
+  patch the standard library before the app modules are imported.
+
+Either way, upstream concurrency per worker process stays capped by the
+resilience bulkheads (PLAID_MAX_CONCURRENCY, GEMINI_MAX_CONCURRENCY), and
+each worker runs JOB_WORKERS job threads.
+
+Process lifecycle:
+- With preload, the master imports the app once (shared copy-on-write by the
+  workers). DEFER_STARTUP stops that import from opening MongoDB
+  connections or starting threads.
+- when_ready (master, preload only): creates and checks indexes once, then
+  closes the MongoDB client, so no connection pool exists when workers fork.
+  Without preload each worker runs the (idempotent) index check instead.
+- post_fork (worker, preload only): drops any MongoDB client, Plaid HTTP
+  session or Gemini client inherited from the master; each worker opens its
+  own on first use.
+- post_worker_init (worker): starts the worker's job threads and the refresh
+  scheduler (leased, so only one process schedules at a time), and checks
+  whether the legacy key migration has completed.
+- worker_exit (worker): on shutdown (SIGTERM, or a worker recycled by
+  max_requests), stops claiming jobs. It then waits up to graceful_timeout
+  for in-flight syncs and loads. Jobs cut off after that are retried by
+  another worker once their lease expires.
+"""
+import multiprocessing
+import os
+
+# Must be set before the app (and config) is imported, including by preload
+os.environ.setdefault("DEFER_STARTUP", "true")
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+if worker_class not in ("gthread", "gevent"):
+    raise ValueError(f"GUNICORN_WORKER_CLASS must be gthread or gevent, got {worker_class!r}")
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "500"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "false" if worker_class == "gevent" else "true").lower() in ("1", "true", "yes")
+
+# timeout is the worker heartbeat (a stuck worker is restarted), not a request
+# deadline; upstream calls have their own adaptive timeouts
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Recycle workers after this many requests (0 disables); jitter staggers restarts
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def when_ready(server):
+    """Master: with preload, create/check indexes once and close the client before forking."""
+    if preload_app:
+        from app import ensure_indexes
+        from db import close_client
+
+        ensure_indexes()
+        close_client()
+    server.log.info(
+        f"Serving with {workers} {worker_class} worker(s)"
+        + (f" x {threads} threads" if worker_class == "gthread" else f" x {worker_connections} connections")
+        + (", app preloaded" if preload_app else "")
+    )
+
+
+def post_fork(server, worker):
+    """Worker: discard connections inherited from the master.
+
+    Without preload the master never imports the app, so there is nothing to
+    discard (and importing here would run before gevent patches the stdlib).
+    """
+    if not preload_app:
+        return
+    from db import reset_client
+    from services.gemini_service import reset_client_manager
+    from services.plaid_client import reset_session
+
+    reset_client()
+    reset_session()
+    reset_client_manager()
+
+
+def post_worker_init(worker):
+    """Worker: start background services once the app is loaded."""
+    from app import ensure_indexes, start_background_services
+
+    if not preload_app:
+        # No master-side startup without preload; each worker checks indexes (idempotent)
+        ensure_indexes()
+    start_background_services()
+
+
+def worker_exit(server, worker):
+    """Worker: drain in-flight jobs before the process exits."""
+    from app import stop_background_services
+
+    worker.log.info(f"Worker {worker.pid} draining background jobs (up to {graceful_timeout}s)")
+    stop_background_services(timeout=graceful_timeout)
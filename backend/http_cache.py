@@ -0,0 +1,81 @@
+"""Conditional GET support for read-only, per-user endpoints."""
+import hashlib
+import logging
+from functools import wraps
+from typing import Callable, Optional
+
+from flask import g, make_response, request
+
+from db import get_db
+from services.data_version_service import get_data_version
+
+logger = logging.getLogger(__name__)
+
+# Browsers may store responses but must revalidate them on every use
+CACHE_CONTROL = "private, no-cache"
+
+
+def compute_etag(path: str, query_string: bytes, user_id: str, version: int, extra: str = "") -> str:
+    """ETag for a per-user GET: path, query string, user and data version (plus extra)."""
+    key = f"{path}|{query_string.decode('latin-1')}|{user_id}|{version}|{extra}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def request_etag(req, user_id: str, version: int, extra: str = "") -> str:
+    """compute_etag() for a Flask or Quart request."""
+    return compute_etag(req.path, req.query_string, user_id, version, extra)
+
+
+def is_not_modified(req, etag: str) -> bool:
+    """Whether the request's If-None-Match already holds etag (answer with a 304)."""
+    return req.if_none_match.contains_weak(etag)
+
+
+def set_cache_headers(response, etag: str) -> None:
+    """Mark a 200/304 response as revalidatable against etag.
+
+    Weak: the representation may be re-encoded (e.g. compressed) downstream.
+    """
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    response.vary.add("Authorization")
+
+
+def conditional_get(extra: Optional[Callable[[], str]] = None):
+    """Decorator adding ETag / If-None-Match handling to a GET route.
+
+    The ETag is derived from the user's data version (bumped on every ingest),
+    the request path and query string, and an optional `extra` token for
+    inputs outside Mongo (e.g. file mtimes). A matching If-None-Match gets a
+    304 after a single version lookup, without running the view.
+
+    Must be applied below @require_auth so g.user is populated.
+
+    Args:
+        extra: Optional callable returning a string that also invalidates the ETag
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            user_id = (g.get("user") or {}).get("sub")
+            if not user_id:
+                return f(*args, **kwargs)
+
+            try:
+                version = get_data_version(get_db(), user_id)
+                etag = request_etag(request, user_id, version, extra() if extra else "")
+            except Exception as e:
+                logger.warning(f"Skipping conditional GET for {request.path}: {e}")
+                return f(*args, **kwargs)
+
+            if is_not_modified(request, etag):
+                response = make_response("", 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            set_cache_headers(response, etag)
+            return response
+        return decorated
+    return decorator
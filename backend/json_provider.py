@@ -0,0 +1,112 @@
+"""JSON provider for the Flask app.
+
+Uses orjson (C-backed, serializes straight to bytes) when it is installed and
+falls back to the stdlib encoder otherwise. Both encoders write datetimes as
+ISO 8601 strings and ObjectIds as hex strings, so responses look the same
+whichever one is active.
+"""
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+logger = logging.getLogger(__name__)
+
+# Try to import orjson - make it optional
+ORJSON_AVAILABLE = False
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    logger.info("orjson not available, using the stdlib JSON encoder. Install with: pip install orjson")
+
+try:
+    from bson import ObjectId
+except ImportError:  # pymongo not installed (e.g. running the benchmark standalone)
+    ObjectId = None
+
+
+def _default(o: Any) -> Any:
+    """Encode types neither encoder handles on its own."""
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if ObjectId is not None and isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, Decimal):
+        return float(o)
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    if hasattr(o, "to_dict"):
+        return o.to_dict()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's stdlib provider with ISO datetimes, ObjectId support and unsorted keys."""
+
+    default = staticmethod(_default)
+    # Key order is preserved as stored; sorting every object is pure overhead
+    sort_keys = False
+
+
+class OrjsonProvider(StdlibJSONProvider):
+    """orjson-backed provider; anything orjson rejects goes through the stdlib path."""
+
+    def _dumps_bytes(self, obj: Any, indent: bool = False) -> bytes:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=_default, option=option)
+        except (orjson.JSONEncodeError, TypeError):
+            # e.g. integers beyond 64 bits
+            return super().dumps(obj, indent=2 if indent else None).encode("utf-8")
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs.get("cls") or kwargs.get("sort_keys"):
+            return super().dumps(obj, **kwargs)
+        return self._dumps_bytes(obj, indent=bool(kwargs.get("indent"))).decode("utf-8")
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        """Build a JSON response without the bytes -> str -> bytes round-trip."""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(
+            self._dumps_bytes(obj, indent=indent) + b"\n",
+            mimetype=self.mimetype
+        )
+
+
+def get_json_provider_class():
+    """Return the fastest available provider class."""
+    return OrjsonProvider if ORJSON_AVAILABLE else StdlibJSONProvider
+
+
+def install_json_provider(app) -> None:
+    """Replace the app's JSON provider (affects jsonify, request.get_json, etc.).
+
+    Args:
+        app: Flask application
+    """
+    provider_class = get_json_provider_class()
+    app.json_provider_class = provider_class
+    app.json = provider_class(app)
+    logger.info(f"Using JSON provider: {provider_class.__name__}")
+
+
+def dumps(obj: Any) -> str:
+    """Serialize outside a request (e.g. SSE events, NDJSON export lines)."""
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except (orjson.JSONEncodeError, TypeError):
+            pass
+    return json.dumps(obj, default=_default, separators=(",", ":"))
@@ -0,0 +1,412 @@
+"""Load-test kit for the Flask API.
+
+Every /api/* route requires an Auth0-signed JWT, so this script stands in
+for Auth0: it signs tokens with a local test RSA key and serves the matching
+JWKS over HTTP. The API is pointed at it with AUTH0_JWKS_URL, and tokens carry
+the issuer/audience the API expects (https://AUTH0_DOMAIN/, AUTH0_AUDIENCE).
+
+Subcommands:
+    env    Print the environment the API needs to accept load-test tokens
+    jwks   Serve the JWKS stand-in on its own (run also serves it)
+    seed   Load sandbox_output.json into MongoDB for N "loadtest|NNNNN" users,
+           each with a Plaid item (use --clean to remove them again)
+    run    Drive a scenario with concurrent virtual users and report
+           throughput plus p50/p95/p99 latency per request
+
+Scenarios:
+    dashboard   GET /api/data/accounts, /api/data/transactions?limit=50,
+                /api/data/summary (what the customer dashboard loads)
+    score       GET /api/score/calculate
+    sync-burst  POST /api/plaid/transactions/sync and /balances/sync, then poll
+                /api/jobs/<id> until both finish (the API's Plaid calls
+                should go to plaid_emulator.py via PLAID_BASE_URL)
+
+The signing key is generated on first use and kept in .loadtest/ (git-ignored),
+so the API's cached JWKS stays valid across runs.
+
+Usage (from backend/):
+    env $(python loadtest.py env) python app.py   # API that accepts load-test tokens
+    python loadtest.py seed --users 50
+    python loadtest.py run --scenario dashboard --users 50 --concurrency 16 --duration 30
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import statistics
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import jwt
+import requests
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_KEY_PATH = os.path.join(BACKEND_DIR, ".loadtest", "jwt_signing_key.pem")
+DEFAULT_FIXTURE = os.path.join(BACKEND_DIR, "sandbox_output.json")
+DEFAULT_DOMAIN = "loadtest.openscore.local"
+DEFAULT_AUDIENCE = "https://openscore.api"
+KEY_ID = "openscore-loadtest"
+USER_PREFIX = "loadtest|"
+
+JOB_DONE = ("succeeded", "failed")
+
+
+def user_id(index: int) -> str:
+    return f"{USER_PREFIX}{index:05d}"
+
+
+# ---------------------- Auth0 stand-in ----------------------
+def load_signing_key(path: str = DEFAULT_KEY_PATH) -> rsa.RSAPrivateKey:
+    """Load the test signing key, generating it on first use."""
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return serialization.load_pem_private_key(f.read(), password=None)
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ))
+    logger.info(f"Generated load-test signing key at {path}")
+    return key
+
+
+def jwks_document(key: rsa.RSAPrivateKey) -> Dict[str, Any]:
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key()))
+    jwk.update({"kid": KEY_ID, "use": "sig", "alg": "RS256"})
+    return {"keys": [jwk]}
+
+
+def mint_token(key: rsa.RSAPrivateKey, sub: str, domain: str, audience: str, ttl_seconds: int = 3600) -> str:
+    """Sign an access token shaped like Auth0's (RS256, kid header, iss/aud/sub/exp)."""
+    now = int(time.time())
+    claims = {
+        "iss": f"https://{domain}/",
+        "aud": audience,
+        "sub": sub,
+        "iat": now,
+        "exp": now + ttl_seconds,
+    }
+    return jwt.encode(claims, key, algorithm="RS256", headers={"kid": KEY_ID})
+
+
+def start_jwks_server(key: rsa.RSAPrivateKey, host: str, port: int) -> ThreadingHTTPServer:
+    """Serve the JWKS at /.well-known/jwks.json on a daemon thread."""
+    body = json.dumps(jwks_document(key)).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/.well-known/jwks.json":
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="loadtest-jwks", daemon=True).start()
+    return server
+
+
+def jwks_url(port: int) -> str:
+    return f"http://127.0.0.1:{port}/.well-known/jwks.json"
+
+
+# ---------------------- Seeding ----------------------
+def seed(users: int, fixture: str) -> None:
+    """Load the fixture for each load-test user and link a Plaid item."""
+    from pathlib import Path
+    from db import get_db
+    from services import repository
+    from services.ingest_coordinator import ingest_sandbox_file
+
+    db = get_db()
+    started = time.perf_counter()
+    for i in range(users):
+        uid = user_id(i)
+        ingest_sandbox_file(db, uid, Path(fixture), streamed=False)
+        repository.save_plaid_item(db, uid, f"access-sandbox-loadtest-{i:05d}", f"item-loadtest-{i:05d}")
+    print(f"Seeded {users} users from {fixture} in {time.perf_counter() - started:.1f}s")
+
+
+def clean() -> None:
+    """Delete every document owned by a load-test user."""
+    from db import get_db
+    from services.repository import USER_KEY
+
+    db = get_db()
+    owned = {"$regex": f"^{re.escape(USER_PREFIX)}"}
+    for name in db.list_collection_names():
+        field = "_id" if name == "users" else USER_KEY
+        deleted = db[name].delete_many({field: owned}).deleted_count
+        if deleted:
+            print(f"{name}: deleted {deleted}")
+
+
+# ---------------------- Scenarios ----------------------
+class Recorder:
+    """Thread-safe latency and status samples per request name."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, status: Any) -> None:
+        with self._lock:
+            self.latencies[name].append(seconds)
+            self.statuses[name][status] += 1
+
+
+class VirtualUser:
+    """One client session issuing a scenario's requests for a single user."""
+
+    def __init__(self, base_url: str, token: str, recorder: Recorder, timeout: float):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {token}"
+
+    def request(self, name: str, method: str, path: str) -> Optional[requests.Response]:
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", timeout=self.timeout)
+            # Include reading the body, as a browser would
+            response.content
+        except requests.RequestException as e:
+            self.recorder.record(name, time.perf_counter() - started, type(e).__name__)
+            return None
+        self.recorder.record(name, time.perf_counter() - started, response.status_code)
+        return response
+
+
+def dashboard(vu: VirtualUser) -> None:
+    vu.request("GET /api/data/accounts", "GET", "/api/data/accounts")
+    vu.request("GET /api/data/transactions", "GET", "/api/data/transactions?limit=50")
+    vu.request("GET /api/data/summary", "GET", "/api/data/summary")
+
+
+def score(vu: VirtualUser) -> None:
+    vu.request("GET /api/score/calculate", "GET", "/api/score/calculate")
+
+
+def sync_burst(vu: VirtualUser, poll_interval: float = 0.25) -> None:
+    started = time.perf_counter()
+    pending = []
+    for path in ("/api/plaid/transactions/sync", "/api/plaid/balances/sync"):
+        response = vu.request(f"POST {path}", "POST", path)
+        if response is not None and response.status_code == 202:
+            pending.append(response.json()["status_url"])
+
+    status = "succeeded"
+    deadline = started + vu.timeout
+    while pending and time.perf_counter() < deadline:
+        time.sleep(poll_interval)
+        for status_url in list(pending):
+            response = vu.request("GET /api/jobs/<id>", "GET", status_url)
+            if response is None or response.status_code != 200:
+                continue
+            job_status = response.json().get("status")
+            if job_status in JOB_DONE:
+                pending.remove(status_url)
+                if job_status == "failed":
+                    status = "failed"
+    if pending:
+        status = "timeout"
+    # End-to-end time until both syncs finished on the job workers
+    vu.recorder.record("sync (enqueue to done)", time.perf_counter() - started, status)
+
+
+SCENARIOS: Dict[str, Callable[[VirtualUser], None]] = {
+    "dashboard": dashboard,
+    "score": score,
+    "sync-burst": sync_burst,
+}
+
+
+def run(
+    scenario: str,
+    base_url: str,
+    tokens: List[str],
+    concurrency: int,
+    duration: float,
+    iterations: Optional[int],
+    timeout: float,
+) -> Tuple[Recorder, float, int]:
+    """Run a scenario with `concurrency` virtual users, spread across the tokens.
+
+    Each virtual user repeats the scenario until `duration` seconds pass (or
+    it has completed `iterations`).
+
+    Returns:
+        (recorder, elapsed seconds, completed scenario iterations)
+    """
+    recorder = Recorder()
+    step = SCENARIOS[scenario]
+    stop_at = time.perf_counter() + duration
+    completed = Counter()
+    start = threading.Barrier(concurrency)
+
+    def virtual_user(index: int) -> None:
+        vu = VirtualUser(base_url, tokens[index % len(tokens)], recorder, timeout)
+        start.wait()
+        done = 0
+        while (iterations is None or done < iterations) and time.perf_counter() < stop_at:
+            step(vu)
+            done += 1
+        completed[index] = done
+
+    threads = [threading.Thread(target=virtual_user, args=(i,), name=f"vu-{i}") for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - started, sum(completed.values())
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def summarize(recorder: Recorder, elapsed: float, completed: int) -> Dict[str, Any]:
+    rows = []
+    for name, latencies in recorder.latencies.items():
+        statuses = recorder.statuses[name]
+        ok = sum(count for status, count in statuses.items() if status in (200, 202, "succeeded"))
+        rows.append({
+            "request": name,
+            "count": len(latencies),
+            "errors": len(latencies) - ok,
+            "rps": len(latencies) / elapsed,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "mean_ms": statistics.mean(latencies) * 1000,
+            "statuses": {str(status): count for status, count in statuses.items()},
+        })
+    return {
+        "elapsed_seconds": elapsed,
+        "iterations": completed,
+        "iterations_per_sec": completed / elapsed,
+        "requests": rows,
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n{report['iterations']} iterations in {report['elapsed_seconds']:.1f}s "
+          f"({report['iterations_per_sec']:.1f}/s)\n")
+    print(f"{'request':<34} {'count':>7} {'errors':>7} {'req/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for row in report["requests"]:
+        print(f"{row['request']:<34} {row['count']:>7} {row['errors']:>7} {row['rps']:>8.1f} "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['mean_ms']:>8.1f}")
+    for row in report["requests"]:
+        if row["errors"]:
+            print(f"  {row['request']} statuses: {row['statuses']}")
+
+
+# ---------------------- CLI ----------------------
+def main() -> None:
+    parser = argparse.ArgumentParser(description="OpenScore API load-test kit")
+    parser.add_argument("--key-file", default=DEFAULT_KEY_PATH, help="Test signing key (generated if missing)")
+    parser.add_argument("--jwks-port", type=int, default=8766)
+    parser.add_argument("--domain", default=Config.AUTH0_DOMAIN or DEFAULT_DOMAIN,
+                        help="Issuer domain (default: AUTH0_DOMAIN)")
+    parser.add_argument("--audience", default=Config.AUTH0_AUDIENCE or DEFAULT_AUDIENCE,
+                        help="Token audience (default: AUTH0_AUDIENCE)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("env", help="Print the API environment for load tests")
+    commands.add_parser("jwks", help="Serve the JWKS stand-in until interrupted")
+
+    seed_parser = commands.add_parser("seed", help="Seed MongoDB with load-test users")
+    seed_parser.add_argument("--users", type=int, default=50)
+    seed_parser.add_argument("--fixture", default=DEFAULT_FIXTURE)
+    seed_parser.add_argument("--clean", action="store_true", help="Delete load-test users instead")
+
+    run_parser = commands.add_parser("run", help="Run a scenario against the API")
+    run_parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="dashboard")
+    run_parser.add_argument("--base-url", default="http://127.0.0.1:5000")
+    run_parser.add_argument("--users", type=int, default=50, help="Seeded users to spread requests across")
+    run_parser.add_argument("--concurrency", type=int, default=16, help="Concurrent virtual users")
+    run_parser.add_argument("--duration", type=float, default=30, help="Seconds to run")
+    run_parser.add_argument("--iterations", type=int, default=None,
+                            help="Stop each virtual user after this many iterations (e.g. 1 for a single burst)")
+    run_parser.add_argument("--timeout", type=float, default=60, help="Per-request (and per-sync) timeout")
+    run_parser.add_argument("--json", dest="json_path", default=None, help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    if args.command == "env":
+        print(f"AUTH0_DOMAIN={args.domain}")
+        print(f"AUTH0_AUDIENCE={args.audience}")
+        print(f"AUTH0_JWKS_URL={jwks_url(args.jwks_port)}")
+        # Config.validate() only accepts AUTH0_JWKS_URL outside production
+        print("FLASK_ENV=development")
+        return
+
+    if args.command == "seed":
+        if args.clean:
+            clean()
+        else:
+            seed(args.users, args.fixture)
+        return
+
+    key = load_signing_key(args.key_file)
+    server = start_jwks_server(key, "127.0.0.1", args.jwks_port)
+    logger.info(f"JWKS stand-in at {jwks_url(args.jwks_port)} (issuer https://{args.domain}/)")
+
+    if args.command == "jwks":
+        print(f"Sample token for {user_id(0)}:\n{mint_token(key, user_id(0), args.domain, args.audience)}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    ttl = int(args.duration + args.timeout) + 600
+    tokens = [mint_token(key, user_id(i), args.domain, args.audience, ttl) for i in range(args.users)]
+    print(f"Running {args.scenario} against {args.base_url}: {args.concurrency} virtual users "
+          f"over {args.users} users for {args.duration:.0f}s")
+    recorder, elapsed, completed = run(
+        args.scenario, args.base_url, tokens, args.concurrency, args.duration, args.iterations, args.timeout
+    )
+    server.shutdown()
+
+    if not recorder.latencies:
+        print("No requests completed")
+        sys.exit(1)
+    report = summarize(recorder, elapsed, completed)
+    report.update({"scenario": args.scenario, "concurrency": args.concurrency, "users": args.users})
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
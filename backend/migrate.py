@@ -0,0 +1,71 @@
+"""One-off database migrations, run explicitly rather than at web startup.
+
+Usage:
+    python migrate.py [--legacy-user-keys] [--drop-legacy-indexes] [--rebuild-indexes]
+
+--legacy-user-keys rewrites documents keyed by userId to user_id and
+records completion in the migrations collection; running processes then
+switch their reads to the plain user_id filter within a minute. It is
+idempotent and safe to run while serving traffic.
+
+--drop-legacy-indexes drops the userId indexes that served reads while the
+migration was pending. It refuses to run before the migration completes;
+run it a minute or more after, once every process has switched filters.
+
+--rebuild-indexes drops and recreates indexes whose options changed since
+they were created (reported as INDEX_CONFLICT by the startup self-check).
+Queries on the affected collections run without the index until the
+rebuild finishes, so run it during low traffic.
+"""
+import argparse
+import json
+import logging
+import sys
+
+from db import get_db
+from services.index_manager import drop_legacy_indexes, rebuild_conflicting_indexes
+from services.repository import migrate_legacy_user_keys
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run OpenScore database migrations")
+    parser.add_argument("--legacy-user-keys", action="store_true",
+                        help="Rewrite userId-keyed documents to user_id (one-time)")
+    parser.add_argument("--drop-legacy-indexes", action="store_true",
+                        help="Drop the userId indexes after --legacy-user-keys has completed")
+    parser.add_argument("--rebuild-indexes", action="store_true",
+                        help="Drop and recreate indexes whose declared options changed")
+    args = parser.parse_args()
+    if not (args.legacy_user_keys or args.drop_legacy_indexes or args.rebuild_indexes):
+        parser.print_help()
+        sys.exit(2)
+
+    db = get_db()
+    result = {}
+    if args.legacy_user_keys:
+        result["legacy_user_keys"] = migrate_legacy_user_keys(db)
+    if args.drop_legacy_indexes:
+        try:
+            dropped = drop_legacy_indexes(db)
+        except RuntimeError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        result["dropped_legacy_indexes"] = [
+            {"collection": spec["collection"], "keys": spec["keys"]} for spec in dropped
+        ]
+    if args.rebuild_indexes:
+        rebuilt = rebuild_conflicting_indexes(db)
+        result["rebuilt_indexes"] = [
+            {"collection": spec["collection"], "keys": spec["keys"], "options": spec["options"]}
+            for spec in rebuilt
+        ]
+    print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""Local stand-in for the Plaid REST API.
+
+Serves the endpoints the backend calls (link token, token exchange,
+accounts, balances, transactions, liabilities, investments) from a
+sandbox_output.json-style fixture, so syncs and ingest can be exercised and
+load-tested offline. Point the backend at it with PLAID_BASE_URL.
+
+- Latency: every response is delayed by --latency-ms (+/- --jitter-ms).
+- Error injection: --error-rate of requests fail with one of --errors
+  (PRODUCT_NOT_READY as Plaid's 400 ITEM_ERROR, RATE_LIMIT_EXCEEDED as 429,
+  INTERNAL_SERVER_ERROR as 500); --not-ready-first makes each access
+  token's first /transactions/get return PRODUCT_NOT_READY, exercising the
+  refresh-and-retry path.
+- Synthetic scale: --transactions N serves N transactions per item (the
+  fixture's, cycled with fresh IDs), with dates rebased so the newest
+  falls on today.
+
+GET /__stats returns request counts per path and injected error counts.
+
+Usage (from backend/):
+    python plaid_emulator.py [--port 8765] [--latency-ms 150] [--error-rate 0.05]
+    PLAID_BASE_URL=http://127.0.0.1:8765 python app.py
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_output.json")
+
+# Injectable errors: error_code -> (HTTP status, error_type, message)
+ERRORS = {
+    "PRODUCT_NOT_READY": (400, "ITEM_ERROR", "the requested product is not yet ready. please provide a webhook or try the request again later"),
+    "RATE_LIMIT_EXCEEDED": (429, "RATE_LIMIT_EXCEEDED", "rate limit exceeded for attempts to access this item. please try again later"),
+    "INTERNAL_SERVER_ERROR": (500, "API_ERROR", "an unexpected error occurred"),
+}
+
+# Endpoints that read an item's data (and so can be hit by injected errors)
+DATA_PATHS = (
+    "/accounts/get", "/accounts/balance/get", "/transactions/get", "/liabilities/get",
+    "/investments/holdings/get", "/investments/transactions/get",
+)
+
+
+class PlaidEmulator:
+    """Fixture data, fault settings and request stats shared by all handler threads."""
+
+    def __init__(
+        self,
+        fixture_path: str = DEFAULT_FIXTURE,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        error_rate: float = 0,
+        errors: Tuple[str, ...] = ("PRODUCT_NOT_READY", "RATE_LIMIT_EXCEEDED"),
+        not_ready_first: bool = False,
+        transactions: Optional[int] = None,
+        seed: Optional[int] = None,
+    ):
+        with open(fixture_path, "r") as f:
+            fixture = json.load(f)
+        self.accounts: List[Dict[str, Any]] = fixture.get("get_accounts", {}).get("accounts", [])
+        self.balance = fixture.get("get_balance", {}).get("balance_data", {"accounts": self.accounts})
+        self.liabilities = fixture.get("get_liabilities", {}).get("liabilities_data", {})
+        self.holdings = fixture.get("get_investments_holdings", {}).get("investments_holdings", {})
+        self.investment_transactions = fixture.get("get_investments_transactions", {}).get(
+            "investments_transactions", {}
+        )
+        self.transactions = self._scale_transactions(
+            fixture.get("get_transactions", {}).get("transactions", []), transactions
+        )
+
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.errors = tuple(code for code in errors if code in ERRORS)
+        self.not_ready_first = not_ready_first
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens_seen = set()
+        self.requests: Counter = Counter()
+        self.injected: Counter = Counter()
+
+    @staticmethod
+    def _scale_transactions(source: List[Dict[str, Any]], count: Optional[int]) -> List[Dict[str, Any]]:
+        """Cycle the fixture transactions up to count, newest first, dated up to today."""
+        if not source:
+            return []
+        count = len(source) if count is None else count
+        dates = [date.fromisoformat(t["date"]) for t in source if t.get("date")] or [date.today()]
+        shift = date.today() - max(dates)
+        per_cycle_days = (max(dates) - min(dates)).days + 1
+
+        result = []
+        for i in range(count):
+            cycle, index = divmod(i, len(source))
+            txn = dict(source[index])
+            # Older cycles step further back so synthetic rows spread over time
+            offset = shift - timedelta(days=cycle * per_cycle_days)
+            for field in ("date", "authorized_date"):
+                if txn.get(field):
+                    txn[field] = (date.fromisoformat(txn[field]) + offset).isoformat()
+            if cycle:
+                txn["transaction_id"] = f"{txn.get('transaction_id')}-{cycle}"
+            result.append(txn)
+        result.sort(key=lambda t: t.get("date") or "", reverse=True)
+        return result
+
+    # ---------------------- Faults ----------------------
+    def delay(self) -> None:
+        if self.latency_ms or self.jitter_ms:
+            with self._lock:
+                jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms)
+            time.sleep(max(0.0, self.latency_ms + jitter) / 1000)
+
+    def injected_error(self, path: str, access_token: Optional[str]) -> Optional[str]:
+        """Pick the error to inject for this request, if any."""
+        if path not in DATA_PATHS:
+            return None
+        with self._lock:
+            if self.not_ready_first and path == "/transactions/get" and access_token not in self._tokens_seen:
+                self._tokens_seen.add(access_token)
+                return "PRODUCT_NOT_READY"
+            if self.errors and self.error_rate and self._random.random() < self.error_rate:
+                return self._random.choice(self.errors)
+        return None
+
+    # ---------------------- Endpoints ----------------------
+    def _item(self, access_token: str) -> Dict[str, Any]:
+        item_id = hashlib.sha1(access_token.encode("utf-8")).hexdigest()[:24]
+        return {"item_id": item_id, "institution_id": "ins_109508", "available_products": [], "billed_products": []}
+
+    def handle(self, path: str, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """Return (status, response body) for a Plaid API request."""
+        request_id = uuid.uuid4().hex[:16]
+        # Credentials must be sent but any value is accepted (offline dev often has none configured)
+        if "client_id" not in body or "secret" not in body:
+            return 400, self.error_body("INVALID_REQUEST", "MISSING_FIELDS", "client_id and secret are required", request_id)
+
+        if path == "/link/token/create":
+            return 200, {"link_token": f"link-sandbox-{uuid.uuid4()}", "expiration": None, "request_id": request_id}
+        if path == "/sandbox/public_token/create":
+            return 200, {"public_token": f"public-sandbox-{uuid.uuid4()}", "request_id": request_id}
+        if path == "/item/public_token/exchange":
+            if not body.get("public_token"):
+                return 400, self.error_body("INVALID_REQUEST", "MISSING_FIELDS", "public_token is required", request_id)
+            access_token = f"access-sandbox-{uuid.uuid4()}"
+            return 200, {"access_token": access_token, "item_id": self._item(access_token)["item_id"], "request_id": request_id}
+        if path == "/transactions/refresh":
+            return 200, {"request_id": request_id}
+
+        access_token = body.get("access_token")
+        if path in DATA_PATHS and not access_token:
+            return 400, self.error_body("INVALID_REQUEST", "MISSING_FIELDS", "access_token is required", request_id)
+        item = self._item(access_token or "")
+
+        if path == "/accounts/get":
+            return 200, {"accounts": self.accounts, "item": item, "request_id": request_id}
+        if path == "/accounts/balance/get":
+            accounts = self.balance.get("accounts", self.accounts)
+            wanted = body.get("options", {}).get("account_ids") or body.get("account_ids")
+            if wanted:
+                accounts = [a for a in accounts if a.get("account_id") in wanted]
+            return 200, {"accounts": accounts, "item": item, "request_id": request_id}
+        if path == "/transactions/get":
+            start = body.get("start_date") or "0000-00-00"
+            end = body.get("end_date") or "9999-99-99"
+            options = body.get("options") or {}
+            count = min(int(options.get("count", 100)), 500)
+            offset = int(options.get("offset", 0))
+            matching = [t for t in self.transactions if start <= (t.get("date") or "") <= end]
+            return 200, {
+                "accounts": self.accounts,
+                "transactions": matching[offset:offset + count],
+                "total_transactions": len(matching),
+                "item": item,
+                "request_id": request_id,
+            }
+        if path == "/liabilities/get":
+            return 200, {**self.liabilities, "item": item, "request_id": request_id}
+        if path == "/investments/holdings/get":
+            return 200, {**self.holdings, "item": item, "request_id": request_id}
+        if path == "/investments/transactions/get":
+            return 200, {**self.investment_transactions, "item": item, "request_id": request_id}
+
+        return 404, self.error_body("INVALID_REQUEST", "NOT_FOUND", f"unknown endpoint {path}", request_id)
+
+    @staticmethod
+    def error_body(error_type: str, error_code: str, message: str, request_id: str) -> Dict[str, Any]:
+        return {
+            "error_type": error_type,
+            "error_code": error_code,
+            "error_message": message,
+            "display_message": None,
+            "request_id": request_id,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"requests": dict(self.requests), "injected_errors": dict(self.injected)}
+
+
+def make_handler(emulator: PlaidEmulator):
+    """Build a request handler class bound to an emulator instance."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Keep-alive responses otherwise stall on Nagle + delayed ACK (~40ms each)
+        disable_nagle_algorithm = True
+
+        def _send(self, status: int, body: Dict[str, Any]) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/__stats":
+                self._send(200, emulator.stats())
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                self._send(400, emulator.error_body("INVALID_REQUEST", "INVALID_BODY", "body is not valid JSON", ""))
+                return
+
+            with emulator._lock:
+                emulator.requests[self.path] += 1
+            emulator.delay()
+
+            error_code = emulator.injected_error(self.path, body.get("access_token"))
+            if error_code:
+                with emulator._lock:
+                    emulator.injected[error_code] += 1
+                status, error_type, message = ERRORS[error_code]
+                self._send(status, emulator.error_body(error_type, error_code, message, uuid.uuid4().hex[:16]))
+                return
+
+            status, response = emulator.handle(self.path, body)
+            self._send(status, response)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return Handler
+
+
+def start_emulator(emulator: PlaidEmulator, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Serve the emulator on a daemon thread (port 0 picks a free port).
+
+    Returns:
+        The server; its base URL is f"http://{host}:{server.server_address[1]}"
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(emulator))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="plaid-emulator", daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local Plaid API stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE, help="sandbox_output.json-style fixture")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Uniform +/- jitter on the delay")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of data requests that fail (0-1)")
+    parser.add_argument("--errors", default="PRODUCT_NOT_READY,RATE_LIMIT_EXCEEDED",
+                        help=f"Comma-separated errors to inject, from: {', '.join(ERRORS)}")
+    parser.add_argument("--not-ready-first", action="store_true",
+                        help="First /transactions/get per access token returns PRODUCT_NOT_READY")
+    parser.add_argument("--transactions", type=int, default=None,
+                        help="Transactions per item (default: the fixture's count)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for latency jitter and errors")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    emulator = PlaidEmulator(
+        fixture_path=args.fixture,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        errors=tuple(code.strip() for code in args.errors.split(",") if code.strip()),
+        not_ready_first=args.not_ready_first,
+        transactions=args.transactions,
+        seed=args.seed,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(emulator))
+    server.daemon_threads = True
+    logger.info(
+        f"Plaid emulator on http://{args.host}:{args.port} "
+        f"({len(emulator.transactions)} transactions/item, latency {args.latency_ms}ms, error rate {args.error_rate})"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,83 @@
 """Data retrieval routes for transactions, balances, and income."""
-from flask import Blueprint, jsonify, g, request
+from datetime import datetime
+from flask import Blueprint, Response, jsonify, g, request, stream_with_context
 from auth import require_auth
+from config import Config
 from db import get_db
-from services.sandbox_storage_service import compute_summary
+from http_cache import conditional_get
+from routes.responses import error, invalid_token, server_error
+from services.summary_service import get_summary
+from services.export_service import iter_export_ndjson, gzip_chunks
+from services import repository
 import logging
 
 logger = logging.getLogger(__name__)
 
 bp = Blueprint("data", __name__, url_prefix="/api")
 
+# Response header carrying the opaque cursor for the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def transactions_page_args(args, default_limit: int) -> dict:
+    """Parse transaction paging query params into find_transactions_page kwargs.
+    
+    Query params:
+        limit: Page size, clamped to TRANSACTIONS_PAGE_MAX
+        cursor: Opaque cursor from the previous page's X-Next-Cursor header
+        start_date, end_date: Inclusive YYYY-MM-DD bounds on the transaction date
+    
+    Raises:
+        ValueError: If a date is malformed
+    """
+    limit = args.get("limit", default_limit, type=int)
+    page = {"limit": max(1, min(limit, Config.TRANSACTIONS_PAGE_MAX)), "cursor": args.get("cursor")}
+    for param in ("start_date", "end_date"):
+        value = args.get(param)
+        if value:
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                raise ValueError(f"{param} must be a date in YYYY-MM-DD format") from None
+        page[param] = value
+    return page
+
+
+def transactions_page_response(result: list, next_cursor):
+    """(body, status, headers) for one page of transactions.
+    
+    Shared with the async route in asgi_app.py. X-Next-Cursor is set only
+    when more pages follow.
+    """
+    return result, 200, {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+
+
+def summary_response(summary: dict):
+    """(body, status) for /api/data/summary."""
+    return {"ok": True, **summary}, 200
+
+
+def _transactions_page(user_id: str, default_limit: int):
+    """Serve one keyset page of transactions from the request's query params.
+    
+    Returns:
+        JSON array of transactions, with X-Next-Cursor set when more pages follow
+    """
+    try:
+        page = transactions_page_args(request.args, default_limit)
+        result, next_cursor = repository.find_transactions_page(get_db(), user_id, **page)
+    except ValueError as e:
+        # Malformed date, or repository.InvalidCursorError
+        return error("invalid_request", str(e), 400)
+    return transactions_page_response(result, next_cursor)
+
 
 @bp.route("/transactions", methods=["GET"])
 @require_auth
 def get_transactions():
-    """Get the last 100 stored transactions for the current user.
+    """Get stored transactions for the current user, 100 per page by default.
+    
+    Accepts the same limit/cursor/start_date/end_date params as /api/data/transactions.
     
     Returns:
         JSON array of transactions sorted by date descending
@@ -21,43 +85,17 @@ def get_transactions():
     try:
         user_id = g.user.get("sub")
         if not user_id:
-            return jsonify({
-                "error": {
-                    "code": "invalid_token",
-                    "message": "User ID not found in token"
-                }
-            }), 401
+            return invalid_token()
         
-        db = get_db()
-        
-        # Get last 100 transactions, sorted by date descending
-        # Try to find date field (could be "date", "authorized_date", "datetime", etc.)
-        transactions = list(
-            db.transactions.find({"userId": user_id})
-            .sort([("date", -1), ("authorized_date", -1), ("_id", -1)])
-            .limit(100)
-        )
-        
-        # Remove MongoDB _id and convert to list
-        result = []
-        for txn in transactions:
-            txn.pop("_id", None)
-            result.append(txn)
-        
-        return jsonify(result), 200
+        return _transactions_page(user_id, default_limit=100)
         
     except Exception as e:
-        logger.error(f"Error fetching transactions: {e}")
-        return jsonify({
-            "error": {
-                "code": "server_error",
-                "message": str(e)
-            }
-        }), 500
+        return server_error("fetching transactions", e)
 
 
 @bp.route("/balances", methods=["GET"])
 @require_auth
+@conditional_get()
 def get_balances():
     """Get the latest account balances for the current user.
     
@@ -67,34 +105,17 @@ def get_balances():
     try:
         user_id = g.user.get("sub")
         if not user_id:
-            return jsonify({
-                "error": {
-                    "code": "invalid_token",
-                    "message": "User ID not found in token"
-                }
-            }), 401
+            return invalid_token()
         
         db = get_db()
         
         # Get all balances for user
-        balances = list(db.balances.find({"userId": user_id}))
-        
-        # Remove MongoDB _id
-        result = []
-        for balance in balances:
-            balance.pop("_id", None)
-            result.append(balance)
+        result = repository.find_balances(db, user_id)
         
         return jsonify(result), 200
         
     except Exception as e:
-        logger.error(f"Error fetching balances: {e}")
-        return jsonify({
-            "error": {
-                "code": "server_error",
-                "message": str(e)
-            }
-        }), 500
+        return server_error("fetching balances", e)
 
 
 @bp.route("/income", methods=["GET"])
@@ -108,43 +129,25 @@ def get_income():
     try:
         user_id = g.user.get("sub")
         if not user_id:
-            return jsonify({
-                "error": {
-                    "code": "invalid_token",
-                    "message": "User ID not found in token"
-                }
-            }), 401
+            return invalid_token()
         
         db = get_db()
         
         # Get latest income snapshot
-        income = db.income.find_one({"userId": user_id})
+        income = repository.find_income(db, user_id)
         
         if not income:
-            return jsonify({
-                "error": {
-                    "code": "not_found",
-                    "message": "No income data found for this user. Call /api/plaid/income/sync first."
-                }
-            }), 404
-        
-        # Remove MongoDB _id
-        income.pop("_id", None)
+            return error("not_found", "No income data found for this user. Call /api/plaid/income/sync first.", 404)
         
         return jsonify(income), 200
         
     except Exception as e:
-        logger.error(f"Error fetching income: {e}")
-        return jsonify({
-            "error": {
-                "code": "server_error",
-                "message": str(e)
-            }
-        }), 500
+        return server_error("fetching income", e)
 
 
 @bp.route("/data/accounts", methods=["GET"])
 @require_auth
+@conditional_get()
 def get_data_accounts():
     """Get accounts for the current user.
     
@@ -154,34 +157,17 @@ def get_data_accounts():
     try:
         user_id = g.user.get("sub")
         if not user_id:
-            return jsonify({
-                "error": {
-                    "code": "invalid_token",
-                    "message": "User ID not found in token"
-                }
-            }), 401
+            return invalid_token()
         
         db = get_db()
         
         # Get all accounts for user
-        accounts = list(db.accounts.find({"user_id": user_id}))
-        
-        # Remove MongoDB _id
-        result = []
-        for account in accounts:
-            account.pop("_id", None)
-            result.append(account)
+        result = repository.find_accounts(db, user_id)
         
         return jsonify(result), 200
         
     except Exception as e:
-        logger.error(f"Error fetching accounts: {e}")
-        return jsonify({
-            "error": {
-                "code": "server_error",
-                "message": str(e)
-            }
-        }), 500
+        return server_error("fetching accounts", e)
 
 
 @bp.route("/data/transactions", methods=["GET"])
@@ -190,49 +176,23 @@ def get_data_transactions():
     """Get transactions for the current user.
     
     Query params:
-        limit: Maximum number of transactions to return (default: 50)
+        limit: Page size (default: 50, capped at TRANSACTIONS_PAGE_MAX)
+        cursor: Value of X-Next-Cursor from the previous page
+        start_date, end_date: Optional inclusive date range (YYYY-MM-DD)
     
     Returns:
-        JSON array of transactions sorted by date descending
+        JSON array of transactions sorted by date descending. The
+        X-Next-Cursor header is set when another page is available.
     """
     try:
         user_id = g.user.get("sub")
         if not user_id:
-            return jsonify({
-                "error": {
-                    "code": "invalid_token",
-                    "message": "User ID not found in token"
-                }
-            }), 401
-        
-        db = get_db()
-        
-        # Get limit from query params
-        limit = request.args.get("limit", 50, type=int)
-        
-        # Get transactions, sorted by date descending
-        transactions = list(
-            db.transactions.find({"user_id": user_id})
-            .sort([("date", -1), ("_id", -1)])
-            .limit(limit)
-        )
+            return invalid_token()
         
-        # Remove MongoDB _id
-        result = []
-        for txn in transactions:
-            txn.pop("_id", None)
-            result.append(txn)
-        
-        return jsonify(result), 200
+        return _transactions_page(user_id, default_limit=Config.TRANSACTIONS_PAGE_DEFAULT)
         
     except Exception as e:
-        logger.error(f"Error fetching transactions: {e}")
-        return jsonify({
-            "error": {
-                "code": "server_error",
-                "message": str(e)
-            }
-        }), 500
+        return server_error("fetching transactions", e)
 
 
 @bp.route("/data/holdings", methods=["GET"])
@@ -246,34 +206,17 @@ def get_data_holdings():
     try:
         user_id = g.user.get("sub")
         if not user_id:
-            return jsonify({
-                "error": {
-                    "code": "invalid_token",
-                    "message": "User ID not found in token"
-                }
-            }), 401
+            return invalid_token()
         
         db = get_db()
         
         # Get all holdings for user
-        holdings = list(db.holdings.find({"user_id": user_id}))
-        
-        # Remove MongoDB _id
-        result = []
-        for holding in holdings:
-            holding.pop("_id", None)
-            result.append(holding)
+        result = repository.find_holdings(db, user_id)
         
         return jsonify(result), 200
         
     except Exception as e:
-        logger.error(f"Error fetching holdings: {e}")
-        return jsonify({
-            "error": {
-                "code": "server_error",
-                "message": str(e)
-            }
-        }), 500
+        return server_error("fetching holdings", e)
 
 
 @bp.route("/data/liabilities", methods=["GET"])
@@ -287,38 +230,22 @@ def get_data_liabilities():
     try:
         user_id = g.user.get("sub")
         if not user_id:
-            return jsonify({
-                "error": {
-                    "code": "invalid_token",
-                    "message": "User ID not found in token"
-                }
-            }), 401
+            return invalid_token()
         
         db = get_db()
         
         # Get all liabilities for user
-        liabilities = list(db.liabilities.find({"user_id": user_id}))
-        
-        # Remove MongoDB _id
-        result = []
-        for liability in liabilities:
-            liability.pop("_id", None)
-            result.append(liability)
+        result = repository.find_liabilities(db, user_id)
         
         return jsonify(result), 200
         
     except Exception as e:
-        logger.error(f"Error fetching liabilities: {e}")
-        return jsonify({
-            "error": {
-                "code": "server_error",
-                "message": str(e)
-            }
-        }), 500
+        return server_error("fetching liabilities", e)
 
 
 @bp.route("/data/summary", methods=["GET"])
 @require_auth
+@conditional_get()
 def get_data_summary():
     """Get aggregate summary statistics for the current user.
     
@@ -328,29 +255,56 @@ def get_data_summary():
     try:
         user_id = g.user.get("sub")
         if not user_id:
-            return jsonify({
-                "error": {
-                    "code": "invalid_token",
-                    "message": "User ID not found in token"
-                }
-            }), 401
+            return invalid_token()
         
         db = get_db()
         
-        # Compute summary
-        summary = compute_summary(db, user_id)
+        # Summary is cached until the user's data changes
+        summary = get_summary(db, user_id)
         
-        return jsonify({
-            "ok": True,
-            **summary
-        }), 200
+        return summary_response(summary)
         
     except Exception as e:
-        logger.error(f"Error computing summary: {e}")
-        return jsonify({
-            "error": {
-                "code": "server_error",
-                "message": str(e)
-            }
-        }), 500
+        return server_error("computing summary", e)
+
 
+@bp.route("/data/export", methods=["GET"])
+@require_auth
+def export_data():
+    """Stream all of the current user's stored data as NDJSON.
+    
+    Each line is {"type": "accounts"|"transactions"|"holdings"|"liabilities", "data": {...}}.
+    
+    Query params:
+        gzip: If true, return a gzip-compressed .ndjson.gz attachment
+        batch_size: Documents fetched per database round-trip (default: EXPORT_BATCH_SIZE)
+    
+    Returns:
+        Streamed NDJSON (or gzip) response
+    """
+    try:
+        user_id = g.user.get("sub")
+        if not user_id:
+            return invalid_token()
+        
+        db = get_db()
+        batch_size = request.args.get("batch_size", Config.EXPORT_BATCH_SIZE, type=int)
+        batch_size = max(1, min(batch_size, 10000))
+        use_gzip = request.args.get("gzip", "").lower() in ("1", "true", "yes")
+        
+        chunks = iter_export_ndjson(db, user_id, batch_size)
+        if use_gzip:
+            chunks = gzip_chunks(chunks)
+            mimetype = "application/gzip"
+            filename = "openscore-export.ndjson.gz"
+        else:
+            mimetype = "application/x-ndjson"
+            filename = "openscore-export.ndjson"
+        
+        response = Response(stream_with_context(chunks), mimetype=mimetype)
+        response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        response.headers["Cache-Control"] = "no-store"
+        return response
+        
+    except Exception as e:
+        return server_error("exporting data", e)
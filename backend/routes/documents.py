@@ -4,6 +4,7 @@ from io import BytesIO
 from pathlib import Path
 from flask import Blueprint, request, jsonify, g
 from auth import require_auth
+from http_cache import conditional_get
 from finance.document_pipeline import process_uploaded_documents, get_document_display_values
 
 logger = logging.getLogger(__name__)
@@ -15,6 +16,18 @@ BACKEND_DIR = Path(__file__).parent.parent
 DATA_DIR = BACKEND_DIR / "data"
 DATA_DIR.mkdir(exist_ok=True)
 
+# PDFs read by get_document_display_values()
+DOCUMENT_FILES = ("income.pdf", "balance.pdf")
+
+
+def _documents_mtime_token() -> str:
+    """Modification times of the stored PDFs, so re-uploads change the ETag."""
+    parts = []
+    for name in DOCUMENT_FILES:
+        path = DATA_DIR / name
+        parts.append(str(path.stat().st_mtime_ns) if path.exists() else "-")
+    return ":".join(parts)
+
 
 @documents_bp.route("/upload", methods=["POST"])
 @require_auth
@@ -79,6 +92,7 @@ def upload_documents():
 
 @documents_bp.route("/scores", methods=["GET"])
 @require_auth
+@conditional_get(extra=_documents_mtime_token)
 def get_document_scores():
     """
     Get document scores from default PDF files.
@@ -0,0 +1,59 @@
+"""Background job status routes."""
+import logging
+from typing import Any, Dict, Optional
+from flask import Blueprint, g
+from auth import require_auth
+from db import get_db
+from routes.responses import error, invalid_token, server_error
+from services.job_queue import get_job, public_job
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint("jobs", __name__, url_prefix="/api/jobs")
+
+
+def job_accepted(enqueued: Dict[str, Any]):
+    """Build the 202 response for a freshly enqueued (or coalesced) job.
+
+    Args:
+        enqueued: Output of job_queue.enqueue() / enqueue_async()
+
+    Returns:
+        (body, 202, headers) tuple with a Location header pointing at the status route
+    """
+    job = enqueued["job"]
+    status_url = f"/api/jobs/{job['_id']}"
+    body = {
+        "job_id": job["_id"],
+        "status": job["status"],
+        "status_url": status_url,
+        "coalesced": enqueued["coalesced"]
+    }
+    return body, 202, {"Location": status_url}
+
+
+def job_status_response(job: Optional[Dict[str, Any]], job_id: str):
+    """(body, status) for GET /api/jobs/<job_id>, given the job lookup's result."""
+    if not job:
+        return error("job_not_found", f"Job {job_id} not found", 404)
+    return public_job(job), 200
+
+
+@bp.route("/<job_id>", methods=["GET"])
+@require_auth
+def get_job_status(job_id: str):
+    """Get the status of a background job owned by the current user.
+
+    Returns:
+        JSON with job_id, type, status (queued|running|succeeded|failed),
+        attempts, result (once succeeded) and error (last failure)
+    """
+    try:
+        user_id = g.user.get("sub")
+        if not user_id:
+            return invalid_token()
+
+        return job_status_response(get_job(get_db(), user_id, job_id), job_id)
+
+    except Exception as e:
+        return server_error(f"fetching job {job_id}", e)
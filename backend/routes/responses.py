@@ -0,0 +1,32 @@
+"""Response helpers shared by the Flask blueprints and the async routes.
+
+Each helper returns a (body, status) tuple. Flask views and the Quart views
+in asgi_app.py both return it as is, so the two serve identical JSON through
+the same JSON provider.
+"""
+import logging
+from typing import Any, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def error(code: str, message: str, status: int) -> Tuple[Dict[str, Any], int]:
+    """Standard error response: {"error": {"code", "message"}}."""
+    return {"error": {"code": code, "message": message}}, status
+
+
+def invalid_token() -> Tuple[Dict[str, Any], int]:
+    """401 for a verified token that carries no sub claim."""
+    return error("invalid_token", "User ID not found in token", 401)
+
+
+def server_error(action: str, e: Exception, code: str = "server_error") -> Tuple[Dict[str, Any], int]:
+    """Log an unexpected failure and build its 500 response.
+
+    Args:
+        action: What failed, for the log line (e.g. "fetching accounts")
+        e: The exception
+        code: Error code for the response body
+    """
+    logger.error(f"Error {action}: {e}")
+    return error(code, str(e), 500)
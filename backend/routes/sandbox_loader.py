@@ -1,33 +1,50 @@
 """Sandbox data loading routes."""
-import json
 import logging
 from datetime import datetime
 from pathlib import Path
-from flask import Blueprint, jsonify, g
+from flask import Blueprint, jsonify, g, request
 from auth import require_auth
 from db import get_db
 from config import Config
-from services.sandbox_storage_service import (
-    load_json_file,
-    sanitize_payload,
-    upsert_from_payload
-)
+from services.sandbox_storage_service import IJSON_AVAILABLE
+from services.ingest_jobs import SANDBOX_LOAD
+from services.job_queue import enqueue
+from routes.jobs import job_accepted
 
 logger = logging.getLogger(__name__)
 
 bp = Blueprint("sandbox_loader", __name__, url_prefix="/api/sandbox")
 
 
+def _use_streaming(file_path: Path) -> bool:
+    """Whether to parse the file incrementally instead of loading it whole.
+    
+    Streaming is used for files of at least SANDBOX_STREAM_THRESHOLD_BYTES, or
+    when the request passes ?streaming=1, provided ijson is installed.
+    """
+    requested = request.args.get("streaming", "").lower() in ("1", "true", "yes")
+    if not requested and file_path.stat().st_size < Config.SANDBOX_STREAM_THRESHOLD_BYTES:
+        return False
+    if not IJSON_AVAILABLE:
+        logger.warning(f"ijson not installed; loading {file_path} in memory")
+        return False
+    return True
+
+
 @bp.route("/load", methods=["POST"])
 @require_auth
 def load_sandbox():
-    """Load sandbox JSON file and persist to MongoDB.
+    """Queue a load of the sandbox JSON file into MongoDB.
     
-    Reads the JSON file from SANDBOX_JSON_PATH, parses it, sanitizes tokens,
-    and upserts data to MongoDB collections.
+    A job worker reads the JSON file from SANDBOX_JSON_PATH, sanitizes
+    tokens, and upserts data to MongoDB collections through the ingest
+    coordinator (one transaction where supported; reloading an
+    already-applied file replays the previous result).
     
     Returns:
-        JSON with ok status, fileLoaded, counts, and storedAccessToken flag
+        202 with job_id, status and status_url. Poll GET /api/jobs/<job_id>;
+        once succeeded, its result holds counts, unchanged, storedAccessToken,
+        streamed, snapshotStored, dataVersion and replayed.
     """
     try:
         user_id = g.user.get("sub")
@@ -48,39 +65,15 @@ def load_sandbox():
             file_path = backend_dir / file_path
         file_path = file_path.resolve()
         
-        # Load JSON file
-        try:
-            payload = load_json_file(str(file_path))
-        except FileNotFoundError:
+        if not file_path.exists():
             return jsonify({
                 "error": {
                     "code": "file_not_found",
                     "message": f"Sandbox JSON file not found at: {file_path}"
                 }
             }), 404
-        except json.JSONDecodeError as e:
-            return jsonify({
-                "error": {
-                    "code": "invalid_json",
-                    "message": f"Failed to parse JSON file: {str(e)}"
-                }
-            }), 400
-        
-        # Sanitize payload for raw_snapshots
-        sanitized_payload = sanitize_payload(payload)
-        
-        # Store raw snapshot (sanitized)
-        snapshot_doc = {
-            'user_id': user_id,
-            'source': 'local_file',
-            'file_path': str(file_path),
-            'payload': sanitized_payload,
-            'createdAt': datetime.utcnow().isoformat()
-        }
-        db.raw_snapshots.insert_one(snapshot_doc)
         
-        # Upsert data from payload
-        counts = upsert_from_payload(db, user_id, payload)
+        streamed = _use_streaming(file_path)
         
         # Update user record with email/name from JWT if available
         user_update = {}
@@ -99,17 +92,13 @@ def load_sandbox():
                 upsert=True
             )
         
-        return jsonify({
-            'ok': True,
-            'fileLoaded': True,
-            'counts': {
-                'accounts': counts['accounts'],
-                'transactions': counts['transactions'],
-                'holdings': counts['holdings'],
-                'liabilities': counts['liabilities']
-            },
-            'storedAccessToken': counts['storedAccessToken']
-        }), 200
+        # The load itself runs on a job worker; a second click while it is
+        # queued or running returns the same job
+        enqueued = enqueue(db, user_id, SANDBOX_LOAD, {
+            'file_path': str(file_path),
+            'streamed': streamed
+        })
+        return job_accepted(enqueued)
         
     except Exception as e:
         logger.error(f"Error in /api/sandbox/load: {e}", exc_info=True)
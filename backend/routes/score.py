@@ -1,9 +1,20 @@
 """Scoring-related routes."""
-from flask import Blueprint, jsonify, g, request
+from flask import Blueprint, Response, jsonify, g, request, stream_with_context
 from auth import require_auth
 from db import get_db
+from config import Config
 from services.scoring_service import calculate_credit_score
-from services.gemini_service import generate_summary
+from services.score_snapshot_service import get_score_snapshot, load_user_financials
+from services.context_builder import render_digest
+from services.chat_session_service import (
+    create_session,
+    get_session,
+    delete_session,
+    append_exchange,
+    build_session_prompt
+)
+from services.gemini_service import generate_summary, stream_summary, GeminiUnavailableError
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,6 +22,69 @@ logger = logging.getLogger(__name__)
 bp = Blueprint("score", __name__, url_prefix="/api/score")
 
 
+def _wants_stream() -> bool:
+    """Whether the client asked for a streamed (Server-Sent Events) response."""
+    if request.args.get("stream", "").lower() in ("1", "true", "yes"):
+        return True
+    return "text/event-stream" in request.headers.get("Accept", "")
+
+
+def _sse_event(event: str, data: dict) -> str:
+    """Format a single Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _stream_gemini_response(prompt: str, on_complete=None, done_data: dict = None) -> Response:
+    """Relay Gemini output to the client as Server-Sent Events.
+
+    Emits `chunk` events with {"text": ...} as tokens arrive, then a final
+    `done` event (or `error` if generation fails mid-stream). Saturation is
+    raised before the response starts so the caller can still return a 503.
+
+    Args:
+        prompt: Prompt to send to Gemini
+        on_complete: Optional callback receiving the full text once streaming finishes
+        done_data: Extra fields to include in the `done` event
+    """
+    chunks = stream_summary({"prompt": prompt})
+
+    def generate():
+        try:
+            parts = []
+            for text in chunks:
+                parts.append(text)
+                yield _sse_event("chunk", {"text": text})
+            if on_complete is not None:
+                on_complete("".join(parts))
+            yield _sse_event("done", {"model": Config.GEMINI_MODEL, **(done_data or {})})
+        except Exception as e:
+            logger.error(f"Error streaming Gemini response: {e}")
+            yield _sse_event("error", {"error": {"code": "server_error", "message": str(e)}})
+        finally:
+            # Runs on GeneratorExit too, so a client that disconnects mid-stream
+            # gives its Gemini slot back
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _gemini_unavailable(e: GeminiUnavailableError):
+    """503 response for when Gemini is saturated or failing and the request was shed."""
+    logger.warning(f"Gemini request shed ({e.reason}): {e}")
+    return jsonify({
+        "error": {
+            "code": "service_unavailable",
+            "message": str(e)
+        }
+    }), 503, {"Retry-After": str(int(e.retry_after))}
+
+
 @bp.route("/calculate", methods=["GET"])
 @require_auth
 def calculate_score():
@@ -33,36 +107,9 @@ def calculate_score():
         logger.info(f"Calculating credit score for user: {user_id}")
         db = get_db()
         
-        # Fetch transactions
-        transactions = list(db.transactions.find({"user_id": user_id}).limit(500))
-        logger.info(f"Fetched {len(transactions)} transactions")
-        for txn in transactions:
-            txn.pop("_id", None)
-        
-        # Fetch accounts
-        accounts = list(db.accounts.find({"user_id": user_id}))
-        logger.info(f"Fetched {len(accounts)} accounts")
-        for acc in accounts:
-            acc.pop("_id", None)
-        
-        # Fetch holdings (for investments)
-        holdings_list = list(db.holdings.find({"user_id": user_id}))
-        investments = None
-        if holdings_list:
-            investments = {
-                "holdings": holdings_list,
-                "accounts": accounts  # Use accounts as investment accounts if applicable
-            }
-            for holding in investments["holdings"]:
-                holding.pop("_id", None)
-        
-        # Fetch liabilities
-        liabilities_list = list(db.liabilities.find({"user_id": user_id}))
-        liabilities = None
-        if liabilities_list:
-            liabilities = {"liabilities": liabilities_list}
-            for liab in liabilities["liabilities"]:
-                liab.pop("_id", None)
+        # Fetch transactions, accounts, holdings and liabilities
+        transactions, accounts, investments, liabilities = load_user_financials(db, user_id)
+        logger.info(f"Fetched {len(transactions)} transactions, {len(accounts)} accounts")
         
         # Get education_score from query parameter (from frontend localStorage)
         education_score = request.args.get('education_score', 75.0, type=float)
@@ -98,6 +145,10 @@ def calculate_score():
 def analyze_score():
     """Get AI analysis of credit score for authenticated user using Gemini.
     
+    Query params:
+        stream: If true (or Accept: text/event-stream), stream the analysis
+            as Server-Sent Events instead of waiting for the full text
+    
     Returns:
         JSON with AI-generated analysis text
     """
@@ -113,55 +164,17 @@ def analyze_score():
         
         db = get_db()
         
-        # Fetch transactions
-        transactions = list(db.transactions.find({"user_id": user_id}).limit(500))
-        for txn in transactions:
-            txn.pop("_id", None)
-        
-        # Fetch accounts
-        accounts = list(db.accounts.find({"user_id": user_id}))
-        for acc in accounts:
-            acc.pop("_id", None)
-        
-        # Fetch holdings (for investments)
-        holdings_list = list(db.holdings.find({"user_id": user_id}))
-        investments = None
-        if holdings_list:
-            investments = {
-                "holdings": holdings_list,
-                "accounts": accounts  # Use accounts as investment accounts if applicable
-            }
-            for holding in investments["holdings"]:
-                holding.pop("_id", None)
-        
-        # Fetch liabilities
-        liabilities_list = list(db.liabilities.find({"user_id": user_id}))
-        liabilities = None
-        if liabilities_list:
-            liabilities = {"liabilities": liabilities_list}
-            for liab in liabilities["liabilities"]:
-                liab.pop("_id", None)
-        
-        # Calculate credit score first to include in analysis (using same data as calculate endpoint)
-        score_result = calculate_credit_score(
-            transactions=transactions,
-            accounts=accounts if accounts else None,
-            investments=investments,
-            liabilities=liabilities,
-            alternative_income=50000.0,
-            education_score=75.0
-        )
+        # Score + digest come from the cached per-user snapshot
+        snapshot = get_score_snapshot(db, user_id)
+        score_result = snapshot["score"]
+        counts = snapshot["digest"]["counts"]
         
         # Prepare data for Gemini analysis
         analysis_data = {
             "credit_score": score_result.get("credit_score"),
             "breakdown": score_result.get("breakdown"),
-            "total_transactions": len(transactions),
-            "total_accounts": len(accounts),
-            "summary": {
-                "accounts_count": len(accounts),
-                "transactions_count": len(transactions)
-            }
+            "total_transactions": counts["transactions"],
+            "total_accounts": counts["accounts"]
         }
         
         # Generate analysis using Gemini
@@ -180,6 +193,9 @@ Financial Summary:
 
 Provide a concise, actionable analysis in 7-12 sentences with specific recommendations to improve the credit score."""
         
+        if _wants_stream():
+            return _stream_gemini_response(prompt)
+        
         gemini_response = generate_summary({"prompt": prompt})
         
         return jsonify({
@@ -187,6 +203,8 @@ Provide a concise, actionable analysis in 7-12 sentences with specific recommend
             "model": gemini_response.get("model", "gemini-pro")
         }), 200
         
+    except GeminiUnavailableError as e:
+        return _gemini_unavailable(e)
     except Exception as e:
         logger.error(f"Error generating Gemini analysis: {e}")
         return jsonify({
@@ -197,6 +215,32 @@ Provide a concise, actionable analysis in 7-12 sentences with specific recommend
         }), 500
 
 
+CHAT_INSTRUCTIONS = (
+    "Provide a helpful, personalized response as their credit advisor. Answer their question "
+    "based on their current financial situation and credit score. Be specific, actionable, and "
+    "encouraging. Keep your response to exactly 7-12 sentences."
+)
+
+
+def _build_chat_system_context(snapshot: dict) -> str:
+    """Render the advisor preamble and financial context stored once per chat session."""
+    score_result = snapshot["score"]
+    breakdown = score_result["breakdown"]
+    digest_text = render_digest(snapshot["digest"], Config.CHAT_CONTEXT_TOKEN_BUDGET)
+    return f"""You are a financial credit advisor helping a user understand and improve their credit score. You have access to their financial data.
+
+CURRENT CREDIT SCORE: {score_result.get('credit_score')}/100
+
+SCORE BREAKDOWN:
+- Financial Accounts: {breakdown['financial_accounts']['score']}/100 (Weight: {breakdown['financial_accounts']['weight']}%)
+- Alternative Income: {breakdown['alternative_income']['score']}/100 (Weight: {breakdown['alternative_income']['weight']}%)
+- Education/Licenses: {breakdown['education_licenses']['score']}/100 (Weight: {breakdown['education_licenses']['weight']}%)
+- Cash Flow Volatility: {breakdown['cash_flow_volatility']['score']}/100 (Weight: {breakdown['cash_flow_volatility']['weight']}%)
+
+FINANCIAL SUMMARY:
+{digest_text}"""
+
+
 @bp.route("/chat", methods=["POST"])
 @require_auth
 def chat_with_gemini():
@@ -204,11 +248,16 @@ def chat_with_gemini():
     
     Request body:
         {
-            "message": "user's question/message"
+            "message": "user's question/message",
+            "session_id": "optional id from a previous response to continue that conversation"
         }
     
+    Query params:
+        stream: If true (or Accept: text/event-stream), stream the response
+            as Server-Sent Events instead of waiting for the full text
+    
     Returns:
-        JSON with AI response text
+        JSON with AI response text and the session_id to send with follow-ups
     """
     try:
         user_id = g.user.get("sub")
@@ -241,82 +290,43 @@ def chat_with_gemini():
         
         db = get_db()
         
-        # Fetch transactions
-        transactions = list(db.transactions.find({"user_id": user_id}).limit(500))
-        for txn in transactions:
-            txn.pop("_id", None)
-        
-        # Fetch accounts
-        accounts = list(db.accounts.find({"user_id": user_id}))
-        for acc in accounts:
-            acc.pop("_id", None)
-        
-        # Fetch holdings (for investments)
-        holdings_list = list(db.holdings.find({"user_id": user_id}))
-        investments = None
-        if holdings_list:
-            investments = {
-                "holdings": holdings_list,
-                "accounts": accounts
-            }
-            for holding in investments["holdings"]:
-                holding.pop("_id", None)
-        
-        # Fetch liabilities
-        liabilities_list = list(db.liabilities.find({"user_id": user_id}))
-        liabilities = None
-        if liabilities_list:
-            liabilities = {"liabilities": liabilities_list}
-            for liab in liabilities["liabilities"]:
-                liab.pop("_id", None)
-        
-        # Calculate credit score to include in context
-        score_result = calculate_credit_score(
-            transactions=transactions,
-            accounts=accounts if accounts else None,
-            investments=investments,
-            liabilities=liabilities,
-            alternative_income=50000.0,
-            education_score=75.0
-        )
+        # Continue an existing session if the client sent one; otherwise start a new one
+        session = None
+        session_id = data.get("session_id")
+        if session_id:
+            session = get_session(db, user_id, session_id)
+            if not session:
+                logger.info(f"Chat session {session_id} not found or expired, starting a new one")
         
-        # Prepare financial context for Gemini
-        financial_context = {
-            "credit_score": score_result.get("credit_score"),
-            "breakdown": score_result.get("breakdown"),
-            "total_transactions": len(transactions),
-            "total_accounts": len(accounts),
-            "accounts": accounts[:10] if accounts else [],  # Limit to first 10 for context
-            "recent_transactions": transactions[:20] if transactions else []  # Limit to recent 20
-        }
+        if not session:
+            # Score + digest come from the cached per-user snapshot (no per-message scans)
+            snapshot = get_score_snapshot(db, user_id)
+            session = create_session(db, user_id, _build_chat_system_context(snapshot))
         
-        # Build prompt with financial context
-        prompt = f"""You are a financial credit advisor helping a user understand and improve their credit score. You have access to their financial data.
-
-CURRENT CREDIT SCORE: {financial_context['credit_score']}/100
-
-SCORE BREAKDOWN:
-- Financial Accounts: {financial_context['breakdown']['financial_accounts']['score']}/100 (Weight: {financial_context['breakdown']['financial_accounts']['weight']}%)
-- Alternative Income: {financial_context['breakdown']['alternative_income']['score']}/100 (Weight: {financial_context['breakdown']['alternative_income']['weight']}%)
-- Education/Licenses: {financial_context['breakdown']['education_licenses']['score']}/100 (Weight: {financial_context['breakdown']['education_licenses']['weight']}%)
-- Cash Flow Volatility: {financial_context['breakdown']['cash_flow_volatility']['score']}/100 (Weight: {financial_context['breakdown']['cash_flow_volatility']['weight']}%)
-
-FINANCIAL SUMMARY:
-- Total Accounts: {financial_context['total_accounts']}
-- Total Transactions Analyzed: {financial_context['total_transactions']}
-
-USER'S QUESTION: {user_message}
-
-Provide a helpful, personalized response as their credit advisor. Answer their question based on their current financial situation and credit score. Be specific, actionable, and encouraging. Keep your response to exactly 7-12 sentences."""
+        prompt = build_session_prompt(session, user_message, CHAT_INSTRUCTIONS)
+        
+        def record_reply(reply: str) -> None:
+            append_exchange(db, session, user_message, reply)
+        
+        if _wants_stream():
+            return _stream_gemini_response(
+                prompt,
+                on_complete=record_reply,
+                done_data={"session_id": session["_id"]}
+            )
         
         # Generate response using Gemini
         gemini_response = generate_summary({"prompt": prompt})
+        record_reply(gemini_response.get("summary", ""))
         
         return jsonify({
             "response": gemini_response.get("summary", ""),
-            "model": gemini_response.get("model", "gemini-pro")
+            "model": gemini_response.get("model", "gemini-pro"),
+            "session_id": session["_id"]
         }), 200
         
+    except GeminiUnavailableError as e:
+        return _gemini_unavailable(e)
     except Exception as e:
         logger.error(f"Error in Gemini chat: {e}", exc_info=True)
         return jsonify({
@@ -325,3 +335,87 @@ Provide a helpful, personalized response as their credit advisor. Answer their q
                 "message": str(e)
             }
         }), 500
+
+
+@bp.route("/chat/sessions/<session_id>", methods=["GET"])
+@require_auth
+def get_chat_session(session_id):
+    """Get the stored turns of a chat session owned by the current user.
+    
+    Returns:
+        JSON with session_id, summary of older turns, and recent turns
+    """
+    try:
+        user_id = g.user.get("sub")
+        if not user_id:
+            return jsonify({
+                "error": {
+                    "code": "invalid_token",
+                    "message": "User ID not found in token"
+                }
+            }), 401
+        
+        session = get_session(get_db(), user_id, session_id)
+        if not session:
+            return jsonify({
+                "error": {
+                    "code": "not_found",
+                    "message": "Chat session not found or expired"
+                }
+            }), 404
+        
+        return jsonify({
+            "session_id": session["_id"],
+            "summary": session.get("summary", ""),
+            "turns": [
+                {"role": turn["role"], "text": turn["text"], "at": turn["at"].isoformat()}
+                for turn in session.get("turns", [])
+            ]
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error fetching chat session: {e}")
+        return jsonify({
+            "error": {
+                "code": "server_error",
+                "message": str(e)
+            }
+        }), 500
+
+
+@bp.route("/chat/sessions/<session_id>", methods=["DELETE"])
+@require_auth
+def end_chat_session(session_id):
+    """Delete a chat session owned by the current user.
+    
+    Returns:
+        JSON with ok status
+    """
+    try:
+        user_id = g.user.get("sub")
+        if not user_id:
+            return jsonify({
+                "error": {
+                    "code": "invalid_token",
+                    "message": "User ID not found in token"
+                }
+            }), 401
+        
+        if not delete_session(get_db(), user_id, session_id):
+            return jsonify({
+                "error": {
+                    "code": "not_found",
+                    "message": "Chat session not found"
+                }
+            }), 404
+        
+        return jsonify({"ok": True}), 200
+        
+    except Exception as e:
+        logger.error(f"Error deleting chat session: {e}")
+        return jsonify({
+            "error": {
+                "code": "server_error",
+                "message": str(e)
+            }
+        }), 500
@@ -0,0 +1,192 @@
+"""Batch balance refresh across many Plaid items.
+
+refresh_balances_batch() fetches /accounts/balance/get for a list of items
+on a bounded thread pool, with every call gated by a token bucket for the
+Plaid client_id (Plaid rate-limits per client, so all workers and batches
+in a process share one bucket). Results are written to balances in one bulk
+upsert per chunk, and only users whose balances actually changed get a
+data-version bump. A failing item is recorded (in the batch result and on
+its plaid_items document) without failing the rest of the batch.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from config import Config
+from services import repository
+from services.data_version_service import bump_data_version
+from services.scoring_service import get_balance
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitTimeout(Exception):
+    """Raised when no rate-limit token frees up within the wait timeout."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> float:
+        """Take a token if one is available.
+
+        Returns:
+            0 if a token was taken, otherwise seconds until one will be
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, timeout: Optional[float] = None) -> None:
+        """Block until a token is available.
+
+        Raises:
+            RateLimitTimeout: If timeout passes first
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise RateLimitTimeout(f"No rate-limit token within {timeout}s")
+            time.sleep(wait)
+
+
+# One bucket per Plaid client_id, shared across batches in this process
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_rate_limiter(client_id: str) -> TokenBucket:
+    """Return the process-wide token bucket for a Plaid client_id."""
+    with _buckets_lock:
+        bucket = _buckets.get(client_id)
+        if bucket is None:
+            bucket = TokenBucket(Config.PLAID_RATE_LIMIT_PER_SECOND, Config.PLAID_RATE_LIMIT_BURST)
+            _buckets[client_id] = bucket
+        return bucket
+
+
+def _fetch_item(item: Dict[str, Any], bucket: TokenBucket) -> Dict[str, Any]:
+    """Fetch one item's balances. Never raises; failures come back as error."""
+    user_id = item.get(repository.USER_KEY)
+    outcome = {repository.USER_KEY: user_id, "item_id": item.get("item_id"), "accounts": [], "error": None}
+    try:
+        bucket.acquire(timeout=Config.PLAID_RATE_LIMIT_WAIT_SECONDS)
+        balance_resp, err = get_balance(item["access_token"])
+    except Exception as e:
+        outcome["error"] = {"error_code": type(e).__name__, "error_message": str(e)}
+        return outcome
+    if err:
+        outcome["error"] = {"error_code": err.get("error_code"), "error_message": err.get("error_message")}
+    else:
+        outcome["accounts"] = balance_resp.get("accounts", []) if balance_resp else []
+    return outcome
+
+
+def _write_chunk(db, outcomes: List[Dict[str, Any]], now: datetime) -> Dict[str, int]:
+    docs = []
+    for outcome in outcomes:
+        for account in outcome["accounts"]:
+            doc = repository.balance_doc(outcome[repository.USER_KEY], account, now)
+            if doc["account_id"]:
+                docs.append(doc)
+
+    changed, unchanged = repository.split_changed(db, "balances", docs)
+    result = repository.bulk_upsert(db, "balances", changed)
+    for user_id in {doc[repository.USER_KEY] for doc in changed}:
+        bump_data_version(db, user_id)
+    repository.record_balance_refreshes(db, outcomes, now)
+    return {"inserted": result["inserted"], "updated": result["updated"], "unchanged": unchanged}
+
+
+def refresh_balances_batch(
+    db,
+    items: Iterable[Dict[str, Any]],
+    max_workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Refresh balances for many Plaid items.
+
+    Args:
+        db: MongoDB database instance
+        items: plaid_items documents (user_id, item_id, access_token)
+        max_workers: Concurrent Plaid calls (defaults to BALANCE_BATCH_WORKERS)
+        chunk_size: Items fetched per bulk write (defaults to BALANCE_BATCH_CHUNK_SIZE)
+
+    Returns:
+        Dict with items, succeeded, failed, accounts, inserted, updated,
+        unchanged counts and errors (one entry per failed item)
+    """
+    max_workers = max_workers or Config.BALANCE_BATCH_WORKERS
+    chunk_size = chunk_size or Config.BALANCE_BATCH_CHUNK_SIZE
+    bucket = get_rate_limiter(Config.PLAID_CLIENT_ID)
+    totals = {"items": 0, "succeeded": 0, "failed": 0, "accounts": 0, "inserted": 0, "updated": 0, "unchanged": 0}
+    errors: List[Dict[str, Any]] = []
+
+    def process(chunk: List[Dict[str, Any]]) -> None:
+        outcomes = list(pool.map(lambda item: _fetch_item(item, bucket), chunk))
+        written = _write_chunk(db, outcomes, datetime.utcnow())
+        for key, value in written.items():
+            totals[key] += value
+        for outcome in outcomes:
+            totals["items"] += 1
+            if outcome["error"] is None:
+                totals["succeeded"] += 1
+                totals["accounts"] += len(outcome["accounts"])
+            else:
+                totals["failed"] += 1
+                errors.append({
+                    repository.USER_KEY: outcome[repository.USER_KEY],
+                    "item_id": outcome["item_id"],
+                    **outcome["error"],
+                })
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="balance-batch") as pool:
+        chunk: List[Dict[str, Any]] = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                process(chunk)
+                chunk = []
+        if chunk:
+            process(chunk)
+
+    logger.info(
+        f"Batch balance refresh: {totals['succeeded']}/{totals['items']} items, "
+        f"{totals['accounts']} accounts, {totals['failed']} failed in {time.monotonic() - started:.1f}s"
+    )
+    return {**totals, "errors": errors}
+
+
+def refresh_all_balances(db, max_workers: Optional[int] = None) -> Dict[str, Any]:
+    """Refresh balances for every connected Plaid item.
+
+    Items are streamed from plaid_items, so the sweep's memory use is bounded
+    by the chunk size rather than the number of linked items.
+    """
+    items = db.plaid_items.find(
+        {"access_token": {"$exists": True}},
+        {"_id": 0, repository.USER_KEY: 1, "item_id": 1, "access_token": 1}
+    ).batch_size(Config.BALANCE_BATCH_CHUNK_SIZE)
+    return refresh_balances_batch(db, items, max_workers=max_workers)
@@ -0,0 +1,191 @@
+"""Server-side chat sessions for /api/score/chat.
+
+A session stores the financial system context once, then appends turns. When
+the turn list grows past CHAT_SESSION_MAX_TURNS the oldest turns are folded
+into a short running summary, so follow-up prompts stay bounded no matter
+how long the conversation runs. Clients only send the new message.
+
+Each write bumps a version counter and is conditional on the version it
+read, so concurrent messages in one session retry instead of overwriting
+each other's turns.
+"""
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+SESSION_COLLECTION = "chat_sessions"
+
+# Per-turn character caps used when folding old turns into the summary
+SUMMARY_QUESTION_CHARS = 160
+SUMMARY_ANSWER_CHARS = 240
+
+# Attempts at appending an exchange before giving up on a contended session
+APPEND_MAX_ATTEMPTS = 5
+
+
+def _expires_at(now: datetime) -> datetime:
+    return now + timedelta(seconds=Config.CHAT_SESSION_TTL_SECONDS)
+
+
+def create_session(db, user_id: str, system_context: str) -> Dict[str, Any]:
+    """Start a new chat session holding the system context.
+
+    Args:
+        db: MongoDB database instance
+        user_id: User ID from JWT sub claim
+        system_context: Prompt preamble (advisor role + financial context)
+
+    Returns:
+        The new session document
+    """
+    now = datetime.utcnow()
+    session = {
+        "_id": uuid.uuid4().hex,
+        "user_id": user_id,
+        "system_context": system_context,
+        "summary": "",
+        "turns": [],
+        "version": 0,
+        "createdAt": now,
+        "updatedAt": now,
+        "expiresAt": _expires_at(now),
+    }
+    db[SESSION_COLLECTION].insert_one(session)
+    return session
+
+
+def get_session(db, user_id: str, session_id: str) -> Optional[Dict[str, Any]]:
+    """Fetch a session owned by user_id, or None if missing/expired.
+
+    Args:
+        db: MongoDB database instance
+        user_id: User ID from JWT sub claim
+        session_id: Session identifier returned by /api/score/chat
+
+    Returns:
+        Session document or None
+    """
+    session = db[SESSION_COLLECTION].find_one({"_id": session_id, "user_id": user_id})
+    if not session or session.get("expiresAt", datetime.min) <= datetime.utcnow():
+        return None
+    return session
+
+
+def delete_session(db, user_id: str, session_id: str) -> bool:
+    """Delete a session. Returns True if one was removed."""
+    result = db[SESSION_COLLECTION].delete_one({"_id": session_id, "user_id": user_id})
+    return result.deleted_count > 0
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+
+def _fold_turns(summary: str, turns: List[Dict[str, Any]]) -> str:
+    """Append condensed versions of turns to the running summary."""
+    lines = [line for line in summary.split("\n") if line]
+    for turn in turns:
+        if turn["role"] == "user":
+            lines.append(f"User asked: {_clip(turn['text'], SUMMARY_QUESTION_CHARS)}")
+        else:
+            lines.append(f"Advisor said: {_clip(turn['text'], SUMMARY_ANSWER_CHARS)}")
+    # Drop the oldest summary lines once the summary itself exceeds its cap
+    while lines and sum(len(line) + 1 for line in lines) > Config.CHAT_SESSION_SUMMARY_MAX_CHARS:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def _with_exchange(session: Dict[str, Any], user_message: str, reply: str, now: datetime) -> Tuple[List[Dict[str, Any]], str]:
+    """Turns and summary of session after appending an exchange and trimming old turns."""
+    turns = session["turns"] + [
+        {"role": "user", "text": user_message, "at": now},
+        {"role": "model", "text": reply, "at": now},
+    ]
+    summary = session.get("summary", "")
+
+    max_turns = Config.CHAT_SESSION_MAX_TURNS
+    if len(turns) > max_turns:
+        # Fold whole exchanges so the kept window always starts with a user turn
+        overflow = len(turns) - max_turns
+        overflow += overflow % 2
+        summary = _fold_turns(summary, turns[:overflow])
+        turns = turns[overflow:]
+    return turns, summary
+
+
+def _version_filter(version: int) -> Any:
+    # Sessions created before versioning have no version field
+    return {"$in": [0, None]} if version == 0 else version
+
+
+def append_exchange(db, session: Dict[str, Any], user_message: str, reply: str) -> None:
+    """Record a user message and the advisor reply, trimming old turns.
+
+    If another request updated the session since it was read, the session is
+    re-read and the exchange applied on top of the newer turns.
+
+    Args:
+        db: MongoDB database instance
+        session: Session document (updated in place)
+        user_message: The user's message
+        reply: The generated reply
+    """
+    for _ in range(APPEND_MAX_ATTEMPTS):
+        now = datetime.utcnow()
+        version = session.get("version", 0)
+        turns, summary = _with_exchange(session, user_message, reply, now)
+        update = {
+            "turns": turns,
+            "summary": summary,
+            "version": version + 1,
+            "updatedAt": now,
+            "expiresAt": _expires_at(now),
+        }
+        result = db[SESSION_COLLECTION].update_one(
+            {"_id": session["_id"], "version": _version_filter(version)},
+            {"$set": update}
+        )
+        if result.matched_count:
+            session.update(update)
+            return
+
+        latest = get_session(db, session["user_id"], session["_id"])
+        if latest is None:
+            logger.info(f"Chat session {session['_id']} expired or was deleted, exchange not recorded")
+            return
+        session.clear()
+        session.update(latest)
+
+    logger.warning(f"Chat session {session['_id']} is contended, exchange not recorded")
+
+
+def build_session_prompt(session: Dict[str, Any], user_message: str, instructions: str) -> str:
+    """Render the prompt for the next turn of a session.
+
+    Args:
+        session: Session document
+        user_message: The new user message
+        instructions: Closing instructions for the model
+
+    Returns:
+        Prompt text: system context, summary of older turns, recent turns, new question
+    """
+    parts = [session["system_context"]]
+    if session.get("summary"):
+        parts.append(f"EARLIER IN THIS CONVERSATION (summary):\n{session['summary']}")
+    if session.get("turns"):
+        recent = "\n".join(
+            f"{'USER' if turn['role'] == 'user' else 'ADVISOR'}: {turn['text']}"
+            for turn in session["turns"]
+        )
+        parts.append(f"RECENT CONVERSATION:\n{recent}")
+    parts.append(f"USER'S QUESTION: {user_message}")
+    parts.append(instructions)
+    return "\n\n".join(parts)
+
@@ -0,0 +1,214 @@
+"""Compact financial digest used as LLM prompt context.
+
+The digest is computed once per score snapshot (see score_snapshot_service)
+and rendered to text under a token budget, so chat prompts stay small no
+matter how much history a user has.
+"""
+import logging
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rough chars-per-token ratio for English prompt text (good enough for budgeting)
+CHARS_PER_TOKEN = 4
+
+TOP_MERCHANTS = 5
+MAX_MONTHS = 6
+MAX_RECURRING = 5
+MAX_ACCOUNTS = 8
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of a prompt fragment."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _merchant_key(txn: Dict[str, Any]) -> str:
+    return (txn.get("merchant_name") or txn.get("name") or "Unknown").strip()
+
+
+def _summarize_balances(accounts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Per-account balances plus totals by account type."""
+    totals_by_type: Dict[str, float] = defaultdict(float)
+    rows = []
+    for acc in accounts:
+        balances = acc.get("balances") or {}
+        current = balances.get("current")
+        available = balances.get("available")
+        acc_type = acc.get("type") or "other"
+        if current is not None:
+            totals_by_type[acc_type] += float(current)
+        rows.append({
+            "name": acc.get("name"),
+            "type": acc_type,
+            "subtype": acc.get("subtype"),
+            "current": current,
+            "available": available,
+        })
+    return {
+        "accounts": rows,
+        "totals_by_type": {k: round(v, 2) for k, v in sorted(totals_by_type.items())},
+    }
+
+
+def _top_merchants(transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merchants ranked by total absolute transaction amount."""
+    totals: Dict[str, Dict[str, float]] = defaultdict(lambda: {"total": 0.0, "count": 0})
+    for txn in transactions:
+        try:
+            amount = abs(float(txn.get("amount", 0) or 0))
+        except (TypeError, ValueError):
+            continue
+        entry = totals[_merchant_key(txn)]
+        entry["total"] += amount
+        entry["count"] += 1
+    ranked = sorted(totals.items(), key=lambda kv: kv[1]["total"], reverse=True)
+    return [
+        {"merchant": name, "total": round(v["total"], 2), "count": int(v["count"])}
+        for name, v in ranked[:TOP_MERCHANTS]
+    ]
+
+
+def _monthly_net_flow(transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Inflow/outflow/net per YYYY-MM (positive amounts count as inflow, as in scoring)."""
+    months: Dict[str, Dict[str, float]] = defaultdict(lambda: {"inflow": 0.0, "outflow": 0.0})
+    for txn in transactions:
+        date_str = txn.get("date") or ""
+        if len(date_str) < 7:
+            continue
+        try:
+            amount = float(txn.get("amount", 0) or 0)
+        except (TypeError, ValueError):
+            continue
+        if amount > 0:
+            months[date_str[:7]]["inflow"] += amount
+        else:
+            months[date_str[:7]]["outflow"] += abs(amount)
+    return [
+        {
+            "month": month,
+            "inflow": round(v["inflow"], 2),
+            "outflow": round(v["outflow"], 2),
+            "net": round(v["inflow"] - v["outflow"], 2),
+        }
+        for month, v in sorted(months.items())[-MAX_MONTHS:]
+    ]
+
+
+def _recurring_streams(transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merchants charged in at least two distinct months with a stable amount."""
+    by_merchant: Dict[str, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+    for txn in transactions:
+        date_str = txn.get("date") or ""
+        if len(date_str) < 7:
+            continue
+        try:
+            amount = abs(float(txn.get("amount", 0) or 0))
+        except (TypeError, ValueError):
+            continue
+        by_merchant[_merchant_key(txn)][date_str[:7]].append(amount)
+
+    streams = []
+    for merchant, months in by_merchant.items():
+        if len(months) < 2:
+            continue
+        amounts = [a for month_amounts in months.values() for a in month_amounts]
+        mean = sum(amounts) / len(amounts)
+        if mean == 0:
+            continue
+        spread = (max(amounts) - min(amounts)) / mean
+        if spread > 0.25:
+            continue
+        streams.append({
+            "merchant": merchant,
+            "months": len(months),
+            "average_amount": round(mean, 2),
+        })
+    streams.sort(key=lambda s: (s["months"], s["average_amount"]), reverse=True)
+    return streams[:MAX_RECURRING]
+
+
+def build_financial_digest(
+    transactions: List[Dict[str, Any]],
+    accounts: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """Precompute a compact, JSON-serializable digest of a user's finances.
+
+    Args:
+        transactions: Stored transaction documents
+        accounts: Stored account documents
+
+    Returns:
+        Dict with balances, top_merchants, monthly_net_flow, recurring_streams and counts
+    """
+    accounts = accounts or []
+    return {
+        "balances": _summarize_balances(accounts),
+        "top_merchants": _top_merchants(transactions),
+        "monthly_net_flow": _monthly_net_flow(transactions),
+        "recurring_streams": _recurring_streams(transactions),
+        "counts": {
+            "accounts": len(accounts),
+            "transactions": len(transactions),
+        },
+    }
+
+
+def _render_sections(digest: Dict[str, Any]) -> List[List[str]]:
+    """Render each digest section as lines, most important section first."""
+    balances = digest.get("balances") or {}
+    counts = digest.get("counts") or {}
+
+    totals = [f"TOTAL BALANCES: {', '.join(f'{t} ${v:,.2f}' for t, v in (balances.get('totals_by_type') or {}).items()) or 'none'}"]
+    totals.append(
+        f"DATA ON FILE: {counts.get('accounts', 0)} accounts, "
+        f"{counts.get('transactions', 0)} transactions"
+    )
+
+    flow = ["MONTHLY NET FLOW:"] + [
+        f"- {m['month']}: in ${m['inflow']:,.2f}, out ${m['outflow']:,.2f}, net ${m['net']:,.2f}"
+        for m in reversed(digest.get("monthly_net_flow") or [])
+    ]
+    recurring = ["RECURRING PAYMENTS:"] + [
+        f"- {r['merchant']}: ~${r['average_amount']:,.2f} across {r['months']} months"
+        for r in digest.get("recurring_streams") or []
+    ]
+    merchants = ["TOP MERCHANTS:"] + [
+        f"- {m['merchant']}: ${m['total']:,.2f} over {m['count']} transactions"
+        for m in digest.get("top_merchants") or []
+    ]
+    accounts = ["ACCOUNTS:"] + [
+        f"- {a['name']} ({a['type']}/{a['subtype']}): current {a['current']}, available {a['available']}"
+        for a in (balances.get("accounts") or [])[:MAX_ACCOUNTS]
+    ]
+    return [totals, flow, recurring, merchants, accounts]
+
+
+def render_digest(digest: Dict[str, Any], token_budget: int) -> str:
+    """Render a digest to prompt text that fits within token_budget.
+
+    Sections are added in priority order and each is cut line by line once the
+    budget runs out, so the most important facts always make it in.
+
+    Args:
+        digest: Output of build_financial_digest
+        token_budget: Approximate maximum number of tokens for the rendered text
+
+    Returns:
+        Prompt-ready text
+    """
+    lines: List[str] = []
+    used = 0
+    for section in _render_sections(digest):
+        # Skip sections that only have a header
+        if len(section) == 1 and section[0].endswith(":"):
+            continue
+        for line in section:
+            cost = estimate_tokens(line) + 1
+            if used + cost > token_budget:
+                logger.debug(f"Financial context truncated at {used} tokens (budget {token_budget})")
+                return "\n".join(lines)
+            lines.append(line)
+            used += cost
+    return "\n".join(lines)
@@ -0,0 +1,58 @@
+"""Per-user data version counter.
+
+Every ingest that changes data (sandbox load, Plaid sync) bumps the user's
+version exactly once, at commit (see ingest_coordinator). Read endpoints
+derive their ETags from it and caches (summary, score snapshot) are keyed
+on it, so a conditional GET only costs a single indexed lookup on
+user_data_versions when nothing has changed.
+"""
+import logging
+from datetime import datetime
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+VERSION_COLLECTION = "user_data_versions"
+
+
+def get_data_version(db, user_id: str) -> int:
+    """Current data version for a user (0 if nothing has been ingested yet).
+
+    Args:
+        db: MongoDB database instance
+        user_id: User ID from JWT sub claim
+
+    Returns:
+        Version number
+    """
+    doc = db[VERSION_COLLECTION].find_one({"_id": user_id}, {"version": 1})
+    return doc.get("version", 0) if doc else 0
+
+
+async def get_data_version_async(db, user_id: str) -> int:
+    """get_data_version() for a Motor database."""
+    doc = await db[VERSION_COLLECTION].find_one({"_id": user_id}, {"version": 1})
+    return doc.get("version", 0) if doc else 0
+
+
+def bump_data_version(db, user_id: str, session=None) -> int:
+    """Record that a user's stored data changed.
+
+    Args:
+        db: MongoDB database instance
+        user_id: User ID from JWT sub claim
+        session: Optional ClientSession, so the bump commits with the ingest
+
+    Returns:
+        The new version number
+    """
+    doc = db[VERSION_COLLECTION].find_one_and_update(
+        {"_id": user_id},
+        {"$inc": {"version": 1}, "$set": {"updatedAt": datetime.utcnow()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    logger.debug(f"Data version for user {user_id} is now {doc['version']}")
+    return doc["version"]
@@ -0,0 +1,68 @@
+"""Streaming NDJSON export of a user's stored financial data.
+
+Each output line is one JSON object: {"type": <collection>, "data": <document>}.
+Lines are produced straight from Mongo cursors and flushed in small chunks,
+so memory use stays flat regardless of how much history a user has.
+"""
+import logging
+import zlib
+from typing import Iterable, Iterator
+
+import json_provider
+from services import repository
+
+logger = logging.getLogger(__name__)
+
+# Collections included in an export, in output order
+EXPORT_COLLECTIONS = ("accounts", "transactions", "holdings", "liabilities")
+
+# Approximate size of each chunk handed to the WSGI server
+CHUNK_BYTES = 64 * 1024
+
+
+def iter_export_ndjson(db, user_id: str, batch_size: int) -> Iterator[bytes]:
+    """Yield the user's export as NDJSON, in chunks of roughly CHUNK_BYTES.
+
+    Args:
+        db: MongoDB database instance
+        user_id: User ID from JWT sub claim
+        batch_size: Documents fetched per cursor round-trip
+
+    Yields:
+        UTF-8 encoded NDJSON chunks
+    """
+    buffer = []
+    buffered = 0
+    counts = {}
+    for collection in EXPORT_COLLECTIONS:
+        counts[collection] = 0
+        for doc in repository.iter_user_documents(db, collection, user_id, batch_size):
+            line = json_provider.dumps({"type": collection, "data": doc})
+            buffer.append(line)
+            buffered += len(line) + 1
+            counts[collection] += 1
+            if buffered >= CHUNK_BYTES:
+                yield ("\n".join(buffer) + "\n").encode("utf-8")
+                buffer = []
+                buffered = 0
+    if buffer:
+        yield ("\n".join(buffer) + "\n").encode("utf-8")
+    logger.info(f"Exported data for user {user_id}: {counts}")
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Gzip a byte stream incrementally.
+
+    Args:
+        chunks: Uncompressed chunks
+        level: zlib compression level
+
+    Yields:
+        Chunks of a single gzip member
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
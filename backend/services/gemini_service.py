@@ -1,7 +1,15 @@
 """Google Gemini service for AI-powered features."""
+import hashlib
 import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, Optional, Tuple
 import google.generativeai as genai
 from config import Config
+from services.resilience import Call, Dependency, DependencyUnavailableError, get_dependency
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +20,9 @@ _genai_configured = False
 def _configure_gemini() -> None:
     """Configure the Gemini client with API key."""
     global _genai_configured
+    if Config.GEMINI_USE_STUB:
+        _genai_configured = True
+        return
     if not _genai_configured and Config.GEMINI_API_KEY:
         try:
             genai.configure(api_key=Config.GEMINI_API_KEY)
@@ -24,39 +35,418 @@ def _configure_gemini() -> None:
         logger.warning("GEMINI_API_KEY not set, Gemini features will be unavailable")
 
 
+class _StubResponse:
+    """Mimics the parts of a Gemini response object the service reads."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubGenerativeModel:
+    """Local stand-in for genai.GenerativeModel (enable with GEMINI_USE_STUB=true).
+
+    Returns a deterministic reply without network access, streamed word by
+    word when stream=True, so the routes can be exercised offline.
+    """
+
+    def __init__(self, model_name: str, chunk_delay: float = 0.0):
+        self.model_name = model_name
+        self.chunk_delay = chunk_delay
+
+    def _reply(self, prompt: str) -> str:
+        digest = hashlib.sha256(_normalize_prompt(prompt).encode("utf-8")).hexdigest()[:12]
+        return (
+            f"[stub {self.model_name}] Received a prompt of {len(prompt)} characters "
+            f"(digest {digest}). Keep balances positive and pay recurring bills on time."
+        )
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs):
+        reply = self._reply(prompt)
+        if not stream:
+            return _StubResponse(reply)
+        return self._stream(reply)
+
+    def _stream(self, reply: str) -> Iterator[_StubResponse]:
+        words = reply.split(" ")
+        for i, word in enumerate(words):
+            if self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            yield _StubResponse(word if i == len(words) - 1 else word + " ")
+
+
+class GeminiUnavailableError(DependencyUnavailableError):
+    """Raised when a Gemini call is shed (saturated or circuit open); the caller should return 503."""
+
+
+class GeminiClientManager:
+    """Holds long-lived model objects and guards every Gemini call.
+
+    Calls run under the shared "gemini" resilience guards: a bulkhead sized
+    by GEMINI_MAX_CONCURRENCY (callers wait up to
+    GEMINI_QUEUE_TIMEOUT_SECONDS for a slot), a circuit breaker that sheds
+    calls outright while Gemini is failing, and per-endpoint adaptive
+    timeouts capped at GEMINI_TIMEOUT_SECONDS. Shed calls raise
+    GeminiUnavailableError, so a burst of chat requests or a Gemini
+    brownout cannot tie up every web worker.
+    """
+
+    def __init__(self, dependency: Dependency):
+        self.dependency = dependency
+        self.max_concurrency = dependency.bulkhead.max_concurrent
+        self.queue_timeout = dependency.bulkhead.queue_timeout
+        self.call_timeout = dependency.timeouts.maximum
+        self._models: Dict[str, object] = {}
+        self._models_lock = threading.Lock()
+
+    def model(self, model_name: str):
+        """Return the shared model object for model_name (stub or real Gemini)."""
+        with self._models_lock:
+            model = self._models.get(model_name)
+            if model is None:
+                if Config.GEMINI_USE_STUB:
+                    model = StubGenerativeModel(model_name)
+                else:
+                    model = genai.GenerativeModel(model_name)
+                self._models[model_name] = model
+            return model
+
+    def start(self, endpoint: str) -> Call:
+        """Admit a call (the caller must finish() it), or raise GeminiUnavailableError."""
+        try:
+            return self.dependency.start(endpoint)
+        except DependencyUnavailableError as e:
+            raise GeminiUnavailableError(e.dependency, e.reason, str(e), e.retry_after) from None
+
+    @contextmanager
+    def slot(self, endpoint: str = "generate_content"):
+        """Hold a call slot for the duration of the block. Yields the Call."""
+        call = self.start(endpoint)
+        try:
+            yield call
+        except BaseException:
+            call.finish(False)
+            raise
+        call.finish(True)
+
+
+_client_manager: Optional[GeminiClientManager] = None
+_client_manager_lock = threading.Lock()
+
+
+def get_client_manager() -> GeminiClientManager:
+    """Get or create the process-wide Gemini client manager."""
+    global _client_manager
+    if _client_manager is None:
+        with _client_manager_lock:
+            if _client_manager is None:
+                _client_manager = GeminiClientManager(get_dependency("gemini"))
+    return _client_manager
+
+
+def reset_client_manager() -> None:
+    """Drop the model objects (e.g. ones inherited across fork()) and reconfigure on next use."""
+    global _client_manager, _genai_configured
+    with _client_manager_lock:
+        _client_manager = None
+        _genai_configured = False
+
+
+# ---------------------- Response cache ----------------------
+# Cache key -> (expires_at_epoch, summary). Ordered by recency for LRU eviction.
+_memory_cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+# Cache key -> in-flight call shared by concurrent identical prompts
+_inflight: Dict[str, "_InFlightCall"] = {}
+_inflight_lock = threading.Lock()
+
+CACHE_COLLECTION = "gemini_cache"
+
+
+class _InFlightCall:
+    """A single upstream Gemini call that concurrent callers wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.summary: Optional[str] = None
+        self.error: Optional[Exception] = None
+
+
+def _normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so cosmetic prompt differences share a cache entry."""
+    return " ".join(prompt.split())
+
+
+def _cache_key(model_name: str, prompt: str) -> str:
+    """Build the cache key from the model name and normalized prompt hash."""
+    digest = hashlib.sha256(_normalize_prompt(prompt).encode("utf-8")).hexdigest()
+    return f"{model_name}:{digest}"
+
+
+def _cache_enabled() -> bool:
+    return Config.GEMINI_CACHE_MAX_ENTRIES > 0 and Config.GEMINI_CACHE_TTL_SECONDS > 0
+
+
+def _memory_get(key: str) -> Optional[str]:
+    with _cache_lock:
+        entry = _memory_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, summary = entry
+        if expires_at <= time.time():
+            del _memory_cache[key]
+            return None
+        _memory_cache.move_to_end(key)
+        return summary
+
+
+def _memory_put(key: str, summary: str, expires_at: float) -> None:
+    with _cache_lock:
+        _memory_cache[key] = (expires_at, summary)
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > Config.GEMINI_CACHE_MAX_ENTRIES:
+            _memory_cache.popitem(last=False)
+
+
+def _mongo_get(key: str) -> Optional[Tuple[float, str]]:
+    """Look up a cached response in MongoDB. Failures are non-fatal."""
+    try:
+        from db import get_db
+        doc = get_db()[CACHE_COLLECTION].find_one({"_id": key})
+    except Exception as e:
+        logger.warning(f"Gemini cache lookup failed (non-fatal): {e}")
+        return None
+    if not doc:
+        return None
+    expires_at = doc.get("expiresAt")
+    if not expires_at or expires_at <= datetime.utcnow():
+        # TTL monitor runs about once a minute, so expired docs can linger briefly
+        return None
+    remaining = (expires_at - datetime.utcnow()).total_seconds()
+    return time.time() + remaining, doc.get("summary", "")
+
+
+def _mongo_put(key: str, model_name: str, summary: str) -> None:
+    """Store a response in MongoDB. Failures are non-fatal."""
+    now = datetime.utcnow()
+    try:
+        from db import get_db
+        get_db()[CACHE_COLLECTION].update_one(
+            {"_id": key},
+            {"$set": {
+                "model": model_name,
+                "summary": summary,
+                "createdAt": now,
+                "expiresAt": now + timedelta(seconds=Config.GEMINI_CACHE_TTL_SECONDS),
+            }},
+            upsert=True
+        )
+    except Exception as e:
+        logger.warning(f"Gemini cache write failed (non-fatal): {e}")
+
+
+def _cache_get(key: str) -> Optional[str]:
+    """Check the LRU tier, then the Mongo tier (promoting hits into the LRU)."""
+    summary = _memory_get(key)
+    if summary is not None:
+        return summary
+    entry = _mongo_get(key)
+    if entry is None:
+        return None
+    expires_at, summary = entry
+    _memory_put(key, summary, expires_at)
+    return summary
+
+
+def _cache_put(key: str, model_name: str, summary: str) -> None:
+    _memory_put(key, summary, time.time() + Config.GEMINI_CACHE_TTL_SECONDS)
+    _mongo_put(key, model_name, summary)
+
+
+def _generate_text(model_name: str, prompt: str) -> str:
+    """Call Gemini within a concurrency slot and return the generated text."""
+    manager = get_client_manager()
+    with manager.slot() as call:
+        response = manager.model(model_name).generate_content(
+            prompt, request_options={"timeout": call.timeout}
+        )
+    return response.text
+
+
+def _generate_coalesced(key: str, model_name: str, prompt: str) -> str:
+    """Run one upstream call per key; concurrent identical prompts share its result."""
+    with _inflight_lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _InFlightCall()
+            _inflight[key] = call
+
+    if not leader:
+        manager = get_client_manager()
+        if not call.done.wait(timeout=manager.queue_timeout + manager.call_timeout):
+            raise GeminiUnavailableError(
+                "gemini", "coalesced_wait", "Timed out waiting for an identical in-flight request"
+            )
+        if call.error is not None:
+            raise call.error
+        return call.summary
+
+    try:
+        call.summary = _generate_text(model_name, prompt)
+        _cache_put(key, model_name, call.summary)
+        return call.summary
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        call.done.set()
+
+
+def _resolve_prompt(payload: dict) -> str:
+    """Use custom prompt if provided, otherwise generate default."""
+    if "prompt" in payload:
+        return payload["prompt"]
+    return f"Generate a summary for the following data: {payload}"
+
+
 def generate_summary(payload: dict) -> dict:
     """Generate a summary using Gemini AI.
-    
+
+    Responses are cached by model + normalized prompt hash (in-process LRU
+    backed by the gemini_cache collection), and concurrent identical prompts
+    share a single upstream call.
+
     Args:
         payload: Input data dictionary
-        
+
     Returns:
         Dictionary with generated summary/content
-        
+
     Raises:
         ValueError: If Gemini is not configured or generation fails
+        GeminiUnavailableError: If no call slot frees up in time
     """
     _configure_gemini()
-    
+
     if not _genai_configured:
         raise ValueError("Gemini API key not configured")
-    
+
+    model_name = Config.GEMINI_MODEL
+
     try:
-        model = genai.GenerativeModel("gemini-2.5-flash-lite")
-        
-        # Use custom prompt if provided, otherwise generate default
-        if "prompt" in payload:
-            prompt = payload["prompt"]
-        else:
-            prompt = f"Generate a summary for the following data: {payload}"
-        
-        response = model.generate_content(prompt)
-        
+        prompt = _resolve_prompt(payload)
+
+        if not _cache_enabled():
+            return {
+                "summary": _generate_text(model_name, prompt),
+                "model": model_name
+            }
+
+        key = _cache_key(model_name, prompt)
+        cached = _cache_get(key)
+        if cached is not None:
+            return {
+                "summary": cached,
+                "model": model_name,
+                "cached": True
+            }
+
         return {
-            "summary": response.text,
-            "model": "gemini-2.5-flash-lite"
+            "summary": _generate_coalesced(key, model_name, prompt),
+            "model": model_name,
+            "cached": False
         }
+    except GeminiUnavailableError:
+        raise
     except Exception as e:
         logger.error(f"Gemini generation failed: {e}")
         raise ValueError(f"Failed to generate summary: {e}")
 
+
+class _SlotStream:
+    """Iterator over streamed Gemini chunks that owns a concurrency slot.
+
+    The slot is released when the stream is exhausted, fails, or is closed
+    early (e.g. the client disconnects), even if iteration never started.
+    Only an upstream error counts as a failure for the circuit breaker, and
+    only a completed stream as a success; an abandoned stream records nothing.
+    """
+
+    def __init__(self, call: Call, response, key: Optional[str], model_name: str):
+        self._call = call
+        self._chunks = iter(response)
+        self._key = key
+        self._model_name = model_name
+        self._parts = []
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        try:
+            while True:
+                text = next(self._chunks).text
+                if text:
+                    self._parts.append(text)
+                    return text
+        except StopIteration:
+            self._call.finish(True)
+            if self._key is not None:
+                _cache_put(self._key, self._model_name, "".join(self._parts))
+            raise
+        except Exception as e:
+            self._call.finish(False)
+            logger.error(f"Gemini streaming generation failed: {e}")
+            raise ValueError(f"Failed to generate summary: {e}")
+
+    def close(self) -> None:
+        # No-op once the stream finished; otherwise it was abandoned
+        self._call.finish(None)
+
+
+def stream_summary(payload: dict) -> Iterator[str]:
+    """Stream a Gemini summary as text chunks as they are generated.
+
+    A cached response is returned as a single chunk; otherwise a call slot is
+    taken up front (so saturation surfaces before any bytes are sent), the
+    streamed chunks are relayed as they arrive, and the full text is cached
+    once complete.
+
+    Args:
+        payload: Input data dictionary
+
+    Returns:
+        Iterator of text chunks of the generated summary
+
+    Raises:
+        ValueError: If Gemini is not configured or generation fails
+        GeminiUnavailableError: If no call slot frees up in time
+    """
+    _configure_gemini()
+
+    if not _genai_configured:
+        raise ValueError("Gemini API key not configured")
+
+    model_name = Config.GEMINI_MODEL
+    prompt = _resolve_prompt(payload)
+    key = _cache_key(model_name, prompt) if _cache_enabled() else None
+
+    if key is not None:
+        cached = _cache_get(key)
+        if cached is not None:
+            return iter([cached])
+
+    manager = get_client_manager()
+    call = manager.start("stream_generate_content")
+    try:
+        response = manager.model(model_name).generate_content(
+            prompt, stream=True, request_options={"timeout": call.timeout}
+        )
+    except Exception as e:
+        call.finish(False)
+        logger.error(f"Gemini streaming generation failed: {e}")
+        raise ValueError(f"Failed to generate summary: {e}")
+    return _SlotStream(call, response, key, model_name)
@@ -0,0 +1,358 @@
+"""MongoDB index declarations and query-plan self-check.
+
+Every index is declared next to the query shape it serves, and
+verify_query_plans() runs explain() on each shape at startup to report any
+query that still falls back to a collection scan or an in-memory sort.
+
+Startup never drops an index. An existing index whose options differ from
+its declaration (e.g. now unique) is reported as a conflict; rebuild it
+explicitly with `python migrate.py --rebuild-indexes`.
+
+Until the legacy user key migration is recorded as complete, reads match
+`userId` as well as `user_id` (repository.user_filter), so the userId indexes
+and the $or query shapes are declared and checked too. Drop the userId
+indexes with `python migrate.py --drop-legacy-indexes` once it has run.
+"""
+import logging
+from typing import Any, Dict, List
+
+from pymongo.errors import OperationFailure
+
+from config import Config
+from services.repository import legacy_keys_migrated
+
+logger = logging.getLogger(__name__)
+
+# Each spec: collection, index keys, create_index options, and the query it serves
+INDEX_SPECS: List[Dict[str, Any]] = [
+    # --- accounts ---
+    {"collection": "accounts", "keys": [("user_id", 1), ("account_id", 1)], "options": {"unique": True},
+     "serves": "sandbox upsert by (user_id, account_id); /api/data/accounts"},
+    {"collection": "accounts", "keys": [("user_id", 1), ("type", 1)], "options": {},
+     "serves": "dashboard summary depository balance $lookup"},
+
+    # --- transactions ---
+    {"collection": "transactions", "keys": [("user_id", 1), ("transaction_id", 1)], "options": {"unique": True},
+     "serves": "sandbox upsert by (user_id, transaction_id)"},
+    {"collection": "transactions", "keys": [("user_id", 1), ("amount", 1)], "options": {},
+     "serves": "dashboard summary spend $match (amount < 0)"},
+    {"collection": "transactions", "keys": [("user_id", 1), ("date", -1), ("_id", -1)], "options": {},
+     "serves": "keyset-paged transaction listings (date range + cursor) and scoring"},
+
+    # --- balances / Plaid items / income ---
+    {"collection": "balances", "keys": [("user_id", 1), ("account_id", 1)], "options": {"unique": True},
+     "serves": "/api/balances and Plaid balances sync upsert"},
+    {"collection": "plaid_items", "keys": [("user_id", 1)], "options": {},
+     "serves": "repository.get_plaid_item / get_plaid_item_async (Plaid sync routes and ingest jobs)"},
+    {"collection": "plaid_items", "keys": [("last_refreshed_at", 1)], "options": {},
+     "serves": "refresh scheduler: stalest items first"},
+    {"collection": "income", "keys": [("user_id", 1)], "options": {},
+     "serves": "/api/income"},
+
+    # --- holdings / liabilities ---
+    {"collection": "holdings", "keys": [("user_id", 1), ("account_id", 1), ("security_id", 1)],
+     "options": {"unique": True}, "serves": "sandbox upsert; /api/data/holdings"},
+    {"collection": "liabilities", "keys": [("user_id", 1), ("account_id", 1), ("liability_type", 1)],
+     "options": {"unique": True}, "serves": "sandbox upsert; /api/data/liabilities"},
+
+    # --- sandbox bookkeeping ---
+    {"collection": "raw_snapshots", "keys": [("user_id", 1), ("createdAt", -1)], "options": {},
+     "serves": "latest snapshot per user (dedup check) and keep-N retention"},
+    {"collection": "plaid_tokens", "keys": [("user_id", 1)], "options": {},
+     "serves": "sandbox token upsert"},
+
+    # --- ingest coordinator ---
+    {"collection": "ingest_runs", "keys": [("user_id", 1), ("source", 1), ("key", 1), ("version", 1)],
+     "options": {}, "serves": "idempotent replay lookup in run_ingest"},
+    {"collection": "ingest_runs", "keys": [("createdAt", 1)], "options": {"expireAfterSeconds": 7 * 86400},
+     "serves": "TTL expiry of ingest run records after a week"},
+
+    # --- background jobs ---
+    {"collection": "jobs", "keys": [("active_key", 1)], "options": {"unique": True, "sparse": True},
+     "serves": "per-user job coalescing (one queued/running job per type)"},
+    {"collection": "jobs", "keys": [("status", 1), ("runAt", 1)], "options": {},
+     "serves": "worker claim of the next due job"},
+    {"collection": "jobs", "keys": [("finishedAt", 1)],
+     "options": {"expireAfterSeconds": Config.JOB_RETENTION_HOURS * 3600},
+     "serves": "TTL expiry of finished jobs"},
+
+    # --- AI features ---
+    {"collection": "gemini_cache", "keys": [("expiresAt", 1)], "options": {"expireAfterSeconds": 0},
+     "serves": "TTL expiry of cached Gemini responses"},
+    {"collection": "chat_sessions", "keys": [("expiresAt", 1)], "options": {"expireAfterSeconds": 0},
+     "serves": "TTL expiry of idle chat sessions"},
+    {"collection": "chat_sessions", "keys": [("user_id", 1), ("updatedAt", -1)], "options": {},
+     "serves": "chat sessions per user"},
+]
+
+# userId indexes serving the legacy branch of repository.user_filter's $or; only
+# declared while the legacy key migration is pending
+LEGACY_INDEX_SPECS: List[Dict[str, Any]] = [
+    {"collection": "transactions", "keys": [("userId", 1), ("date", -1), ("_id", -1)], "options": {},
+     "serves": "userId-keyed transaction listings, summary and export until the key migration completes"},
+    {"collection": "balances", "keys": [("userId", 1)], "options": {},
+     "serves": "userId-keyed /api/balances until the key migration completes"},
+    {"collection": "plaid_items", "keys": [("userId", 1)], "options": {},
+     "serves": "userId-keyed repository.get_plaid_item until the key migration completes"},
+    {"collection": "income", "keys": [("userId", 1)], "options": {},
+     "serves": "userId-keyed /api/income until the key migration completes"},
+]
+
+# Optional TTL on raw snapshots (on top of the keep-N retention in snapshot_store).
+# Changing RAW_SNAPSHOT_TTL_DAYS later needs a collMod or dropping the index.
+if Config.RAW_SNAPSHOT_TTL_DAYS > 0:
+    INDEX_SPECS.append(
+        {"collection": "raw_snapshots", "keys": [("createdAt", 1)],
+         "options": {"expireAfterSeconds": Config.RAW_SNAPSHOT_TTL_DAYS * 86400},
+         "serves": "TTL expiry of raw snapshots"}
+    )
+
+# Placeholder user for explain(); the planner picks the same plan for any value
+_CHECK_USER = "__index_self_check__"
+
+# Representative query shapes issued by the routes and services
+QUERY_SHAPES: List[Dict[str, Any]] = [
+    {"name": "data_transactions", "collection": "transactions",
+     "filter": {"user_id": _CHECK_USER}, "sort": [("date", -1), ("_id", -1)]},
+    {"name": "transactions_page", "collection": "transactions",
+     "filter": {"user_id": _CHECK_USER, "date": {"$gte": "2000-01-01", "$lte": "2000-12-31"},
+                "$or": [{"date": {"$lt": "2000-06-01"}}, {"date": "2000-06-01", "_id": {"$lt": "x"}}]},
+     "sort": [("date", -1), ("_id", -1)]},
+    {"name": "transaction_upsert", "collection": "transactions",
+     "filter": {"user_id": _CHECK_USER, "transaction_id": "x"}},
+    {"name": "summary_spend", "collection": "transactions",
+     "filter": {"user_id": _CHECK_USER, "amount": {"$lt": 0}}},
+    {"name": "data_accounts", "collection": "accounts",
+     "filter": {"user_id": _CHECK_USER}},
+    {"name": "summary_depository_accounts", "collection": "accounts",
+     "filter": {"user_id": _CHECK_USER, "type": "depository"}},
+    {"name": "balances", "collection": "balances",
+     "filter": {"user_id": _CHECK_USER}},
+    {"name": "plaid_item", "collection": "plaid_items",
+     "filter": {"user_id": _CHECK_USER}},
+    {"name": "income", "collection": "income",
+     "filter": {"user_id": _CHECK_USER}},
+    {"name": "data_holdings", "collection": "holdings",
+     "filter": {"user_id": _CHECK_USER}},
+    {"name": "data_liabilities", "collection": "liabilities",
+     "filter": {"user_id": _CHECK_USER}},
+]
+
+# repository.user_filter() while the legacy key migration is pending
+_LEGACY_USER_FILTER = {"$or": [{"user_id": _CHECK_USER}, {"userId": _CHECK_USER}]}
+
+# The shapes above as they run before the migration completes
+LEGACY_QUERY_SHAPES: List[Dict[str, Any]] = [
+    {"name": "data_transactions_legacy_keys", "collection": "transactions",
+     "filter": _LEGACY_USER_FILTER, "sort": [("date", -1), ("_id", -1)]},
+    {"name": "transactions_page_legacy_keys", "collection": "transactions",
+     "filter": {"$and": [
+         _LEGACY_USER_FILTER,
+         {"date": {"$gte": "2000-01-01", "$lte": "2000-12-31"}},
+         {"$or": [{"date": {"$lt": "2000-06-01"}}, {"date": "2000-06-01", "_id": {"$lt": "x"}}]},
+     ]},
+     "sort": [("date", -1), ("_id", -1)]},
+    {"name": "summary_spend_legacy_keys", "collection": "transactions",
+     "filter": {"$and": [_LEGACY_USER_FILTER, {"amount": {"$lt": 0}}]}},
+    {"name": "balances_legacy_keys", "collection": "balances",
+     "filter": _LEGACY_USER_FILTER},
+    {"name": "plaid_item_legacy_keys", "collection": "plaid_items",
+     "filter": _LEGACY_USER_FILTER},
+    {"name": "income_legacy_keys", "collection": "income",
+     "filter": _LEGACY_USER_FILTER},
+]
+
+# IndexOptionsConflict / IndexKeySpecsConflict
+_INDEX_CONFLICT_CODES = (85, 86)
+
+# Plan stages that mean an index is missing for the shape
+_BAD_STAGES = ("COLLSCAN", "SORT")
+
+
+def _keys_desc(spec: Dict[str, Any]) -> str:
+    return ", ".join(f"{k} {d}" for k, d in spec["keys"])
+
+
+def _legacy_keys_pending(db) -> bool:
+    """Whether reads still match userId (the legacy key migration has not completed)."""
+    try:
+        return not legacy_keys_migrated(db)
+    except Exception as e:
+        logger.warning(f"Could not check user key migration state, assuming it is pending: {e}")
+        return True
+
+
+def ensure_indexes(db) -> List[Dict[str, Any]]:
+    """Create every declared index. Failures are logged per index and non-fatal.
+
+    The userId indexes in LEGACY_INDEX_SPECS are included while the legacy
+    key migration is pending.
+
+    Args:
+        db: MongoDB database instance
+
+    Returns:
+        Specs whose existing index conflicts with the declared options
+        (left as they are; see rebuild_conflicting_indexes)
+    """
+    specs = INDEX_SPECS + (LEGACY_INDEX_SPECS if _legacy_keys_pending(db) else [])
+    conflicts = []
+    for spec in specs:
+        keys_desc = _keys_desc(spec)
+        try:
+            db[spec["collection"]].create_index(spec["keys"], **spec["options"])
+            logger.info(f"Created index on {spec['collection']} ({keys_desc})")
+        except OperationFailure as e:
+            if e.code not in _INDEX_CONFLICT_CODES:
+                logger.warning(f"Failed to create index on {spec['collection']} ({keys_desc}) (non-fatal): {e}")
+                continue
+            logger.error(
+                f"Index on {spec['collection']} ({keys_desc}) exists with different options, not rebuilt. "
+                f"Run `python migrate.py --rebuild-indexes` to replace it: {e}"
+            )
+            conflicts.append(spec)
+        except Exception as e:
+            logger.warning(f"Failed to create index on {spec['collection']} ({keys_desc}) (non-fatal): {e}")
+    return conflicts
+
+
+def rebuild_conflicting_indexes(db) -> List[Dict[str, Any]]:
+    """Drop and recreate indexes whose options no longer match their declaration.
+
+    An explicit migration step, not run at startup: queries on the collection
+    run without the index until the rebuild finishes, and a new unique index
+    fails to build if existing documents violate it.
+
+    Args:
+        db: MongoDB database instance
+
+    Returns:
+        The specs that were rebuilt
+    """
+    rebuilt = []
+    for spec in ensure_indexes(db):
+        keys_desc = _keys_desc(spec)
+        logger.info(f"Rebuilding index on {spec['collection']} ({keys_desc}) with new options")
+        db[spec["collection"]].drop_index(spec["keys"])
+        db[spec["collection"]].create_index(spec["keys"], **spec["options"])
+        rebuilt.append(spec)
+    return rebuilt
+
+
+def drop_legacy_indexes(db) -> List[Dict[str, Any]]:
+    """Drop the userId indexes once the legacy key migration has completed.
+
+    Args:
+        db: MongoDB database instance
+
+    Returns:
+        The specs whose index was dropped
+
+    Raises:
+        RuntimeError: If the migration is still pending (reads still use them)
+    """
+    if not legacy_keys_migrated(db):
+        raise RuntimeError(
+            "The legacy user key migration has not completed; run `python migrate.py --legacy-user-keys` first"
+        )
+    dropped = []
+    for spec in LEGACY_INDEX_SPECS:
+        collection = db[spec["collection"]]
+        existing = [list(info["key"]) for info in collection.index_information().values()]
+        if list(spec["keys"]) not in existing:
+            continue
+        collection.drop_index(spec["keys"])
+        logger.info(f"Dropped legacy index on {spec['collection']} ({_keys_desc(spec)})")
+        dropped.append(spec)
+    return dropped
+
+
+def _plan_stages(plan: Any) -> List[str]:
+    """Collect stage names from an explain() winning plan (classic or SBE layout)."""
+    stages: List[str] = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for key, value in plan.items():
+            if key == "slotBasedPlan":
+                continue
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+def _query_shapes(db) -> List[Dict[str, Any]]:
+    return QUERY_SHAPES + (LEGACY_QUERY_SHAPES if _legacy_keys_pending(db) else [])
+
+
+def verify_query_plans(db) -> List[Dict[str, Any]]:
+    """Explain each known query shape and report those without index support.
+
+    While the legacy key migration is pending, the $or shapes in
+    LEGACY_QUERY_SHAPES are checked as well, since those are what runs.
+
+    Args:
+        db: MongoDB database instance
+
+    Returns:
+        List of problems: {query, collection, issue, stages}. Empty when every
+        shape is served by an index without an in-memory sort.
+    """
+    problems = []
+    for shape in _query_shapes(db):
+        try:
+            cursor = db[shape["collection"]].find(shape["filter"])
+            if shape.get("sort"):
+                cursor = cursor.sort(shape["sort"])
+            explain = cursor.limit(50).explain()
+        except Exception as e:
+            logger.warning(f"Index self-check could not explain {shape['name']}: {e}")
+            continue
+
+        stages = _plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        for bad in _BAD_STAGES:
+            if bad in stages:
+                problems.append({
+                    "query": shape["name"],
+                    "collection": shape["collection"],
+                    "issue": bad,
+                    "stages": stages,
+                })
+    return problems
+
+
+def run_index_self_check(db) -> List[Dict[str, Any]]:
+    """Ensure indexes, then verify query plans and log any regressions.
+
+    Args:
+        db: MongoDB database instance
+
+    Returns:
+        Index conflicts (issue INDEX_CONFLICT) followed by the problems
+        reported by verify_query_plans
+    """
+    problems = [
+        {
+            "query": f"index ({_keys_desc(spec)})",
+            "collection": spec["collection"],
+            "issue": "INDEX_CONFLICT",
+            "stages": [],
+        }
+        for spec in ensure_indexes(db)
+    ]
+    if Config.INDEX_SELF_CHECK:
+        plan_problems = verify_query_plans(db)
+        for problem in plan_problems:
+            logger.warning(
+                f"Index self-check: query '{problem['query']}' on {problem['collection']} "
+                f"uses {problem['issue']} (plan stages: {' > '.join(problem['stages'])})"
+            )
+        problems.extend(plan_problems)
+
+    if problems:
+        logger.error(f"Index self-check failed: {len(problems)} problem(s)")
+    elif Config.INDEX_SELF_CHECK:
+        logger.info(f"Index self-check passed for {len(_query_shapes(db))} query shapes")
+    return problems
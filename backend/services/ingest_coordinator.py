@@ -0,0 +1,232 @@
+"""Ingest coordinator: atomic, idempotent multi-collection writes.
+
+Every ingest (sandbox load, Plaid transactions/balances sync) runs its
+writes through run_ingest(), which:
+
+- runs them inside a MongoDB transaction when the deployment supports it
+  (replica set or sharded cluster), so a failure halfway leaves nothing
+  half-applied;
+- records the run in ingest_runs under an idempotency key derived from the
+  payload hash, so a retry of an ingest that already committed replays the
+  stored result instead of redoing the writes;
+- bumps the user's data version once, at commit, and only if something
+  changed. Caches and score snapshots key off that version.
+
+Streamed sandbox loads are too large for a single transaction; they run
+their batched (idempotent) upserts outside one and commit the run record
+and version bump at the end.
+"""
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from config import Config
+from services import repository
+from services.data_version_service import bump_data_version, get_data_version
+from services.sandbox_storage_service import (
+    file_sha256,
+    load_json_file,
+    sanitize_payload,
+    stream_upsert_from_file,
+    upsert_from_payload
+)
+from services.snapshot_store import payload_hash, store_snapshot
+
+logger = logging.getLogger(__name__)
+
+RUNS_COLLECTION = "ingest_runs"
+
+# Cached result of the deployment's transaction support check
+_transactions_supported: Optional[bool] = None
+
+
+def transactions_supported(db) -> bool:
+    """Whether the connected deployment can run multi-document transactions."""
+    global _transactions_supported
+    if _transactions_supported is None:
+        try:
+            hello = db.client.admin.command("hello")
+        except Exception:
+            hello = db.client.admin.command("isMaster")
+        _transactions_supported = bool(hello.get("setName") or hello.get("msg") == "isdbgrid")
+        logger.info(f"MongoDB transactions {'enabled' if _transactions_supported else 'not supported'} for ingest")
+    return _transactions_supported
+
+
+def _replay(run: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "result": run["result"],
+        "version": run["version"],
+        "replayed": True,
+        "transactional": run.get("transactional", False),
+    }
+
+
+def run_ingest(
+    db,
+    user_id: str,
+    source: str,
+    key: str,
+    write: Callable[[Any], Tuple[Dict[str, Any], bool]],
+    use_transaction: bool = True,
+) -> Dict[str, Any]:
+    """Run an ingest's writes atomically and at most once per payload.
+
+    A run is identified by (user_id, source, key, base data version). If the
+    run that produced the user's current data version had the same key, the
+    payload is already applied and its stored result is returned. Loading
+    A, then B, then A again still re-applies A, because the version moved.
+
+    Args:
+        db: MongoDB database instance
+        user_id: User ID from JWT sub claim
+        source: Ingest source (e.g. "sandbox_load", "plaid_transactions")
+        key: Idempotency key, normally the payload's content hash
+        write: Callable taking a ClientSession (or None) and returning
+            (result, changed). result must be BSON-serializable.
+        use_transaction: Set False for writes too large for one transaction
+
+    Returns:
+        Dict with result, version (data version after the run), replayed
+        and transactional
+    """
+    base_version = get_data_version(db, user_id)
+    previous = db[RUNS_COLLECTION].find_one(
+        {"user_id": user_id, "source": source, "key": key, "version": base_version}
+    )
+    if previous:
+        logger.info(f"Ingest {source} for user {user_id} already applied ({key[:12]}), replaying result")
+        return _replay(previous)
+
+    run_id = f"{user_id}:{source}:{key}:{base_version}"
+    transactional = use_transaction and transactions_supported(db)
+
+    def commit(session) -> Tuple[Dict[str, Any], int]:
+        result, changed = write(session)
+        version = bump_data_version(db, user_id, session=session) if changed else base_version
+        # Inserting the run last makes it the commit marker outside a transaction;
+        # a concurrent duplicate ingest fails here on the _id
+        db[RUNS_COLLECTION].insert_one({
+            "_id": run_id,
+            "user_id": user_id,
+            "source": source,
+            "key": key,
+            "baseVersion": base_version,
+            "version": version,
+            "changed": changed,
+            "result": result,
+            "transactional": transactional,
+            "createdAt": datetime.utcnow(),
+        }, session=session)
+        return result, version
+
+    try:
+        if transactional:
+            with db.client.start_session() as session:
+                result, version = session.with_transaction(commit)
+        else:
+            result, version = commit(None)
+    except DuplicateKeyError:
+        run = db[RUNS_COLLECTION].find_one({"_id": run_id})
+        if run is None:
+            raise
+        logger.info(f"Concurrent ingest {source} for user {user_id} committed first, replaying result")
+        return _replay(run)
+
+    return {"result": result, "version": version, "replayed": False, "transactional": transactional}
+
+
+def _counts_changed(counts: Dict[str, Any]) -> bool:
+    return any(
+        counts[collection] > unchanged
+        for collection, unchanged in counts["unchanged"].items()
+    )
+
+
+def ingest_sandbox_file(db, user_id: str, file_path: Path, streamed: bool) -> Dict[str, Any]:
+    """Load a sandbox JSON file for a user through the coordinator.
+
+    Args:
+        db: MongoDB database instance
+        user_id: User ID from JWT sub claim
+        file_path: Resolved path of the sandbox file
+        streamed: Parse incrementally (ijson) instead of loading the file whole
+
+    Returns:
+        run_ingest() output; result holds the upsert counts plus snapshotStored
+
+    Raises:
+        FileNotFoundError: If the file doesn't exist
+        json.JSONDecodeError: If the file is not valid JSON
+    """
+    if streamed:
+        # The snapshot records the file's identity rather than a copy of its contents
+        file_hash = file_sha256(str(file_path))
+
+        def write(session):
+            counts = stream_upsert_from_file(db, user_id, str(file_path), Config.INGEST_BATCH_SIZE)
+            snapshot = store_snapshot(
+                db, user_id, "local_file", str(file_path),
+                content_hash=file_hash,
+                extra={"streamed": True, "fileBytes": file_path.stat().st_size}
+            )
+            counts["snapshotStored"] = snapshot["stored"]
+            return counts, _counts_changed(counts)
+
+        return run_ingest(db, user_id, "sandbox_load", file_hash, write, use_transaction=False)
+
+    payload = load_json_file(str(file_path))
+    sanitized_payload = sanitize_payload(payload)
+    key = payload_hash(sanitized_payload)
+
+    def write(session):
+        # Raw snapshot (sanitized, compressed, skipped if unchanged)
+        snapshot = store_snapshot(
+            db, user_id, "local_file", str(file_path),
+            payload=sanitized_payload, content_hash=key, session=session
+        )
+        counts = upsert_from_payload(db, user_id, payload, session=session)
+        counts["snapshotStored"] = snapshot["stored"]
+        return counts, _counts_changed(counts)
+
+    return run_ingest(db, user_id, "sandbox_load", key, write)
+
+
+def ingest_plaid_transactions(db, user_id: str, transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Store transactions fetched from Plaid through the coordinator.
+
+    Returns:
+        run_ingest() output; result holds inserted/updated/unchanged counts
+    """
+    def write(session):
+        now = datetime.utcnow()
+        docs = [repository.transaction_doc(user_id, txn, now) for txn in transactions]
+        result = repository.bulk_upsert(db, "transactions", docs, session=session)
+        return result, bool(result["inserted"] or result["updated"])
+
+    return run_ingest(db, user_id, "plaid_transactions", payload_hash(transactions), write)
+
+
+def ingest_plaid_balances(db, user_id: str, accounts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Store balances fetched from Plaid through the coordinator.
+
+    Returns:
+        run_ingest() output; result holds inserted/updated/unchanged and accounts counts
+    """
+    def write(session):
+        now = datetime.utcnow()
+        docs = []
+        for account in accounts:
+            doc = repository.balance_doc(user_id, account, now)
+            if not doc["account_id"]:
+                logger.warning(f"Skipping account without ID: {account}")
+                continue
+            docs.append(doc)
+        result = repository.bulk_upsert(db, "balances", docs, session=session)
+        result["accounts"] = len(docs)
+        return result, bool(result["inserted"] or result["updated"])
+
+    return run_ingest(db, user_id, "plaid_balances", payload_hash(accounts), write)
@@ -0,0 +1,140 @@
+"""Job handlers for background ingests.
+
+Each handler runs one ingest through the ingest coordinator, so a retried
+job that had already committed replays its stored result instead of
+writing twice.
+"""
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict
+
+from services import repository
+from services.ingest_coordinator import ingest_plaid_balances, ingest_plaid_transactions, ingest_sandbox_file
+from services.job_queue import PermanentJobError, register_handler
+from services.score_snapshot_service import get_score_snapshot
+from services.scoring_service import get_balance, get_transactions
+
+logger = logging.getLogger(__name__)
+
+SANDBOX_LOAD = "sandbox_load"
+PLAID_TRANSACTIONS_SYNC = "plaid_transactions_sync"
+PLAID_BALANCES_SYNC = "plaid_balances_sync"
+PLAID_REFRESH = "plaid_refresh"
+
+# Plaid errors that need the user to act (re-link, etc.); retrying can't help
+PERMANENT_PLAID_ERRORS = ("ITEM_LOGIN_REQUIRED", "INVALID_ACCESS_TOKEN", "INVALID_API_KEYS", "ITEM_NOT_FOUND")
+
+
+def _access_token(db, user_id: str) -> str:
+    item = repository.get_plaid_item(db, user_id)
+    if not item or "access_token" not in item:
+        raise PermanentJobError(
+            "plaid_not_connected",
+            "User has not connected a Plaid account. Call /api/plaid/exchange first."
+        )
+    return item["access_token"]
+
+
+def _raise_plaid_error(err: Dict[str, Any], action: str) -> None:
+    error_code = err.get("error_code") or err.get("response", {}).get("error_code", "UNKNOWN_ERROR")
+    error_message = err.get("error_message") or err.get("response", {}).get("error_message", str(err))
+    message = error_message or f"Failed to {action}: {error_code}"
+    if error_code in PERMANENT_PLAID_ERRORS:
+        raise PermanentJobError("plaid_error", message)
+    # Transient (rate limit, network, PRODUCT_NOT_READY...): let the queue retry
+    raise RuntimeError(message)
+
+
+def run_sandbox_load(db, job: Dict[str, Any]) -> Dict[str, Any]:
+    """Load the sandbox file named in the job params.
+
+    Returns:
+        Counts in the same shape /api/sandbox/load returned synchronously
+    """
+    params = job["params"]
+    file_path = Path(params["file_path"])
+    streamed = params.get("streamed", False)
+    try:
+        run = ingest_sandbox_file(db, job["user_id"], file_path, streamed)
+    except FileNotFoundError:
+        raise PermanentJobError("file_not_found", f"Sandbox JSON file not found at: {file_path}")
+    except json.JSONDecodeError as e:
+        raise PermanentJobError("invalid_json", f"Failed to parse JSON file: {str(e)}")
+    counts = run["result"]
+    return {
+        "counts": {
+            "accounts": counts["accounts"],
+            "transactions": counts["transactions"],
+            "holdings": counts["holdings"],
+            "liabilities": counts["liabilities"]
+        },
+        "unchanged": counts["unchanged"],
+        "storedAccessToken": counts["storedAccessToken"],
+        "streamed": streamed,
+        "snapshotStored": counts["snapshotStored"],
+        "dataVersion": run["version"],
+        "replayed": run["replayed"]
+    }
+
+
+def run_plaid_transactions_sync(db, job: Dict[str, Any]) -> Dict[str, Any]:
+    """Fetch the last 90 days of transactions from Plaid and store them.
+
+    Returns:
+        Dict with inserted, updated and unchanged counts
+    """
+    user_id = job["user_id"]
+    transactions, err = get_transactions(_access_token(db, user_id))
+    if err:
+        _raise_plaid_error(err, "fetch transactions")
+
+    result = ingest_plaid_transactions(db, user_id, transactions or [])["result"]
+    logger.info(
+        f"Synced transactions for user {user_id}: {result['inserted']} inserted, "
+        f"{result['updated']} updated, {result['unchanged']} unchanged"
+    )
+    return {"inserted": result["inserted"], "updated": result["updated"], "unchanged": result["unchanged"]}
+
+
+def run_plaid_balances_sync(db, job: Dict[str, Any]) -> Dict[str, Any]:
+    """Fetch real-time balances from Plaid and store them.
+
+    Returns:
+        Dict with the account count
+    """
+    user_id = job["user_id"]
+    balance_resp, err = get_balance(_access_token(db, user_id))
+    if err:
+        _raise_plaid_error(err, "fetch balances")
+
+    accounts = balance_resp.get("accounts", []) if balance_resp else []
+    count = ingest_plaid_balances(db, user_id, accounts)["result"]["accounts"]
+    logger.info(f"Synced balances for user {user_id}: {count} accounts")
+    return {"accounts": count}
+
+
+def run_plaid_refresh(db, job: Dict[str, Any]) -> Dict[str, Any]:
+    """Scheduled refresh: sync transactions and balances, then warm the score snapshot.
+
+    Returns:
+        Dict with the transactions and balances sync results and the score
+    """
+    user_id = job["user_id"]
+    transactions = run_plaid_transactions_sync(db, job)
+    balances = run_plaid_balances_sync(db, job)
+    # Recomputes only if the syncs changed the data version (or the snapshot expired)
+    snapshot = get_score_snapshot(db, user_id)
+    repository.mark_plaid_item_refreshed(db, user_id, datetime.utcnow())
+    return {
+        "transactions": transactions,
+        "balances": balances,
+        "credit_score": snapshot["score"].get("credit_score")
+    }
+
+
+register_handler(SANDBOX_LOAD, run_sandbox_load)
+register_handler(PLAID_TRANSACTIONS_SYNC, run_plaid_transactions_sync)
+register_handler(PLAID_BALANCES_SYNC, run_plaid_balances_sync)
+register_handler(PLAID_REFRESH, run_plaid_refresh)
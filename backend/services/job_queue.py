@@ -0,0 +1,351 @@
+"""MongoDB-backed background job queue.
+
+Slow ingests (sandbox loads, Plaid syncs) are enqueued here and executed by
+worker threads, so HTTP requests return 202 straight away and ingest
+throughput is governed by JOB_WORKERS rather than request timeouts.
+
+- Coalescing: while a job of a given type is queued or running for a user,
+  enqueueing the same type again returns that job instead of a new one (a
+  unique sparse index on active_key enforces this across processes).
+- Claiming: workers claim jobs with an atomic find_one_and_update and hold a
+  lease, renewed by a heartbeat while the handler runs; a job whose worker
+  died is reclaimed once its lease expires.
+- Retries: failed attempts are re-queued with exponential backoff up to
+  max_attempts. Handlers raise PermanentJobError for failures a retry can't fix.
+
+Workers run in the web process (start_workers, from app.py) and/or in a
+separate process (worker.py).
+"""
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = "jobs"
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+
+# Longest delay between retries, whatever the attempt count
+MAX_RETRY_DELAY_SECONDS = 300
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler for failures that retrying won't fix."""
+
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+# Job type -> handler(db, job) returning a BSON-serializable result dict
+_handlers: Dict[str, Callable[[Any, Dict[str, Any]], Dict[str, Any]]] = {}
+
+
+def register_handler(job_type: str, handler: Callable[[Any, Dict[str, Any]], Dict[str, Any]]) -> None:
+    """Register the function that executes jobs of job_type."""
+    _handlers[job_type] = handler
+
+
+def _active_key(user_id: str, job_type: str) -> str:
+    return f"{user_id}:{job_type}"
+
+
+def public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Client-facing view of a job document."""
+    return {
+        "job_id": job["_id"],
+        "type": job["type"],
+        "status": job["status"],
+        "attempts": job.get("attempts", 0),
+        "max_attempts": job.get("max_attempts", 1),
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "createdAt": job.get("createdAt"),
+        "startedAt": job.get("startedAt"),
+        "finishedAt": job.get("finishedAt"),
+    }
+
+
+def _new_job(user_id: str, job_type: str, params: Optional[Dict[str, Any]], max_attempts: Optional[int]) -> Dict[str, Any]:
+    now = datetime.utcnow()
+    return {
+        "_id": uuid.uuid4().hex,
+        "type": job_type,
+        "user_id": user_id,
+        "params": params or {},
+        "status": STATUS_QUEUED,
+        "active_key": _active_key(user_id, job_type),
+        "attempts": 0,
+        "max_attempts": max_attempts or Config.JOB_MAX_ATTEMPTS,
+        "result": None,
+        "error": None,
+        "runAt": now,
+        "createdAt": now,
+    }
+
+
+def enqueue(
+    db,
+    user_id: str,
+    job_type: str,
+    params: Optional[Dict[str, Any]] = None,
+    max_attempts: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Queue a job, or return the user's active job of the same type.
+
+    Args:
+        db: MongoDB database instance
+        user_id: User ID from JWT sub claim
+        job_type: Registered job type (e.g. "sandbox_load")
+        params: Handler parameters (BSON-serializable)
+        max_attempts: Attempts before the job is marked failed (defaults to JOB_MAX_ATTEMPTS)
+
+    Returns:
+        Dict with job (the job document) and coalesced (True if an existing
+        active job was returned)
+    """
+    job = _new_job(user_id, job_type, params, max_attempts)
+    try:
+        db[JOBS_COLLECTION].insert_one(job)
+        logger.info(f"Queued {job_type} job {job['_id']} for user {user_id}")
+        return {"job": job, "coalesced": False}
+    except DuplicateKeyError:
+        existing = db[JOBS_COLLECTION].find_one({"active_key": job["active_key"]})
+        if existing is None:
+            # The active job finished between our insert and the lookup; queue afresh
+            return enqueue(db, user_id, job_type, params, max_attempts)
+        logger.info(f"Coalesced {job_type} request for user {user_id} into job {existing['_id']}")
+        return {"job": existing, "coalesced": True}
+
+
+async def enqueue_async(
+    db,
+    user_id: str,
+    job_type: str,
+    params: Optional[Dict[str, Any]] = None,
+    max_attempts: Optional[int] = None,
+) -> Dict[str, Any]:
+    """enqueue() for a Motor database."""
+    job = _new_job(user_id, job_type, params, max_attempts)
+    try:
+        await db[JOBS_COLLECTION].insert_one(job)
+        logger.info(f"Queued {job_type} job {job['_id']} for user {user_id}")
+        return {"job": job, "coalesced": False}
+    except DuplicateKeyError:
+        existing = await db[JOBS_COLLECTION].find_one({"active_key": job["active_key"]})
+        if existing is None:
+            return await enqueue_async(db, user_id, job_type, params, max_attempts)
+        logger.info(f"Coalesced {job_type} request for user {user_id} into job {existing['_id']}")
+        return {"job": existing, "coalesced": True}
+
+
+def get_job(db, user_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+    """Fetch a job owned by user_id, or None."""
+    return db[JOBS_COLLECTION].find_one({"_id": job_id, "user_id": user_id})
+
+
+async def get_job_async(db, user_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+    """get_job() for a Motor database."""
+    return await db[JOBS_COLLECTION].find_one({"_id": job_id, "user_id": user_id})
+
+
+def claim_next(db, worker_id: str) -> Optional[Dict[str, Any]]:
+    """Atomically claim the next runnable job.
+
+    A job is runnable when it is queued and due, or running under an
+    expired lease (its worker died mid-job).
+
+    Args:
+        db: MongoDB database instance
+        worker_id: Identifier recorded on the claimed job
+
+    Returns:
+        The claimed job document, or None if nothing is runnable
+    """
+    now = datetime.utcnow()
+    return db[JOBS_COLLECTION].find_one_and_update(
+        {
+            "type": {"$in": list(_handlers)},
+            "$or": [
+                {"status": STATUS_QUEUED, "runAt": {"$lte": now}},
+                {"status": STATUS_RUNNING, "leaseExpiresAt": {"$lte": now}},
+            ],
+        },
+        {
+            "$set": {
+                "status": STATUS_RUNNING,
+                "workerId": worker_id,
+                "startedAt": now,
+                "leaseExpiresAt": _lease_expiry(),
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("runAt", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def _finish(db, job: Dict[str, Any], status: str, result=None, error=None) -> None:
+    db[JOBS_COLLECTION].update_one(
+        {"_id": job["_id"], "workerId": job["workerId"]},
+        {
+            "$set": {"status": status, "result": result, "error": error, "finishedAt": datetime.utcnow()},
+            # Releases the coalescing slot for the next job of this type
+            "$unset": {"active_key": "", "leaseExpiresAt": ""},
+        },
+    )
+
+
+def _lease_expiry() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=Config.JOB_LEASE_SECONDS)
+
+
+def _renew_lease(db, job: Dict[str, Any], stop: threading.Event) -> None:
+    """Extend the job's lease every third of JOB_LEASE_SECONDS until stop is set."""
+    interval = max(Config.JOB_LEASE_SECONDS / 3, 1)
+    while not stop.wait(interval):
+        try:
+            result = db[JOBS_COLLECTION].update_one(
+                {"_id": job["_id"], "workerId": job["workerId"], "status": STATUS_RUNNING},
+                {"$set": {"leaseExpiresAt": _lease_expiry()}},
+            )
+        except Exception as e:
+            logger.warning(f"Could not renew lease on job {job['_id']}: {e}")
+            continue
+        if result.matched_count == 0:
+            logger.warning(f"Job {job['_id']} ({job['type']}) lease was lost to another worker")
+            return
+
+
+def _start_heartbeat(db, job: Dict[str, Any]) -> threading.Event:
+    """Start renewing the job's lease; set the returned event to stop."""
+    stop = threading.Event()
+    threading.Thread(
+        target=_renew_lease, args=(db, job, stop), name=f"job-lease-{job['_id'][:8]}", daemon=True
+    ).start()
+    return stop
+
+
+def _retry_delay(attempts: int) -> float:
+    return min(Config.JOB_RETRY_BASE_SECONDS * (2 ** (attempts - 1)), MAX_RETRY_DELAY_SECONDS)
+
+
+def run_job(db, job: Dict[str, Any]) -> None:
+    """Execute a claimed job and record its outcome (success, retry, or failure)."""
+    handler = _handlers[job["type"]]
+    heartbeat = _start_heartbeat(db, job)
+    try:
+        result = handler(db, job)
+    except PermanentJobError as e:
+        logger.warning(f"Job {job['_id']} ({job['type']}) failed permanently: {e.code} - {e.message}")
+        _finish(db, job, STATUS_FAILED, error={"code": e.code, "message": e.message})
+        return
+    except Exception as e:
+        error = {"code": "job_error", "message": str(e)}
+        if job["attempts"] >= job["max_attempts"]:
+            logger.error(f"Job {job['_id']} ({job['type']}) failed after {job['attempts']} attempts: {e}", exc_info=True)
+            _finish(db, job, STATUS_FAILED, error=error)
+            return
+        delay = _retry_delay(job["attempts"])
+        logger.warning(f"Job {job['_id']} ({job['type']}) attempt {job['attempts']} failed, retrying in {delay:.0f}s: {e}")
+        db[JOBS_COLLECTION].update_one(
+            {"_id": job["_id"], "workerId": job["workerId"]},
+            {
+                "$set": {"status": STATUS_QUEUED, "error": error, "runAt": datetime.utcnow() + timedelta(seconds=delay)},
+                "$unset": {"leaseExpiresAt": ""},
+            },
+        )
+        return
+    finally:
+        heartbeat.set()
+    _finish(db, job, STATUS_SUCCEEDED, result=result)
+    logger.info(f"Job {job['_id']} ({job['type']}) succeeded for user {job['user_id']}")
+
+
+class JobWorkerPool:
+    """Threads that claim and run jobs until stopped."""
+
+    def __init__(self, db, workers: int, poll_interval: float):
+        self.db = db
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._loop, args=(f"{self._prefix}:{i}",), name=f"job-worker-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.workers} job worker(s)")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop claiming new jobs and wait for in-flight ones to finish."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _loop(self, worker_id: str) -> None:
+        while not self._stop.is_set():
+            try:
+                job = claim_next(self.db, worker_id)
+            except Exception as e:
+                logger.warning(f"Job worker {worker_id} could not claim a job: {e}")
+                job = None
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            try:
+                run_job(self.db, job)
+            except Exception:
+                # e.g. recording the outcome failed; the job is reclaimed once its lease expires
+                logger.exception(f"Job worker {worker_id} could not run job {job['_id']} ({job['type']})")
+
+
+_pool: Optional[JobWorkerPool] = None
+
+
+def start_workers(db, workers: Optional[int] = None) -> Optional[JobWorkerPool]:
+    """Start the process-wide worker pool (no-op if already started or workers is 0).
+
+    Args:
+        db: MongoDB database instance
+        workers: Thread count (defaults to JOB_WORKERS)
+
+    Returns:
+        The running pool, or None when in-process workers are disabled
+    """
+    global _pool
+    workers = Config.JOB_WORKERS if workers is None else workers
+    if _pool is None and workers > 0:
+        # Importing the handlers module registers the job types
+        import services.ingest_jobs  # noqa: F401
+        _pool = JobWorkerPool(db, workers, Config.JOB_POLL_INTERVAL_SECONDS)
+        _pool.start()
+    return _pool
+
+
+def stop_workers(timeout: Optional[float] = None) -> None:
+    """Stop the process-wide worker pool, if running."""
+    global _pool
+    if _pool is not None:
+        _pool.stop(timeout)
+        _pool = None
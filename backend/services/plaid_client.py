@@ -0,0 +1,216 @@
+"""Plaid REST client shared by the routes and services.
+
+All Plaid calls go through plaid_post(), which reuses one pooled HTTP
+session and runs every request under the "plaid" resilience guards
+(bulkhead, circuit breaker, per-endpoint adaptive timeout).
+plaid_post_async() is the httpx-based equivalent for asgi_app.py; it
+shares the circuit breaker and timeouts and returns the same results.
+"""
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+from services.resilience import DependencyUnavailableError, get_dependency
+
+logger = logging.getLogger(__name__)
+
+# Try to import httpx - make it optional (only needed by the async app)
+HTTPX_AVAILABLE = False
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    logger.debug("httpx not available, plaid_post_async is disabled. Install with: pip install httpx")
+
+# Plaid REST API configuration
+BASE_URLS = {
+    "sandbox": "https://sandbox.plaid.com",
+    "development": "https://development.plaid.com",
+    "production": "https://production.plaid.com",
+}
+
+HEADERS = {
+    "Content-Type": "application/json",
+}
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_async_client = None
+
+
+def get_plaid_base_url() -> str:
+    """Get the base URL for Plaid API based on environment (or PLAID_BASE_URL if set)."""
+    if Config.PLAID_BASE_URL:
+        return Config.PLAID_BASE_URL.rstrip("/")
+    return BASE_URLS.get(Config.PLAID_ENV.lower(), BASE_URLS["sandbox"])
+
+
+def _get_session() -> requests.Session:
+    """Process-wide HTTP session, pooled to match the Plaid bulkhead size."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=Config.PLAID_MAX_CONCURRENCY)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def reset_session() -> None:
+    """Drop the pooled session (e.g. one inherited across fork()); the next call creates a new one."""
+    global _session
+    with _session_lock:
+        _session = None
+
+
+def get_async_client():
+    """Process-wide httpx.AsyncClient, pooled to match the async Plaid bulkhead.
+
+    Create it from inside the event loop that will use it.
+    """
+    global _async_client
+    if not HTTPX_AVAILABLE:
+        raise RuntimeError("httpx is not installed. Install with: pip install httpx")
+    if _async_client is None:
+        limits = httpx.Limits(max_connections=Config.ASYNC_PLAID_MAX_CONCURRENCY)
+        _async_client = httpx.AsyncClient(limits=limits, headers=HEADERS)
+    return _async_client
+
+
+async def close_async_client() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def link_token_request(user_id: str) -> Dict[str, Any]:
+    """Body for /link/token/create for a user."""
+    return {
+        "client_id": Config.PLAID_CLIENT_ID,
+        "secret": Config.PLAID_SECRET,
+        "client_name": "OpenScore",
+        "user": {
+            "client_user_id": user_id
+        },
+        "products": Config.PLAID_PRODUCTS,
+        "country_codes": Config.PLAID_COUNTRY_CODES,
+        "language": "en"
+    }
+
+
+def plaid_error_details(err: Dict[str, Any]) -> Tuple[str, str]:
+    """(error_code, error_message) from a plaid_post error dict."""
+    error_code = err.get("error_code") or err.get("response", {}).get("error_code", "UNKNOWN_ERROR")
+    error_message = err.get("error_message") or err.get("response", {}).get("error_message", str(err))
+    return error_code, error_message
+
+
+def _with_credentials(payload: dict) -> dict:
+    # Add client_id and secret to payload if not present
+    if "client_id" not in payload:
+        payload["client_id"] = Config.PLAID_CLIENT_ID
+    if "secret" not in payload:
+        payload["secret"] = Config.PLAID_SECRET
+    return payload
+
+
+def _is_failure(resp) -> bool:
+    # 5xx and 429 count against the circuit; other 4xx are the caller's problem
+    return resp.status_code >= 500 or resp.status_code == 429
+
+
+def _unavailable(path: str, e: DependencyUnavailableError) -> Tuple[None, Dict[str, Any]]:
+    logger.warning(f"Plaid call {path} rejected: {e}")
+    return None, {
+        "error": str(e),
+        "error_code": "PLAID_UNAVAILABLE",
+        "error_message": str(e),
+        "retry_after": e.retry_after
+    }
+
+
+def _parse_response(r) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    try:
+        data = r.json()
+    except Exception:
+        data = {"error": "Non-JSON response", "text": r.text}
+
+    if r.status_code >= 400:
+        # Plaid errors are in the response body, extract them properly
+        error_info = {
+            "status": r.status_code,
+            "response": data
+        }
+        # Plaid error structure: {"error_code": "...", "error_message": "..."}
+        if isinstance(data, dict):
+            if "error_code" in data:
+                error_info["error_code"] = data["error_code"]
+            if "error_message" in data:
+                error_info["error_message"] = data["error_message"]
+        return None, error_info
+
+    return data, None
+
+
+def plaid_post(path: str, payload: dict) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Make a POST request to Plaid API.
+
+    Args:
+        path: API endpoint path (e.g., "/transactions/get")
+        payload: Request payload dictionary
+
+    Returns:
+        Tuple of (response_data, error_dict). If successful, error_dict is None.
+        If error, response_data is None. Requests rejected by the circuit
+        breaker or bulkhead come back with error_code PLAID_UNAVAILABLE.
+    """
+    url = f"{get_plaid_base_url()}{path}"
+    payload = _with_credentials(payload)
+
+    try:
+        r = get_dependency("plaid").call(
+            path,
+            lambda timeout: _get_session().post(url, json=payload, headers=HEADERS, timeout=timeout),
+            is_failure=_is_failure
+        )
+    except DependencyUnavailableError as e:
+        return _unavailable(path, e)
+    except Exception as e:
+        logger.error(f"Plaid API request failed: {e}")
+        return None, {"error": str(e), "error_code": "REQUEST_FAILED"}
+
+    return _parse_response(r)
+
+
+async def plaid_post_async(path: str, payload: dict) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """plaid_post() over httpx.AsyncClient; same arguments and return values.
+
+    Concurrency is bounded by ASYNC_PLAID_MAX_CONCURRENCY rather than the
+    thread bulkhead, so one event loop can hold many slow Plaid calls.
+    """
+    url = f"{get_plaid_base_url()}{path}"
+    payload = _with_credentials(payload)
+    client = get_async_client()
+
+    try:
+        r = await get_dependency("plaid").call_async(
+            path,
+            lambda timeout: client.post(url, json=payload, timeout=timeout),
+            is_failure=_is_failure
+        )
+    except DependencyUnavailableError as e:
+        return _unavailable(path, e)
+    except Exception as e:
+        logger.error(f"Plaid API request failed: {e}")
+        return None, {"error": str(e), "error_code": "REQUEST_FAILED"}
+
+    return _parse_response(r)
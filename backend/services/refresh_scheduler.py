@@ -0,0 +1,142 @@
+"""Scheduled background refresh of connected Plaid items.
+
+Every REFRESH_TICK_SECONDS the scheduler picks up to REFRESH_BATCH_SIZE
+Plaid items that haven't been refreshed for REFRESH_STALE_AFTER_SECONDS,
+least recently refreshed first, and queues a plaid_refresh job for each
+(sync transactions and balances, then precompute the score snapshot). The
+job queue's worker count bounds how many refreshes run at once, and its
+per-user coalescing keeps a scheduled refresh from piling on top of one
+that's still running.
+
+Only one process schedules at a time: each tick first takes a lease on a
+lock document in scheduler_locks, so running several web processes or
+workers doesn't multiply the Plaid traffic.
+"""
+import logging
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from config import Config
+from services import repository
+from services.ingest_jobs import PLAID_REFRESH
+from services.job_queue import enqueue
+
+logger = logging.getLogger(__name__)
+
+LOCKS_COLLECTION = "scheduler_locks"
+LOCK_NAME = "plaid_refresh"
+
+
+def acquire_lease(db, name: str, owner: str, seconds: float) -> bool:
+    """Take (or extend) a named lease. Returns True if owner now holds it.
+
+    Args:
+        db: MongoDB database instance
+        name: Lock name
+        owner: Identifier of the caller
+        seconds: Lease duration
+    """
+    now = datetime.utcnow()
+    try:
+        lock = db[LOCKS_COLLECTION].find_one_and_update(
+            {"_id": name, "$or": [{"expiresAt": {"$lte": now}}, {"owner": owner}]},
+            {"$set": {"owner": owner, "expiresAt": now + timedelta(seconds=seconds)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # Lock exists, unexpired, held by someone else
+        return False
+    return lock is not None and lock.get("owner") == owner
+
+
+def schedule_stale_refreshes(db, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Queue refresh jobs for the stalest Plaid items.
+
+    Args:
+        db: MongoDB database instance
+        now: Current time (defaults to utcnow)
+
+    Returns:
+        Dict with scheduled (jobs queued) and coalesced (items that already
+        had a refresh queued or running)
+    """
+    now = now or datetime.utcnow()
+    stale_before = now - timedelta(seconds=Config.REFRESH_STALE_AFTER_SECONDS)
+    items = repository.find_stale_plaid_items(db, stale_before, Config.REFRESH_BATCH_SIZE)
+
+    scheduled = coalesced = 0
+    user_ids = []
+    for item in items:
+        user_id = item.get(repository.USER_KEY)
+        if not user_id:
+            continue
+        enqueued = enqueue(db, user_id, PLAID_REFRESH)
+        user_ids.append(user_id)
+        if enqueued["coalesced"]:
+            coalesced += 1
+        else:
+            scheduled += 1
+
+    if user_ids:
+        # Keeps the next ticks from picking the same items before their jobs finish
+        repository.mark_plaid_items_scheduled(db, user_ids, now)
+        logger.info(f"Scheduled {scheduled} Plaid refresh job(s) ({coalesced} already in progress)")
+    return {"scheduled": scheduled, "coalesced": coalesced}
+
+
+class RefreshScheduler:
+    """Thread that runs schedule_stale_refreshes() every tick while holding the lease."""
+
+    def __init__(self, db, tick_seconds: float):
+        self.db = db
+        self.tick_seconds = tick_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._loop, name="refresh-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"Started Plaid refresh scheduler (every {self.tick_seconds:.0f}s)")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                # Lease outlives the tick so a live scheduler keeps it between ticks
+                if acquire_lease(self.db, LOCK_NAME, self.owner, self.tick_seconds * 2):
+                    schedule_stale_refreshes(self.db)
+            except Exception as e:
+                logger.warning(f"Plaid refresh scheduling failed: {e}")
+            self._stop.wait(self.tick_seconds)
+
+
+_scheduler: Optional[RefreshScheduler] = None
+
+
+def start_refresh_scheduler(db) -> Optional[RefreshScheduler]:
+    """Start the process-wide scheduler if REFRESH_SCHEDULER_ENABLED (no-op if already started)."""
+    global _scheduler
+    if _scheduler is None and Config.REFRESH_SCHEDULER_ENABLED:
+        _scheduler = RefreshScheduler(db, Config.REFRESH_TICK_SECONDS)
+        _scheduler.start()
+    return _scheduler
+
+
+def stop_refresh_scheduler(timeout: Optional[float] = None) -> None:
+    """Stop the process-wide scheduler, if running."""
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop(timeout)
+        _scheduler = None
@@ -0,0 +1,667 @@
+"""Storage-layer access to per-user financial collections.
+
+Every route and service reads and writes user data through this module so
+there is exactly one user key (user_id), one document shape per collection,
+and one set of indexes serving all reads. Older Plaid-sync documents keyed by
+`userId` are rewritten in place by migrate_legacy_user_keys(), run once with
+`python migrate.py --legacy-user-keys`; its completion is recorded in the
+migrations collection.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, TypedDict
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+# Canonical user key for every per-user collection
+USER_KEY = "user_id"
+# Key used by the original Plaid sync routes
+LEGACY_USER_KEY = "userId"
+
+# Collections that may still contain documents keyed by LEGACY_USER_KEY
+LEGACY_COLLECTIONS = ("transactions", "balances", "plaid_items", "income")
+
+MIGRATION_ID = "user_key_v1"
+
+# Seconds between checks for the migration completing while it is pending
+LEGACY_KEY_RECHECK_SECONDS = 60
+
+# Bookkeeping fields left out of a document's content_hash
+HASH_EXCLUDED_FIELDS = ("updatedAt", "content_hash")
+
+# Sort order shared by every transaction listing (served by (user_id, date, _id))
+TRANSACTION_SORT = [("date", -1), ("_id", -1)]
+
+# Fields (besides USER_KEY) that identify a document in each collection
+UPSERT_KEYS = {
+    "transactions": ("transaction_id",),
+    "accounts": ("account_id",),
+    "balances": ("account_id",),
+    "holdings": ("account_id", "security_id"),
+    "liabilities": ("account_id", "liability_type"),
+}
+
+
+# ---------------------- Document shapes ----------------------
+class TransactionDoc(TypedDict, total=False):
+    user_id: str
+    transaction_id: str
+    account_id: Optional[str]
+    date: Optional[str]
+    authorized_date: Optional[str]
+    name: Optional[str]
+    amount: Optional[float]
+    category: Optional[List[str]]
+    merchant_name: Optional[str]
+    pending: bool
+    payment_channel: Optional[str]
+    raw: Dict[str, Any]
+    updatedAt: str
+
+
+class AccountDoc(TypedDict, total=False):
+    user_id: str
+    account_id: str
+    name: Optional[str]
+    type: Optional[str]
+    subtype: Optional[str]
+    mask: Optional[str]
+    official_name: Optional[str]
+    balances: Dict[str, Any]
+    updatedAt: str
+
+
+class BalanceDoc(TypedDict, total=False):
+    user_id: str
+    account_id: str
+    name: Optional[str]
+    type: Optional[str]
+    subtype: Optional[str]
+    balances: Dict[str, Any]
+    raw: Dict[str, Any]
+    updatedAt: str
+
+
+class HoldingDoc(TypedDict, total=False):
+    user_id: str
+    account_id: str
+    security_id: str
+    quantity: Optional[float]
+    cost_basis: Optional[float]
+    institution_value: Optional[float]
+    raw: Dict[str, Any]
+    updatedAt: str
+
+
+class LiabilityDoc(TypedDict, total=False):
+    user_id: str
+    account_id: str
+    liability_type: str
+    raw: Dict[str, Any]
+    updatedAt: str
+
+
+class PlaidItemDoc(TypedDict, total=False):
+    user_id: str
+    access_token: str
+    item_id: str
+    updated_at: str
+    last_refreshed_at: datetime  # set by the background refresh
+    refresh_scheduled_at: datetime
+    balances_refreshed_at: datetime  # set by the batch balance refresh
+    balance_refresh_error: Dict[str, Any]
+
+
+# ---------------------- Document builders ----------------------
+def transaction_doc(user_id: str, txn: Dict[str, Any], now: datetime) -> TransactionDoc:
+    """Normalize a Plaid transaction (from sync or a sandbox file) into the stored shape."""
+    transaction_id = txn.get("transaction_id") or txn.get("id")
+
+    # Generate deterministic ID if missing
+    if not transaction_id:
+        # Use sha256(user_id + account_id + date + name + amount)
+        txn_str = f"{user_id}{txn.get('account_id', '')}{txn.get('date', '')}{txn.get('name', '')}{txn.get('amount', 0)}"
+        transaction_id = hashlib.sha256(txn_str.encode()).hexdigest()
+
+    return {
+        USER_KEY: user_id,
+        "transaction_id": transaction_id,
+        "account_id": txn.get("account_id"),
+        "date": txn.get("date"),
+        "authorized_date": txn.get("authorized_date"),
+        "name": txn.get("name"),
+        "amount": txn.get("amount"),
+        "category": txn.get("category"),
+        "merchant_name": txn.get("merchant_name"),
+        "pending": txn.get("pending", False),
+        "payment_channel": txn.get("payment_channel"),
+        "raw": txn,
+        "updatedAt": now.isoformat(),
+    }
+
+
+def account_doc(user_id: str, acc: Dict[str, Any], now: datetime) -> AccountDoc:
+    """Normalize a Plaid account into the stored shape."""
+    return {
+        USER_KEY: user_id,
+        "account_id": acc.get("account_id"),
+        "name": acc.get("name"),
+        "type": acc.get("type"),
+        "subtype": acc.get("subtype"),
+        "mask": acc.get("mask"),
+        "official_name": acc.get("official_name"),
+        "balances": acc.get("balances", {}),
+        "updatedAt": now.isoformat(),
+    }
+
+
+def balance_doc(user_id: str, account: Dict[str, Any], now: datetime) -> BalanceDoc:
+    """Normalize an /accounts/balance/get account into the stored shape."""
+    return {
+        USER_KEY: user_id,
+        "account_id": account.get("account_id") or account.get("id"),
+        "name": account.get("name"),
+        "type": account.get("type"),
+        "subtype": account.get("subtype"),
+        "balances": account.get("balances", {}),
+        "raw": account,
+        "updatedAt": now.isoformat(),
+    }
+
+
+def holding_doc(user_id: str, holding: Dict[str, Any], now: datetime) -> HoldingDoc:
+    """Normalize a Plaid investment holding into the stored shape."""
+    return {
+        USER_KEY: user_id,
+        "account_id": holding.get("account_id"),
+        "security_id": holding.get("security_id"),
+        "quantity": holding.get("quantity"),
+        "cost_basis": holding.get("cost_basis"),
+        "institution_value": holding.get("institution_value"),
+        "raw": holding,
+        "updatedAt": now.isoformat(),
+    }
+
+
+def liability_doc(user_id: str, liability: Dict[str, Any], liability_type: str, now: datetime) -> LiabilityDoc:
+    """Normalize a Plaid liability into the stored shape."""
+    return {
+        USER_KEY: user_id,
+        "account_id": liability.get("account_id"),
+        "liability_type": liability_type,
+        "raw": liability,
+        "updatedAt": now.isoformat(),
+    }
+
+
+# ---------------------- Reads ----------------------
+# Set once the legacy key migration is recorded as complete; until then reads also match userId
+_legacy_keys_migrated = False
+
+
+def user_filter(user_id: str) -> Dict[str, Any]:
+    """Query filter selecting a user's documents.
+
+    Until the legacy key migration is recorded as complete this also
+    matches documents keyed by userId, so reads stay complete before and
+    during the rewrite.
+    """
+    if _legacy_keys_migrated:
+        return {USER_KEY: user_id}
+    return {"$or": [{USER_KEY: user_id}, {LEGACY_USER_KEY: user_id}]}
+
+
+def _strip_ids(docs) -> List[Dict[str, Any]]:
+    result = []
+    for doc in docs:
+        doc.pop("_id", None)
+        doc.pop(LEGACY_USER_KEY, None)
+        result.append(doc)
+    return result
+
+
+def find_transactions(db, user_id: str, limit: Optional[int] = None) -> List[TransactionDoc]:
+    """Most recent transactions first."""
+    cursor = db.transactions.find(user_filter(user_id)).sort(TRANSACTION_SORT)
+    if limit:
+        cursor = cursor.limit(limit)
+    return _strip_ids(cursor)
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    """Opaque cursor pointing just past doc in TRANSACTION_SORT order."""
+    _id = doc["_id"]
+    payload = {"d": doc.get("date"), "i": str(_id), "o": isinstance(_id, ObjectId)}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[str], Any]:
+    """Decode a cursor from encode_cursor into its (date, _id) position."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise InvalidCursorError("Invalid pagination cursor") from e
+    if not isinstance(payload, dict) or "i" not in payload:
+        raise InvalidCursorError("Invalid pagination cursor")
+    _id = payload["i"]
+    if payload.get("o"):
+        if not ObjectId.is_valid(_id):
+            raise InvalidCursorError("Invalid pagination cursor")
+        _id = ObjectId(_id)
+    return payload.get("d"), _id
+
+
+def transactions_page_query(
+    user_id: str,
+    cursor: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Filter for one keyset page of transactions (see find_transactions_page).
+
+    Raises:
+        InvalidCursorError: If cursor is malformed
+    """
+    conditions = [user_filter(user_id)]
+    date_range = {}
+    if start_date:
+        date_range["$gte"] = start_date
+    if end_date:
+        date_range["$lte"] = end_date
+    if date_range:
+        conditions.append({"date": date_range})
+    if cursor:
+        after_date, after_id = decode_cursor(cursor)
+        conditions.append({"$or": [
+            {"date": {"$lt": after_date}},
+            {"date": after_date, "_id": {"$lt": after_id}},
+        ]})
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def _transactions_page(docs: List[Dict[str, Any]], limit: int) -> Tuple[List[TransactionDoc], Optional[str]]:
+    """Trim a limit + 1 fetch to one page and derive the next cursor."""
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1])
+    return _strip_ids(docs), next_cursor
+
+
+def find_transactions_page(
+    db,
+    user_id: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> Tuple[List[TransactionDoc], Optional[str]]:
+    """One page of transactions, most recent first, using keyset pagination.
+
+    Pages resume strictly after the (date, _id) position in the cursor, so
+    every page is a bounded range scan on the (user_id, date, _id) index no
+    matter how deep the client has paged.
+
+    Args:
+        db: MongoDB database instance
+        user_id: User ID from JWT sub claim
+        limit: Page size (callers clamp this to the server-side maximum)
+        cursor: next_cursor returned with the previous page
+        start_date: Inclusive lower bound on date (YYYY-MM-DD)
+        end_date: Inclusive upper bound on date (YYYY-MM-DD)
+
+    Returns:
+        Tuple of (transactions, next_cursor); next_cursor is None on the last page
+
+    Raises:
+        InvalidCursorError: If cursor is malformed
+    """
+    query = transactions_page_query(user_id, cursor, start_date, end_date)
+    docs = list(db.transactions.find(query).sort(TRANSACTION_SORT).limit(limit + 1))
+    return _transactions_page(docs, limit)
+
+
+async def find_transactions_page_async(
+    db,
+    user_id: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> Tuple[List[TransactionDoc], Optional[str]]:
+    """find_transactions_page() for a Motor database."""
+    query = transactions_page_query(user_id, cursor, start_date, end_date)
+    docs = await db.transactions.find(query).sort(TRANSACTION_SORT).limit(limit + 1).to_list(length=None)
+    return _transactions_page(docs, limit)
+
+
+def _accounts_query(user_id: str, account_type: Optional[str]) -> Dict[str, Any]:
+    query = {USER_KEY: user_id}
+    if account_type:
+        query["type"] = account_type
+    return query
+
+
+def find_accounts(db, user_id: str, account_type: Optional[str] = None) -> List[AccountDoc]:
+    return _strip_ids(db.accounts.find(_accounts_query(user_id, account_type)))
+
+
+async def find_accounts_async(db, user_id: str, account_type: Optional[str] = None) -> List[AccountDoc]:
+    """find_accounts() for a Motor database."""
+    return _strip_ids(await db.accounts.find(_accounts_query(user_id, account_type)).to_list(length=None))
+
+
+def find_balances(db, user_id: str) -> List[BalanceDoc]:
+    return _strip_ids(db.balances.find(user_filter(user_id)))
+
+
+def find_holdings(db, user_id: str) -> List[HoldingDoc]:
+    return _strip_ids(db.holdings.find({USER_KEY: user_id}))
+
+
+def find_liabilities(db, user_id: str) -> List[LiabilityDoc]:
+    return _strip_ids(db.liabilities.find({USER_KEY: user_id}))
+
+
+def find_income(db, user_id: str) -> Optional[Dict[str, Any]]:
+    income = db.income.find_one(user_filter(user_id))
+    if income:
+        income.pop("_id", None)
+        income.pop(LEGACY_USER_KEY, None)
+    return income
+
+
+def iter_user_documents(db, collection: str, user_id: str, batch_size: int):
+    """Lazily iterate every document a user owns in a collection.
+
+    Documents are pulled from the server batch_size at a time, so callers can
+    stream arbitrarily large histories without holding them in memory.
+    Transactions come back in TRANSACTION_SORT order.
+    """
+    cursor = db[collection].find(
+        user_filter(user_id),
+        {"_id": 0, LEGACY_USER_KEY: 0},
+        batch_size=batch_size
+    )
+    if collection == "transactions":
+        cursor = cursor.sort(TRANSACTION_SORT)
+    try:
+        for doc in cursor:
+            yield doc
+    finally:
+        cursor.close()
+
+
+def get_plaid_item(db, user_id: str) -> Optional[PlaidItemDoc]:
+    """Get the Plaid item (access_token, item_id) linked by a user."""
+    return db.plaid_items.find_one(user_filter(user_id))
+
+
+async def get_plaid_item_async(db, user_id: str) -> Optional[PlaidItemDoc]:
+    """get_plaid_item() for a Motor database."""
+    return await db.plaid_items.find_one(user_filter(user_id))
+
+
+def find_stale_plaid_items(db, stale_before: datetime, limit: int) -> List[PlaidItemDoc]:
+    """Plaid items due a background refresh, least recently refreshed first.
+
+    An item is due when it was last refreshed (and last scheduled) before
+    stale_before; never-refreshed items sort first.
+    """
+    cursor = db.plaid_items.find(
+        {"$and": [
+            {"$or": [{"last_refreshed_at": {"$exists": False}}, {"last_refreshed_at": {"$lt": stale_before}}]},
+            {"$or": [{"refresh_scheduled_at": {"$exists": False}}, {"refresh_scheduled_at": {"$lt": stale_before}}]},
+        ]},
+        {"_id": 0, USER_KEY: 1, "item_id": 1, "last_refreshed_at": 1}
+    ).sort("last_refreshed_at", 1).limit(limit)
+    return list(cursor)
+
+
+# ---------------------- Writes ----------------------
+def _plaid_item_update(user_id: str, access_token: str, item_id: str) -> Dict[str, Any]:
+    return {"$set": {
+        USER_KEY: user_id,
+        "access_token": access_token,  # TODO: Encrypt in production
+        "item_id": item_id,
+        "updated_at": datetime.utcnow().isoformat()
+    }}
+
+
+def save_plaid_item(db, user_id: str, access_token: str, item_id: str) -> None:
+    """Store (or replace) the Plaid item linked by a user."""
+    db.plaid_items.update_one({USER_KEY: user_id}, _plaid_item_update(user_id, access_token, item_id), upsert=True)
+
+
+async def save_plaid_item_async(db, user_id: str, access_token: str, item_id: str) -> None:
+    """save_plaid_item() for a Motor database."""
+    await db.plaid_items.update_one(
+        {USER_KEY: user_id}, _plaid_item_update(user_id, access_token, item_id), upsert=True
+    )
+
+
+def mark_plaid_items_scheduled(db, user_ids: List[str], now: datetime) -> None:
+    """Record that a background refresh was queued for these users' items."""
+    db.plaid_items.update_many({USER_KEY: {"$in": user_ids}}, {"$set": {"refresh_scheduled_at": now}})
+
+
+def mark_plaid_item_refreshed(db, user_id: str, now: datetime) -> None:
+    """Record a completed background refresh of a user's Plaid item."""
+    db.plaid_items.update_one({USER_KEY: user_id}, {"$set": {"last_refreshed_at": now}})
+
+
+def record_balance_refreshes(db, outcomes: List[Dict[str, Any]], now: datetime) -> None:
+    """Record per-item outcomes of a batch balance refresh on plaid_items.
+
+    Args:
+        db: MongoDB database instance
+        outcomes: Dicts with user_id and error (None on success)
+        now: Refresh time
+    """
+    ops = []
+    for outcome in outcomes:
+        if outcome["error"] is None:
+            update = {"$set": {"balances_refreshed_at": now}, "$unset": {"balance_refresh_error": ""}}
+        else:
+            update = {"$set": {"balance_refresh_error": {**outcome["error"], "at": now}}}
+        ops.append(UpdateOne({USER_KEY: outcome[USER_KEY]}, update))
+    if ops:
+        db.plaid_items.bulk_write(ops, ordered=False)
+
+
+def content_hash(doc: Dict[str, Any]) -> str:
+    """Hash of a normalized document's source fields (everything but bookkeeping)."""
+    fields = {k: v for k, v in doc.items() if k not in HASH_EXCLUDED_FIELDS}
+    canonical = json.dumps(fields, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _changed_docs(db, collection: str, key_fields: tuple, docs: List[Dict[str, Any]], session):
+    """Split docs into (changed, unchanged_count) by comparing stored content hashes."""
+    stored = {}
+    cursor = db[collection].find(
+        {"$or": [{field: doc[field] for field in key_fields} for doc in docs]},
+        {**{field: 1 for field in key_fields}, "content_hash": 1, "_id": 0},
+        session=session
+    )
+    for existing in cursor:
+        stored[tuple(existing.get(field) for field in key_fields)] = existing.get("content_hash")
+
+    changed = [
+        doc for doc in docs
+        if stored.get(tuple(doc[field] for field in key_fields)) != doc["content_hash"]
+    ]
+    return changed, len(docs) - len(changed)
+
+
+def split_changed(db, collection: str, docs: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+    """Stamp content hashes and drop docs identical to what is stored.
+
+    Lets multi-user writers (e.g. the batch balance refresh) learn which
+    users' data actually changed before calling bulk_upsert.
+
+    Returns:
+        Tuple of (changed docs, unchanged count)
+    """
+    if not docs:
+        return [], 0
+    for doc in docs:
+        doc["content_hash"] = content_hash(doc)
+    return _changed_docs(db, collection, (USER_KEY,) + UPSERT_KEYS[collection], docs, None)
+
+
+def bulk_upsert(db, collection: str, docs: List[Dict[str, Any]], session=None) -> Dict[str, int]:
+    """Upsert normalized documents keyed by (user_id, UPSERT_KEYS[collection]).
+
+    Each document is stamped with a content_hash. The stored hashes are
+    read first and only new or changed documents are written, so
+    re-ingesting identical data writes nothing (and never relies on the
+    unique index to reject unchanged rows).
+
+    Args:
+        db: MongoDB database instance
+        collection: Collection name (must be in UPSERT_KEYS)
+        docs: Documents built by the *_doc helpers
+        session: Optional ClientSession (e.g. from the ingest coordinator)
+
+    Returns:
+        Dict with inserted, updated and unchanged counts
+    """
+    key_fields = (USER_KEY,) + UPSERT_KEYS[collection]
+    for doc in docs:
+        doc["content_hash"] = content_hash(doc)
+    if not docs:
+        return {"inserted": 0, "updated": 0, "unchanged": 0}
+
+    docs, unchanged = _changed_docs(db, collection, key_fields, docs, session)
+    ops = [
+        UpdateOne({field: doc[field] for field in key_fields}, {"$set": doc}, upsert=True)
+        for doc in docs
+    ]
+    if not ops:
+        return {"inserted": 0, "updated": 0, "unchanged": unchanged}
+    result = db[collection].bulk_write(ops, ordered=False, session=session)
+    return {"inserted": result.upserted_count, "updated": result.matched_count, "unchanged": unchanged}
+
+
+# ---------------------- Legacy key migration ----------------------
+def _migrate_collection(db, name: str, batch_size: int) -> int:
+    """Rewrite userId -> user_id in one collection, a batch at a time."""
+    collection = db[name]
+    migrated = 0
+    while True:
+        batch = list(
+            collection.find({LEGACY_USER_KEY: {"$exists": True}}, {LEGACY_USER_KEY: 1})
+            .limit(batch_size)
+        )
+        if not batch:
+            return migrated
+
+        ops = [
+            UpdateOne(
+                {"_id": doc["_id"]},
+                {"$set": {USER_KEY: doc[LEGACY_USER_KEY]}, "$unset": {LEGACY_USER_KEY: ""}}
+            )
+            for doc in batch
+        ]
+        duplicate_ids = []
+        try:
+            collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                if error.get("code") != 11000:
+                    raise
+                # A canonical copy already exists; the legacy document is redundant
+                duplicate_ids.append(batch[error["index"]]["_id"])
+        if duplicate_ids:
+            collection.delete_many({"_id": {"$in": duplicate_ids}})
+        migrated += len(batch)
+
+
+def migrate_legacy_user_keys(db, batch_size: int = 500) -> Dict[str, int]:
+    """One-time online migration of userId-keyed documents to user_id.
+
+    Safe to run while serving traffic: reads match both keys until it
+    completes, and it is idempotent if interrupted and restarted.
+
+    Args:
+        db: MongoDB database instance
+        batch_size: Documents rewritten per bulk write
+
+    Returns:
+        Dict of collection name -> documents migrated
+    """
+    global _legacy_keys_migrated
+    if legacy_keys_migrated(db):
+        _legacy_keys_migrated = True
+        return {}
+
+    counts = {}
+    for name in LEGACY_COLLECTIONS:
+        counts[name] = _migrate_collection(db, name, batch_size)
+        if counts[name]:
+            logger.info(f"Migrated {counts[name]} {name} documents from {LEGACY_USER_KEY} to {USER_KEY}")
+
+    db.migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {"$set": {"completedAt": datetime.utcnow(), "counts": counts}},
+        upsert=True
+    )
+    _legacy_keys_migrated = True
+    return counts
+
+
+def legacy_keys_migrated(db) -> bool:
+    """Whether migrate_legacy_user_keys has completed (in any process)."""
+    return db.migrations.find_one({"_id": MIGRATION_ID, "completedAt": {"$exists": True}}) is not None
+
+
+def watch_legacy_key_migration(db, interval: float = LEGACY_KEY_RECHECK_SECONDS) -> Optional[threading.Thread]:
+    """Switch this process's reads to the plain user_id filter once the migration is done.
+
+    Checks the persisted flag now. While the migration is pending, reads keep
+    matching both keys and a background thread re-checks every interval
+    seconds, so processes pick up a migration run elsewhere without a restart.
+
+    Returns:
+        The polling thread, or None if the migration had already completed
+    """
+    global _legacy_keys_migrated
+    if legacy_keys_migrated(db):
+        _legacy_keys_migrated = True
+        return None
+    logger.warning(
+        f"Documents keyed by {LEGACY_USER_KEY} have not been migrated; reads match both keys "
+        f"until `python migrate.py --legacy-user-keys` completes"
+    )
+
+    def run():
+        global _legacy_keys_migrated
+        while not _legacy_keys_migrated:
+            time.sleep(interval)
+            try:
+                if legacy_keys_migrated(db):
+                    _legacy_keys_migrated = True
+                    logger.info(f"User key migration complete, reads now filter on {USER_KEY} only")
+            except Exception as e:
+                logger.warning(f"Could not check user key migration state: {e}")
+
+    thread = threading.Thread(target=run, name="user-key-migration-watch", daemon=True)
+    thread.start()
+    return thread
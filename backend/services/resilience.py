@@ -0,0 +1,376 @@
+"""Fail-fast protection around upstream dependencies (Plaid, Gemini).
+
+Each Dependency combines three guards:
+
+- Bulkhead: caps concurrent calls to the dependency. Callers wait briefly
+  for a slot and are then rejected, so a slow upstream can only tie up
+  max_concurrent web threads instead of all of them.
+- CircuitBreaker: after failure_threshold consecutive failures the circuit
+  opens and calls are rejected immediately for reset_timeout seconds; then
+  a limited number of half-open probe calls decide whether to close it again.
+- AdaptiveTimeout: per-endpoint timeouts derived from recently observed
+  latency (a high percentile times a multiplier, clamped to [minimum,
+  maximum]), so a brownout is cut off near normal latency rather than at a
+  flat worst-case timeout.
+
+Rejections raise DependencyUnavailableError; callers turn that into a 503
+(or a retryable job failure) instead of waiting on the upstream.
+
+Async callers (asgi_app.py) use call_async(), which shares the breaker and
+timeouts but waits on an AsyncBulkhead, since blocking on a thread semaphore
+would stall the event loop.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class DependencyUnavailableError(Exception):
+    """Raised when a call is rejected without reaching the upstream."""
+
+    def __init__(self, dependency: str, reason: str, message: str, retry_after: float = 5):
+        super().__init__(message)
+        self.dependency = dependency
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with half-open probing."""
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = STATE_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """Admit a call, or raise DependencyUnavailableError while the circuit is open."""
+        with self._lock:
+            if self.state == STATE_OPEN:
+                remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+                if remaining > 0:
+                    raise DependencyUnavailableError(
+                        self.name, "circuit_open",
+                        f"{self.name} is unavailable (circuit open), retry in {remaining:.0f}s",
+                        retry_after=max(1, round(remaining))
+                    )
+                self.state = STATE_HALF_OPEN
+                self._probes = 0
+                logger.info(f"Circuit for {self.name} half-open, probing")
+            if self.state == STATE_HALF_OPEN:
+                if self._probes >= self.half_open_max_calls:
+                    raise DependencyUnavailableError(
+                        self.name, "circuit_half_open",
+                        f"{self.name} is recovering, retry shortly",
+                        retry_after=max(1, round(self.reset_timeout / 2))
+                    )
+                self._probes += 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != STATE_CLOSED:
+                logger.info(f"Circuit for {self.name} closed")
+            self.state = STATE_CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == STATE_HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != STATE_OPEN:
+                    logger.warning(f"Circuit for {self.name} opened after {self._failures} consecutive failure(s)")
+                self.state = STATE_OPEN
+                self._opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        """Give back a half-open probe slot for a call that never reached the upstream."""
+        with self._lock:
+            if self.state == STATE_HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+
+class Bulkhead:
+    """Caps concurrent calls; waits up to queue_timeout for a slot."""
+
+    def __init__(self, name: str, max_concurrent: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+
+    def acquire(self) -> None:
+        if not self._semaphore.acquire(timeout=self.queue_timeout):
+            logger.warning(f"{self.name} saturated ({self.max_concurrent} calls in flight), shedding request")
+            raise DependencyUnavailableError(
+                self.name, "bulkhead_full",
+                f"{self.name} is busy, please retry in a few seconds"
+            )
+
+    def release(self) -> None:
+        self._semaphore.release()
+
+
+class AsyncBulkhead:
+    """Bulkhead for coroutines; waits up to queue_timeout for a slot without blocking the loop."""
+
+    def __init__(self, name: str, max_concurrent: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def acquire(self) -> None:
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{self.name} saturated ({self.max_concurrent} async calls in flight), shedding request")
+            raise DependencyUnavailableError(
+                self.name, "bulkhead_full",
+                f"{self.name} is busy, please retry in a few seconds"
+            ) from None
+
+    def release(self) -> None:
+        self._semaphore.release()
+
+
+class AdaptiveTimeout:
+    """Per-endpoint timeouts from a rolling window of successful call latencies."""
+
+    def __init__(
+        self,
+        maximum: float,
+        minimum: float,
+        multiplier: float,
+        percentile: float = 0.99,
+        window: int = 100,
+        min_samples: int = 10,
+    ):
+        self.maximum = maximum
+        self.minimum = min(minimum, maximum)
+        self.multiplier = multiplier
+        self.percentile = percentile
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None:
+                samples = self._samples[endpoint] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def timeout(self, endpoint: str) -> float:
+        """Current timeout for endpoint (the maximum until enough samples exist)."""
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if not samples or len(samples) < self.min_samples:
+                return self.maximum
+            ordered = sorted(samples)
+        observed = ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile))]
+        return max(self.minimum, min(self.maximum, observed * self.multiplier))
+
+
+class Call:
+    """An admitted call: holds a bulkhead slot until finish() is called."""
+
+    def __init__(
+        self,
+        dependency: "Dependency",
+        endpoint: str,
+        timeout: float,
+        release: Optional[Callable[[], None]] = None,
+    ):
+        self.dependency = dependency
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self._release = release or dependency.bulkhead.release
+        self._started = time.monotonic()
+        self._finished = False
+
+    def finish(self, ok: Optional[bool]) -> None:
+        """Release the slot and record the outcome (idempotent).
+
+        ok=None releases without recording anything, for calls abandoned by
+        the caller (e.g. a cancelled request) rather than failed upstream.
+        """
+        if self._finished:
+            return
+        self._finished = True
+        dependency = self.dependency
+        self._release()
+        if ok is None:
+            dependency.breaker.release_probe()
+        elif ok:
+            dependency.timeouts.observe(self.endpoint, time.monotonic() - self._started)
+            dependency.breaker.record_success()
+        else:
+            dependency.breaker.record_failure()
+
+
+class Dependency:
+    """Bulkhead + circuit breaker + adaptive timeouts for one upstream."""
+
+    def __init__(
+        self,
+        name: str,
+        bulkhead: Bulkhead,
+        breaker: CircuitBreaker,
+        timeouts: AdaptiveTimeout,
+        async_bulkhead: Optional[AsyncBulkhead] = None,
+    ):
+        self.name = name
+        self.bulkhead = bulkhead
+        self.breaker = breaker
+        self.timeouts = timeouts
+        self.async_bulkhead = async_bulkhead
+
+    def start(self, endpoint: str) -> Call:
+        """Admit a call to endpoint; the caller must finish() the returned Call.
+
+        Raises:
+            DependencyUnavailableError: If the circuit is open or the bulkhead is full
+        """
+        self.breaker.before_call()
+        try:
+            self.bulkhead.acquire()
+        except DependencyUnavailableError:
+            self.breaker.release_probe()
+            raise
+        return Call(self, endpoint, self.timeouts.timeout(endpoint))
+
+    @contextmanager
+    def guard(self, endpoint: str):
+        """Run the block as one call; it fails if the block raises. Yields the Call."""
+        call = self.start(endpoint)
+        try:
+            yield call
+        except BaseException:
+            call.finish(False)
+            raise
+        call.finish(True)
+
+    def call(
+        self,
+        endpoint: str,
+        fn: Callable[[float], Any],
+        is_failure: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """Invoke fn(timeout) under the guards.
+
+        Args:
+            endpoint: Endpoint name (timeouts are tracked per endpoint)
+            fn: Performs the upstream call with the given timeout in seconds
+            is_failure: Classifies a returned result as an upstream failure
+                (e.g. an HTTP 5xx) for the circuit breaker
+
+        Returns:
+            Whatever fn returns
+
+        Raises:
+            DependencyUnavailableError: If the call was rejected
+        """
+        call = self.start(endpoint)
+        try:
+            result = fn(call.timeout)
+        except BaseException:
+            call.finish(False)
+            raise
+        call.finish(not (is_failure and is_failure(result)))
+        return result
+
+    async def call_async(
+        self,
+        endpoint: str,
+        fn: Callable[[float], Awaitable[Any]],
+        is_failure: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """Await fn(timeout) under the breaker, timeouts and async bulkhead (see call()).
+
+        Raises:
+            DependencyUnavailableError: If the call was rejected
+        """
+        if self.async_bulkhead is None:
+            raise ValueError(f"{self.name} has no async bulkhead")
+        self.breaker.before_call()
+        try:
+            await self.async_bulkhead.acquire()
+        except BaseException:
+            self.breaker.release_probe()
+            raise
+        call = Call(self, endpoint, self.timeouts.timeout(endpoint), release=self.async_bulkhead.release)
+        try:
+            result = await fn(call.timeout)
+        except asyncio.CancelledError:
+            call.finish(None)
+            raise
+        except BaseException:
+            call.finish(False)
+            raise
+        call.finish(not (is_failure and is_failure(result)))
+        return result
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "dependency": self.name,
+            "circuit": self.breaker.state,
+            "max_concurrent": self.bulkhead.max_concurrent,
+        }
+
+
+_dependencies: Dict[str, Dependency] = {}
+_dependencies_lock = threading.Lock()
+
+
+def _build(name: str) -> Dependency:
+    async_bulkhead = None
+    if name == "plaid":
+        max_concurrent, queue_timeout, max_timeout = (
+            Config.PLAID_MAX_CONCURRENCY, Config.PLAID_QUEUE_TIMEOUT_SECONDS, Config.PLAID_TIMEOUT_SECONDS
+        )
+        async_bulkhead = AsyncBulkhead(name, Config.ASYNC_PLAID_MAX_CONCURRENCY, queue_timeout)
+    elif name == "gemini":
+        max_concurrent, queue_timeout, max_timeout = (
+            Config.GEMINI_MAX_CONCURRENCY, Config.GEMINI_QUEUE_TIMEOUT_SECONDS, Config.GEMINI_TIMEOUT_SECONDS
+        )
+    else:
+        raise ValueError(f"Unknown dependency: {name}")
+    return Dependency(
+        name,
+        Bulkhead(name, max_concurrent, queue_timeout),
+        CircuitBreaker(name, Config.CIRCUIT_FAILURE_THRESHOLD, Config.CIRCUIT_RESET_SECONDS),
+        AdaptiveTimeout(
+            maximum=max_timeout,
+            minimum=Config.ADAPTIVE_TIMEOUT_MIN_SECONDS,
+            multiplier=Config.ADAPTIVE_TIMEOUT_MULTIPLIER,
+        ),
+        async_bulkhead,
+    )
+
+
+def get_dependency(name: str) -> Dependency:
+    """Get or create the process-wide guards for a dependency ("plaid" or "gemini")."""
+    with _dependencies_lock:
+        dependency = _dependencies.get(name)
+        if dependency is None:
+            dependency = _dependencies[name] = _build(name)
+        return dependency
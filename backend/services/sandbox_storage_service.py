@@ -1,17 +1,26 @@
 """Service for loading and storing sandbox data from JSON file to MongoDB."""
-import json
 import hashlib
+import json
 import logging
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, Optional, Tuple
 from cryptography.fernet import Fernet
 
 from config import Config
 from db import get_db
+from services import repository
 
 logger = logging.getLogger(__name__)
 
+# Try to import ijson - make it optional (only needed for streaming loads)
+IJSON_AVAILABLE = False
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    logger.info("ijson not available, sandbox files will be loaded in memory. Install with: pip install ijson")
+
 # Global Fernet instance (cached)
 _fernet: Optional[Fernet] = None
 
@@ -105,16 +114,67 @@ def redact_token(token: str) -> str:
     return f"{prefix}...{suffix}"
 
 
-def upsert_from_payload(db, user_id: str, payload: Dict[str, Any]) -> Dict[str, int]:
+def _touch_user(db, user_id: str, now: datetime, session=None) -> None:
+    """Upsert the user record's lastSeenAt."""
+    # Email/name from the JWT are set by the caller if needed
+    db.users.update_one(
+        {'_id': user_id},
+        {'$set': {'_id': user_id, 'lastSeenAt': now.isoformat()}},
+        upsert=True,
+        session=session
+    )
+
+
+def _store_tokens(db, user_id: str, public_token: Optional[str], access_token: Optional[str],
+                  now: datetime, session=None) -> bool:
+    """Store redacted/encrypted Plaid tokens. Returns True if the access token was stored."""
+    if not (public_token or access_token):
+        return False
+    
+    stored = False
+    token_doc = {
+        'user_id': user_id,
+        'public_token_redacted': redact_token(public_token) if public_token else None,
+        'has_access_token': bool(access_token),
+        'updatedAt': now.isoformat()
+    }
+    
+    # Encrypt access token if encryption key is available
+    fernet = get_fernet()
+    if access_token and fernet:
+        try:
+            encrypted_token = fernet.encrypt(access_token.encode())
+            token_doc['access_token_encrypted_or_null'] = encrypted_token.decode()
+            stored = True
+        except Exception as e:
+            logger.error(f"Failed to encrypt access token: {e}")
+            # Don't store unencrypted token
+    elif access_token:
+        # No encryption key, don't store token
+        logger.info("DATA_ENCRYPTION_KEY not set, skipping access_token storage")
+    
+    db.plaid_tokens.update_one(
+        {'user_id': user_id},
+        {'$set': token_doc},
+        upsert=True,
+        session=session
+    )
+    return stored
+
+
+def upsert_from_payload(db, user_id: str, payload: Dict[str, Any], session=None) -> Dict[str, int]:
     """Extract data from payload and upsert to MongoDB collections.
     
     Args:
         db: MongoDB database instance
         user_id: User ID from JWT sub claim
         payload: Parsed JSON payload from sandbox file
+        session: Optional ClientSession (e.g. from the ingest coordinator)
         
     Returns:
-        Dictionary with counts: {accounts, transactions, holdings, liabilities, storedAccessToken}
+        Dictionary with counts: {accounts, transactions, holdings, liabilities,
+            storedAccessToken, unchanged} where unchanged holds per-collection
+            counts of documents whose content hash already matched
     """
     now = datetime.utcnow()
     counts = {
@@ -122,21 +182,11 @@ def upsert_from_payload(db, user_id: str, payload: Dict[str, Any]) -> Dict[str,
         'transactions': 0,
         'holdings': 0,
         'liabilities': 0,
-        'storedAccessToken': False
+        'storedAccessToken': False,
+        'unchanged': {'accounts': 0, 'transactions': 0, 'holdings': 0, 'liabilities': 0}
     }
     
-    # Upsert user record
-    user_doc = {
-        '_id': user_id,
-        'lastSeenAt': now.isoformat(),
-    }
-    # Add email/name if available in JWT (will be set by caller if needed)
-    # For now, just update lastSeenAt
-    db.users.update_one(
-        {'_id': user_id},
-        {'$set': user_doc},
-        upsert=True
-    )
+    _touch_user(db, user_id, now, session)
     
     # Extract and store tokens
     public_token = None
@@ -148,34 +198,7 @@ def upsert_from_payload(db, user_id: str, payload: Dict[str, Any]) -> Dict[str,
     if 'exchange_public_token' in payload:
         access_token = payload['exchange_public_token'].get('access_token')
     
-    # Store tokens
-    if public_token or access_token:
-        token_doc = {
-            'user_id': user_id,
-            'public_token_redacted': redact_token(public_token) if public_token else None,
-            'has_access_token': bool(access_token),
-            'updatedAt': now.isoformat()
-        }
-        
-        # Encrypt access token if encryption key is available
-        fernet = get_fernet()
-        if access_token and fernet:
-            try:
-                encrypted_token = fernet.encrypt(access_token.encode())
-                token_doc['access_token_encrypted_or_null'] = encrypted_token.decode()
-                counts['storedAccessToken'] = True
-            except Exception as e:
-                logger.error(f"Failed to encrypt access token: {e}")
-                # Don't store unencrypted token
-        elif access_token:
-            # No encryption key, don't store token
-            logger.info("DATA_ENCRYPTION_KEY not set, skipping access_token storage")
-        
-        db.plaid_tokens.update_one(
-            {'user_id': user_id},
-            {'$set': token_doc},
-            upsert=True
-        )
+    counts['storedAccessToken'] = _store_tokens(db, user_id, public_token, access_token, now, session)
     
     # Extract and store accounts
     accounts_data = None
@@ -185,232 +208,202 @@ def upsert_from_payload(db, user_id: str, payload: Dict[str, Any]) -> Dict[str,
         accounts_data = payload['get_balance']['balance_data'].get('accounts', [])
     
     if accounts_data:
-        for acc in accounts_data:
-            account_id = acc.get('account_id')
-            if not account_id:
-                continue
-            
-            account_doc = {
-                'user_id': user_id,
-                'account_id': account_id,
-                'name': acc.get('name'),
-                'type': acc.get('type'),
-                'subtype': acc.get('subtype'),
-                'mask': acc.get('mask'),
-                'official_name': acc.get('official_name'),
-                'balances': acc.get('balances', {}),
-                'updatedAt': now.isoformat()
-            }
-            
-            db.accounts.update_one(
-                {'user_id': user_id, 'account_id': account_id},
-                {'$set': account_doc},
-                upsert=True
-            )
-            counts['accounts'] += 1
+        account_docs = [
+            repository.account_doc(user_id, acc, now)
+            for acc in accounts_data
+            if acc.get('account_id')
+        ]
+        result = repository.bulk_upsert(db, 'accounts', account_docs, session=session)
+        counts['unchanged']['accounts'] = result['unchanged']
+        counts['accounts'] = len(account_docs)
     
     # Extract and store transactions
     if 'get_transactions' in payload:
         transactions_data = payload['get_transactions'].get('transactions', [])
         
-        for txn in transactions_data:
-            transaction_id = txn.get('transaction_id')
-            
-            # Generate deterministic ID if missing
-            if not transaction_id:
-                # Use sha256(user_id + account_id + date + name + amount)
-                txn_str = f"{user_id}{txn.get('account_id', '')}{txn.get('date', '')}{txn.get('name', '')}{txn.get('amount', 0)}"
-                transaction_id = hashlib.sha256(txn_str.encode()).hexdigest()
-            
-            transaction_doc = {
-                'user_id': user_id,
-                'transaction_id': transaction_id,
-                'account_id': txn.get('account_id'),
-                'date': txn.get('date'),
-                'name': txn.get('name'),
-                'amount': txn.get('amount'),
-                'category': txn.get('category'),
-                'merchant_name': txn.get('merchant_name'),
-                'pending': txn.get('pending', False),
-                'payment_channel': txn.get('payment_channel'),
-                'raw': txn,
-                'updatedAt': now.isoformat()
-            }
-            
-            db.transactions.update_one(
-                {'user_id': user_id, 'transaction_id': transaction_id},
-                {'$set': transaction_doc},
-                upsert=True
-            )
-            counts['transactions'] += 1
+        transaction_docs = [repository.transaction_doc(user_id, txn, now) for txn in transactions_data]
+        result = repository.bulk_upsert(db, 'transactions', transaction_docs, session=session)
+        counts['unchanged']['transactions'] = result['unchanged']
+        counts['transactions'] = len(transaction_docs)
     
     # Extract and store holdings
     if 'get_investments_holdings' in payload:
         holdings_data = payload['get_investments_holdings'].get('investments_holdings', {}).get('holdings', [])
         
-        for holding in holdings_data:
-            account_id = holding.get('account_id')
-            security_id = holding.get('security_id')
-            
-            if not account_id or not security_id:
-                continue
-            
-            holding_doc = {
-                'user_id': user_id,
-                'account_id': account_id,
-                'security_id': security_id,
-                'quantity': holding.get('quantity'),
-                'cost_basis': holding.get('cost_basis'),
-                'institution_value': holding.get('institution_value'),
-                'raw': holding,
-                'updatedAt': now.isoformat()
-            }
-            
-            db.holdings.update_one(
-                {'user_id': user_id, 'account_id': account_id, 'security_id': security_id},
-                {'$set': holding_doc},
-                upsert=True
-            )
-            counts['holdings'] += 1
+        holding_docs = [
+            repository.holding_doc(user_id, holding, now)
+            for holding in holdings_data
+            if holding.get('account_id') and holding.get('security_id')
+        ]
+        result = repository.bulk_upsert(db, 'holdings', holding_docs, session=session)
+        counts['unchanged']['holdings'] = result['unchanged']
+        counts['holdings'] = len(holding_docs)
     
     # Extract and store liabilities
     if 'get_liabilities' in payload:
         liabilities_data = payload['get_liabilities'].get('liabilities_data', {})
         
         # Extract mortgage, student, credit arrays
+        liability_docs = []
         for liability_type in ['mortgage', 'student', 'credit']:
-            liability_list = liabilities_data.get(liability_type, [])
-            
-            for liability in liability_list:
-                account_id = liability.get('account_id')
-                if not account_id:
+            for liability in liabilities_data.get(liability_type, []):
+                if not liability.get('account_id'):
                     continue
-                
-                liability_doc = {
-                    'user_id': user_id,
-                    'account_id': account_id,
-                    'liability_type': liability_type,
-                    'raw': liability,
-                    'updatedAt': now.isoformat()
-                }
-                
-                db.liabilities.update_one(
-                    {'user_id': user_id, 'account_id': account_id, 'liability_type': liability_type},
-                    {'$set': liability_doc},
-                    upsert=True
-                )
-                counts['liabilities'] += 1
+                liability_docs.append(repository.liability_doc(user_id, liability, liability_type, now))
+        result = repository.bulk_upsert(db, 'liabilities', liability_docs, session=session)
+        counts['unchanged']['liabilities'] = result['unchanged']
+        counts['liabilities'] = len(liability_docs)
     
     return counts
 
 
-def compute_summary(db, user_id: str) -> Dict[str, Any]:
-    """Compute aggregate summary statistics for user.
+# ijson prefixes of the record arrays in a sandbox file -> (collection, liability type)
+_STREAM_ITEM_PREFIXES = {
+    'get_accounts.accounts.item': ('accounts', None),
+    'get_balance.balance_data.accounts.item': ('accounts', None),
+    'get_transactions.transactions.item': ('transactions', None),
+    'get_investments_holdings.investments_holdings.holdings.item': ('holdings', None),
+    'get_liabilities.liabilities_data.mortgage.item': ('liabilities', 'mortgage'),
+    'get_liabilities.liabilities_data.student.item': ('liabilities', 'student'),
+    'get_liabilities.liabilities_data.credit.item': ('liabilities', 'credit'),
+}
+
+_STREAM_TOKEN_PREFIXES = {
+    'create_sandbox_public_token.public_token': 'public_token',
+    'exchange_public_token.access_token': 'access_token',
+}
+
+
+def iter_payload_records(f) -> Iterator[Tuple[str, Optional[str], Any]]:
+    """Incrementally parse a sandbox file, yielding one record at a time.
+    
+    Only the record currently being parsed is held in memory.
+    
+    Args:
+        f: Binary file object positioned at the start of the JSON document
+        
+    Yields:
+        (kind, liability_type, value) where kind is a collection name
+        (value is the record dict) or 'public_token'/'access_token'
+        (value is the token string)
+    """
+    builder = None
+    depth = 0
+    current = None
+    for prefix, event, value in ijson.parse(f, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            if event in ('start_map', 'start_array'):
+                depth += 1
+            elif event in ('end_map', 'end_array'):
+                depth -= 1
+                if depth == 0:
+                    yield current[0], current[1], builder.value
+                    builder = None
+        elif event == 'start_map' and prefix in _STREAM_ITEM_PREFIXES:
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+            depth = 1
+            current = _STREAM_ITEM_PREFIXES[prefix]
+        elif event == 'string' and prefix in _STREAM_TOKEN_PREFIXES:
+            yield _STREAM_TOKEN_PREFIXES[prefix], None, value
+
+
+def stream_upsert_from_file(db, user_id: str, path: str, batch_size: int) -> Dict[str, int]:
+    """Streaming counterpart of upsert_from_payload for large sandbox files.
+    
+    Records are parsed lazily with ijson and written in bulk batches of
+    batch_size, so peak memory is proportional to the batch size rather than
+    the file size. An account listed in both get_accounts and get_balance is
+    written once, from whichever section appears first in the file.
     
     Args:
         db: MongoDB database instance
         user_id: User ID from JWT sub claim
+        path: Path to the sandbox JSON file
+        batch_size: Documents per bulk write
         
     Returns:
-        Dictionary with totals, monthlySpend, topCategories
+        Dictionary with counts: {accounts, transactions, holdings, liabilities,
+            storedAccessToken, unchanged} where unchanged holds per-collection
+            counts of documents whose content hash already matched
+        
+    Raises:
+        ImportError: If ijson is not installed
+        json.JSONDecodeError: If the file is not valid JSON (records parsed
+            before the error have already been written)
     """
-    summary = {
-        'totals': {},
-        'monthlySpend': [],
-        'topCategories': []
-    }
+    if not IJSON_AVAILABLE:
+        raise ImportError("ijson is not installed. Install with: pip install ijson")
     
-    # Compute total current balance across depository accounts
-    depository_accounts = list(db.accounts.find({
-        'user_id': user_id,
-        'type': 'depository'
-    }))
-    
-    total_current_balance = 0.0
-    for acc in depository_accounts:
-        balances = acc.get('balances', {})
-        current = balances.get('current')
-        if current is not None:
-            total_current_balance += float(current)
-    
-    summary['totals'] = {
-        'current_balance': total_current_balance
+    now = datetime.utcnow()
+    counts = {
+        'accounts': 0,
+        'transactions': 0,
+        'holdings': 0,
+        'liabilities': 0,
+        'storedAccessToken': False,
+        'unchanged': {'accounts': 0, 'transactions': 0, 'holdings': 0, 'liabilities': 0}
     }
+    tokens = {}
+    buffers = {'accounts': [], 'transactions': [], 'holdings': [], 'liabilities': []}
+    seen_account_ids = set()
+    
+    def flush(collection: str) -> None:
+        if buffers[collection]:
+            result = repository.bulk_upsert(db, collection, buffers[collection])
+            counts[collection] += len(buffers[collection])
+            counts['unchanged'][collection] += result['unchanged']
+            buffers[collection] = []
+    
+    _touch_user(db, user_id, now)
+    
+    with open(path, 'rb') as f:
+        records = iter_payload_records(f)
+        while True:
+            try:
+                kind, liability_type, value = next(records)
+            except StopIteration:
+                break
+            except ijson.JSONError as e:
+                raise json.JSONDecodeError(str(e), '', 0) from e
+            
+            if kind in ('public_token', 'access_token'):
+                tokens[kind] = value
+                continue
+            
+            doc = None
+            if kind == 'accounts' and value.get('account_id'):
+                if value['account_id'] in seen_account_ids:
+                    continue
+                seen_account_ids.add(value['account_id'])
+                doc = repository.account_doc(user_id, value, now)
+            elif kind == 'transactions':
+                doc = repository.transaction_doc(user_id, value, now)
+            elif kind == 'holdings' and value.get('account_id') and value.get('security_id'):
+                doc = repository.holding_doc(user_id, value, now)
+            elif kind == 'liabilities' and value.get('account_id'):
+                doc = repository.liability_doc(user_id, value, liability_type, now)
+            if doc is None:
+                continue
+            
+            buffers[kind].append(doc)
+            if len(buffers[kind]) >= batch_size:
+                flush(kind)
+    
+    for collection in buffers:
+        flush(collection)
     
-    # Compute monthly spend from transactions
-    # Group by YYYY-MM, sum negative amounts as spend
-    pipeline = [
-        {'$match': {'user_id': user_id}},
-        {'$project': {
-            'amount': 1,
-            'date': 1,
-            'year_month': {'$substr': ['$date', 0, 7]}  # Extract YYYY-MM
-        }},
-        {'$match': {'amount': {'$lt': 0}}},  # Only negative amounts (spend)
-        {'$group': {
-            '_id': '$year_month',
-            'total_spend': {'$sum': {'$abs': '$amount'}}  # Sum absolute value
-        }},
-        {'$sort': {'_id': 1}},
-        {'$project': {
-            '_id': 0,
-            'month': '$_id',
-            'spend': '$total_spend'
-        }}
-    ]
-    
-    monthly_spend = list(db.transactions.aggregate(pipeline))
-    summary['monthlySpend'] = monthly_spend
-    
-    # Compute top 5 categories by spend
-    category_pipeline = [
-        {'$match': {'user_id': user_id, 'amount': {'$lt': 0}}},
-        {'$unwind': {'path': '$category', 'preserveNullAndEmptyArrays': True}},
-        {'$group': {
-            '_id': '$category',
-            'total_spend': {'$sum': {'$abs': '$amount'}}
-        }},
-        {'$sort': {'total_spend': -1}},
-        {'$limit': 5},
-        {'$project': {
-            '_id': 0,
-            'category': '$_id',
-            'spend': '$total_spend'
-        }}
-    ]
-    
-    top_categories = list(db.transactions.aggregate(category_pipeline))
-    summary['topCategories'] = top_categories
-    
-    return summary
+    counts['storedAccessToken'] = _store_tokens(
+        db, user_id, tokens.get('public_token'), tokens.get('access_token'), now
+    )
+    return counts
 
 
-def ensure_indexes(db) -> None:
-    """Create MongoDB indexes for optimal query performance.
-    
-    Args:
-        db: MongoDB database instance
-    """
-    try:
-        # Accounts: unique index on (user_id, account_id)
-        db.accounts.create_index([("user_id", 1), ("account_id", 1)], unique=True)
-        logger.info("Created index on accounts (user_id, account_id)")
-        
-        # Transactions: unique index on (user_id, transaction_id)
-        db.transactions.create_index([("user_id", 1), ("transaction_id", 1)], unique=True)
-        logger.info("Created index on transactions (user_id, transaction_id)")
-        
-        # Holdings: unique index on (user_id, account_id, security_id)
-        db.holdings.create_index([("user_id", 1), ("account_id", 1), ("security_id", 1)], unique=True)
-        logger.info("Created index on holdings (user_id, account_id, security_id)")
-        
-        # Liabilities: unique index on (user_id, account_id, liability_type)
-        db.liabilities.create_index([("user_id", 1), ("account_id", 1), ("liability_type", 1)], unique=True)
-        logger.info("Created index on liabilities (user_id, account_id, liability_type)")
-        
-        # Raw snapshots: index on (user_id, createdAt desc)
-        db.raw_snapshots.create_index([("user_id", 1), ("createdAt", -1)])
-        logger.info("Created index on raw_snapshots (user_id, createdAt)")
-        
-    except Exception as e:
-        logger.warning(f"Failed to create MongoDB indexes (non-fatal): {e}")
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Hash a file in fixed-size chunks without reading it into memory."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
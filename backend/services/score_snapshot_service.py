@@ -0,0 +1,110 @@
+"""Per-user score snapshots: the computed score plus a compact financial digest.
+
+Analyze and chat requests read the snapshot instead of re-fetching and
+re-scoring every collection per message. Snapshots are tagged with the
+user's data version, so any ingest that changes data makes them stale; they
+also expire after SCORE_SNAPSHOT_TTL_SECONDS.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from config import Config
+from services import repository
+from services.context_builder import build_financial_digest
+from services.data_version_service import get_data_version
+from services.scoring_service import calculate_credit_score
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_COLLECTION = "score_snapshots"
+
+# Education score used when the client doesn't supply one (matches the score routes)
+DEFAULT_EDUCATION_SCORE = 75.0
+
+
+def load_user_financials(db, user_id: str) -> Tuple[list, list, Optional[dict], Optional[dict]]:
+    """Fetch the stored data the scoring model needs for a user.
+
+    Args:
+        db: MongoDB database instance
+        user_id: User ID from JWT sub claim
+
+    Returns:
+        Tuple of (transactions, accounts, investments, liabilities) shaped for
+        calculate_credit_score
+    """
+    transactions = repository.find_transactions(db, user_id, limit=Config.SCORING_TRANSACTION_LIMIT)
+    accounts = repository.find_accounts(db, user_id)
+
+    holdings_list = repository.find_holdings(db, user_id)
+    investments = None
+    if holdings_list:
+        investments = {
+            "holdings": holdings_list,
+            "accounts": accounts  # Use accounts as investment accounts if applicable
+        }
+
+    liabilities_list = repository.find_liabilities(db, user_id)
+    liabilities = {"liabilities": liabilities_list} if liabilities_list else None
+
+    return transactions, accounts, investments, liabilities
+
+
+def compute_score_snapshot(db, user_id: str) -> Dict[str, Any]:
+    """Score the user's stored data, build the digest, and persist the snapshot.
+
+    Args:
+        db: MongoDB database instance
+        user_id: User ID from JWT sub claim
+
+    Returns:
+        Snapshot dict with score, digest and computedAt
+    """
+    # Read the version first so a concurrent ingest can only make the snapshot look stale
+    data_version = get_data_version(db, user_id)
+    transactions, accounts, investments, liabilities = load_user_financials(db, user_id)
+
+    score_result = calculate_credit_score(
+        transactions=transactions,
+        accounts=accounts if accounts else None,
+        investments=investments,
+        liabilities=liabilities,
+        alternative_income=50000.0,
+        education_score=DEFAULT_EDUCATION_SCORE
+    )
+
+    snapshot = {
+        "user_id": user_id,
+        "score": score_result,
+        "digest": build_financial_digest(transactions, accounts),
+        "dataVersion": data_version,
+        "computedAt": datetime.utcnow(),
+    }
+    db[SNAPSHOT_COLLECTION].replace_one({"_id": user_id}, snapshot, upsert=True)
+    logger.info(f"Computed score snapshot for user {user_id}: {score_result.get('credit_score')}")
+    return snapshot
+
+
+def get_score_snapshot(db, user_id: str) -> Dict[str, Any]:
+    """Return a fresh score snapshot, recomputing it if missing or stale.
+
+    A snapshot is stale once it is older than SCORE_SNAPSHOT_TTL_SECONDS or
+    was computed from an older data version.
+
+    Args:
+        db: MongoDB database instance
+        user_id: User ID from JWT sub claim
+
+    Returns:
+        Snapshot dict with score, digest and computedAt
+    """
+    snapshot = db[SNAPSHOT_COLLECTION].find_one({"_id": user_id})
+    if snapshot:
+        max_age = timedelta(seconds=Config.SCORE_SNAPSHOT_TTL_SECONDS)
+        computed_at = snapshot.get("computedAt")
+        current = snapshot.get("dataVersion") == get_data_version(db, user_id)
+        if current and computed_at and datetime.utcnow() - computed_at < max_age:
+            snapshot.pop("_id", None)
+            return snapshot
+    return compute_score_snapshot(db, user_id)
@@ -1,6 +1,5 @@
 """Scoring logic based on Plaid transactions."""
 import logging
-import requests
 from datetime import date, timedelta
 from typing import Optional, Tuple, List, Dict, Any
 from config import Config
@@ -9,70 +8,26 @@ from config import Config
 # (you wrote "finance.document_pipeline" in your snippet)
 from finance.document_pipeline import get_document_display_values
 
-logger = logging.getLogger(__name__)
-
-# Plaid REST API configuration
-BASE_URLS = {
-    "sandbox": "https://sandbox.plaid.com",
-    "development": "https://development.plaid.com",
-    "production": "https://production.plaid.com",
-}
-
-HEADERS = {
-    "Content-Type": "application/json",
-}
-
-
-def get_plaid_base_url() -> str:
-    """Get the base URL for Plaid API based on environment."""
-    return BASE_URLS.get(Config.PLAID_ENV.lower(), BASE_URLS["sandbox"])
+# Plaid REST calls (re-exported for scripts that import them from here)
+from services.plaid_client import get_plaid_base_url, plaid_post
 
+logger = logging.getLogger(__name__)
 
-def plaid_post(path: str, payload: dict) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
-    """
-    Make a POST request to Plaid API.
-    
-    Args:
-        path: API endpoint path (e.g., "/transactions/get")
-        payload: Request payload dictionary
-        
-    Returns:
-        Tuple of (response_data, error_dict). If successful, error_dict is None.
-        If error, response_data is None.
-    """
-    url = f"{get_plaid_base_url()}{path}"
-    
-    # Add client_id and secret to payload if not present
-    if "client_id" not in payload:
-        payload["client_id"] = Config.PLAID_CLIENT_ID
-    if "secret" not in payload:
-        payload["secret"] = Config.PLAID_SECRET
-    
-    try:
-        r = requests.post(url, json=payload, headers=HEADERS, timeout=30)
-        try:
-            data = r.json()
-        except Exception:
-            data = {"error": "Non-JSON response", "text": r.text}
-        
-        if r.status_code >= 400:
-            # Plaid errors are in the response body, extract them properly
-            error_info = {
-                "status": r.status_code,
-                "response": data
-            }
-            # Plaid error structure: {"error_code": "...", "error_message": "..."}
-            if isinstance(data, dict):
-                if "error_code" in data:
-                    error_info["error_code"] = data["error_code"]
-                if "error_message" in data:
-                    error_info["error_message"] = data["error_message"]
-            return None, error_info
-        
-        return data, None
-    except Exception as e:
-        logger.error(f"Plaid API request failed: {e}")
-        return None, {"error": str(e), "error_code": "REQUEST_FAILED"}
+__all__ = [
+    "create_sandbox_public_token",
+    "exchange_public_token",
+    "get_accounts",
+    "refresh_transactions",
+    "get_transactions",
+    "get_balance",
+    "get_liabilities",
+    "get_investments_holdings",
+    "get_investments_transactions",
+    "calculate_credit_score",
+    # Re-exported from services.plaid_client
+    "get_plaid_base_url",
+    "plaid_post",
+]
 
 
 def create_sandbox_public_token(
@@ -0,0 +1,134 @@
+"""Deduplicated, compressed storage for raw sandbox payload snapshots.
+
+Each snapshot carries a content hash of its sanitized payload. A load whose
+hash matches the user's latest snapshot only refreshes lastSeenAt instead of
+inserting another copy. Payloads are stored as compressed binary (zstd when
+the zstandard package is installed, zlib otherwise), and only the newest
+RAW_SNAPSHOT_KEEP snapshots per user are retained. RAW_SNAPSHOT_TTL_DAYS
+optionally adds a TTL index on top.
+"""
+import hashlib
+import json
+import logging
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from bson import Binary
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Try to import zstandard - make it optional
+ZSTD_AVAILABLE = False
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    logger.info("zstandard not available, raw snapshots will be zlib-compressed. Install with: pip install zstandard")
+
+SNAPSHOT_COLLECTION = "raw_snapshots"
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 10
+
+
+def _compress(data: bytes) -> tuple:
+    if ZSTD_AVAILABLE:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return "zlib", zlib.compress(data, ZLIB_LEVEL)
+
+
+def serialize_payload(payload: Any) -> bytes:
+    """Canonical JSON bytes for a payload (stable key order, so equal payloads hash equally)."""
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def payload_hash(payload: Any) -> str:
+    """Content hash of a payload, as stored in contentHash."""
+    return hashlib.sha256(serialize_payload(payload)).hexdigest()
+
+
+def store_snapshot(
+    db,
+    user_id: str,
+    source: str,
+    file_path: str,
+    payload: Optional[Dict[str, Any]] = None,
+    content_hash: Optional[str] = None,
+    extra: Optional[Dict[str, Any]] = None,
+    session=None,
+) -> Dict[str, Any]:
+    """Store a snapshot unless it duplicates the user's latest one.
+
+    Args:
+        db: MongoDB database instance
+        user_id: User ID from JWT sub claim
+        source: Where the payload came from (e.g. "local_file")
+        file_path: Path of the loaded file
+        payload: Sanitized payload to store compressed, or None to store metadata only
+        content_hash: Precomputed hash (e.g. of the file, for streamed loads);
+            derived from the payload when omitted
+        extra: Additional metadata fields for the snapshot document
+        session: Optional ClientSession (e.g. from the ingest coordinator)
+
+    Returns:
+        Dict with stored (False when deduplicated), contentHash and snapshot_id
+    """
+    now = datetime.utcnow()
+    data = serialize_payload(payload) if payload is not None else None
+    if content_hash is None:
+        content_hash = hashlib.sha256(data or b"").hexdigest()
+
+    collection = db[SNAPSHOT_COLLECTION]
+    latest = collection.find_one(
+        {"user_id": user_id},
+        {"contentHash": 1},
+        sort=[("createdAt", -1)],
+        session=session
+    )
+    if latest and latest.get("contentHash") == content_hash:
+        collection.update_one({"_id": latest["_id"]}, {"$set": {"lastSeenAt": now}}, session=session)
+        logger.info(f"Raw snapshot for user {user_id} unchanged ({content_hash[:12]}), not stored again")
+        return {"stored": False, "contentHash": content_hash, "snapshot_id": latest["_id"]}
+
+    doc = {
+        "user_id": user_id,
+        "source": source,
+        "file_path": file_path,
+        "contentHash": content_hash,
+        "payload": None,
+        "createdAt": now,
+        "lastSeenAt": now,
+        **(extra or {}),
+    }
+    if data is not None:
+        codec, compressed = _compress(data)
+        doc.update({
+            "payload": Binary(compressed),
+            "codec": codec,
+            "payloadBytes": len(data),
+            "compressedBytes": len(compressed),
+        })
+    result = collection.insert_one(doc, session=session)
+    _apply_retention(db, user_id, session)
+    return {"stored": True, "contentHash": content_hash, "snapshot_id": result.inserted_id}
+
+
+def _apply_retention(db, user_id: str, session=None) -> None:
+    """Delete all but the newest RAW_SNAPSHOT_KEEP snapshots for a user."""
+    keep = Config.RAW_SNAPSHOT_KEEP
+    if keep <= 0:
+        return
+    stale = [
+        doc["_id"]
+        for doc in db[SNAPSHOT_COLLECTION]
+        .find({"user_id": user_id}, {"_id": 1}, session=session)
+        .sort("createdAt", -1)
+        .skip(keep)
+    ]
+    if stale:
+        db[SNAPSHOT_COLLECTION].delete_many({"_id": {"$in": stale}}, session=session)
+        logger.info(f"Pruned {len(stale)} old raw snapshots for user {user_id}")
+
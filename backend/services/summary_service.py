@@ -0,0 +1,139 @@
+"""Dashboard summary: balance total, monthly spend and top spend categories.
+
+All three figures come from a single aggregation. The leading $match selects
+only the user's spend (amount < 0) on the (user_id, amount) index, $facet
+fans those documents out to the monthly and category groupings, and a
+trailing $lookup totals depository balances from accounts. Results are cached
+in-process per user and keyed on the user's data version, so any ingest
+invalidates them.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from config import Config
+from services import repository
+from services.data_version_service import get_data_version, get_data_version_async
+
+logger = logging.getLogger(__name__)
+
+TOP_CATEGORIES = 5
+
+# user_id -> (data version, summary)
+_summary_cache: "OrderedDict[str, Tuple[int, Dict[str, Any]]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _summary_pipeline(user_id: str) -> list:
+    spend_match = {"amount": {"$lt": 0}}
+    user_match = repository.user_filter(user_id)
+    if "$or" in user_match:
+        leading_match = {"$and": [user_match, spend_match]}
+    else:
+        leading_match = {**user_match, **spend_match}
+
+    return [
+        {"$match": leading_match},
+        {"$project": {"_id": 0, "date": 1, "amount": 1, "category": 1}},
+        {"$facet": {
+            "monthlySpend": [
+                {"$group": {
+                    "_id": {"$substrBytes": ["$date", 0, 7]},  # YYYY-MM
+                    "total_spend": {"$sum": {"$abs": "$amount"}}
+                }},
+                {"$sort": {"_id": 1}},
+                {"$project": {"_id": 0, "month": "$_id", "spend": "$total_spend"}}
+            ],
+            "topCategories": [
+                {"$unwind": {"path": "$category", "preserveNullAndEmptyArrays": True}},
+                {"$group": {
+                    "_id": "$category",
+                    "total_spend": {"$sum": {"$abs": "$amount"}}
+                }},
+                {"$sort": {"total_spend": -1}},
+                {"$limit": TOP_CATEGORIES},
+                {"$project": {"_id": 0, "category": "$_id", "spend": "$total_spend"}}
+            ]
+        }},
+        # $facet always emits one document, so the balance lookup runs even with no spend
+        {"$lookup": {
+            "from": "accounts",
+            "pipeline": [
+                {"$match": {repository.USER_KEY: user_id, "type": "depository"}},
+                {"$group": {"_id": None, "current_balance": {"$sum": "$balances.current"}}}
+            ],
+            "as": "depository"
+        }}
+    ]
+
+
+def _summary_from_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    depository = result.get("depository") or [{}]
+    return {
+        "totals": {
+            "current_balance": float(depository[0].get("current_balance") or 0.0)
+        },
+        "monthlySpend": result.get("monthlySpend", []),
+        "topCategories": result.get("topCategories", []),
+    }
+
+
+def compute_summary(db, user_id: str) -> Dict[str, Any]:
+    """Compute aggregate summary statistics for a user in one aggregation.
+    
+    Args:
+        db: MongoDB database instance
+        user_id: User ID from JWT sub claim
+        
+    Returns:
+        Dictionary with totals, monthlySpend, topCategories
+    """
+    result = next(db.transactions.aggregate(_summary_pipeline(user_id)), None) or {}
+    return _summary_from_result(result)
+
+
+def _cached_summary(user_id: str, version: int) -> Optional[Dict[str, Any]]:
+    with _cache_lock:
+        entry = _summary_cache.get(user_id)
+        if entry is not None and entry[0] == version:
+            _summary_cache.move_to_end(user_id)
+            return entry[1]
+    return None
+
+
+def _cache_summary(user_id: str, version: int, summary: Dict[str, Any]) -> None:
+    with _cache_lock:
+        _summary_cache[user_id] = (version, summary)
+        _summary_cache.move_to_end(user_id)
+        while len(_summary_cache) > Config.SUMMARY_CACHE_MAX_ENTRIES:
+            _summary_cache.popitem(last=False)
+
+
+def get_summary(db, user_id: str) -> Dict[str, Any]:
+    """Return the user's summary, recomputing only when their data version changed.
+    
+    Args:
+        db: MongoDB database instance
+        user_id: User ID from JWT sub claim
+        
+    Returns:
+        Dictionary with totals, monthlySpend, topCategories
+    """
+    version = get_data_version(db, user_id)
+    summary = _cached_summary(user_id, version)
+    if summary is None:
+        summary = compute_summary(db, user_id)
+        _cache_summary(user_id, version, summary)
+    return summary
+
+
+async def get_summary_async(db, user_id: str) -> Dict[str, Any]:
+    """get_summary() for a Motor database (shares the in-process cache)."""
+    version = await get_data_version_async(db, user_id)
+    summary = _cached_summary(user_id, version)
+    if summary is None:
+        results = await db.transactions.aggregate(_summary_pipeline(user_id)).to_list(length=1)
+        summary = _summary_from_result(results[0] if results else {})
+        _cache_summary(user_id, version, summary)
+    return summary
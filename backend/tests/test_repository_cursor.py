@@ -0,0 +1,40 @@
+"""Pagination cursor decoding (services.repository.decode_cursor)."""
+import base64
+import json
+
+import pytest
+from bson import ObjectId
+
+from services.repository import InvalidCursorError, decode_cursor, encode_cursor
+
+
+def _cursor(payload) -> str:
+    raw = json.dumps(payload).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def test_round_trip_object_id():
+    _id = ObjectId()
+    assert decode_cursor(encode_cursor({"_id": _id, "date": "2024-05-01"})) == ("2024-05-01", _id)
+
+
+def test_round_trip_string_id():
+    assert decode_cursor(encode_cursor({"_id": "txn-1", "date": "2024-05-01"})) == ("2024-05-01", "txn-1")
+
+
+@pytest.mark.parametrize("payload", [[1, 2], "text", 7, None])
+def test_non_object_payload_is_invalid(payload):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(_cursor(payload))
+
+
+@pytest.mark.parametrize("bad_id", ["not-an-objectid", "abc", 123, None])
+def test_bad_object_id_is_invalid(bad_id):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(_cursor({"d": "2024-05-01", "i": bad_id, "o": True}))
+
+
+@pytest.mark.parametrize("cursor", ["%%%", "bm90IGpzb24", _cursor({"d": "2024-05-01"})])
+def test_malformed_cursor_is_invalid(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
@@ -0,0 +1,57 @@
+"""Standalone background job worker.
+
+Runs the same job pool (and, if enabled, the Plaid refresh scheduler) the
+web process starts, without serving HTTP. Use it to scale ingest throughput
+independently of the API (set JOB_WORKERS=0 on the web processes to leave
+all jobs to dedicated workers).
+
+Usage:
+    python worker.py [--workers N]
+"""
+import argparse
+import logging
+import signal
+import threading
+
+from config import Config
+from db import get_db
+from services.index_manager import ensure_indexes
+from services.job_queue import start_workers, stop_workers
+from services.refresh_scheduler import start_refresh_scheduler, stop_refresh_scheduler
+from services.repository import watch_legacy_key_migration
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run OpenScore background job workers")
+    parser.add_argument("--workers", type=int, default=max(Config.JOB_WORKERS, 1),
+                        help="Worker threads (default: JOB_WORKERS, at least 1)")
+    args = parser.parse_args()
+
+    db = get_db()
+    ensure_indexes(db)
+    watch_legacy_key_migration(db)
+    start_workers(db, args.workers)
+    start_refresh_scheduler(db)
+
+    stopping = threading.Event()
+
+    def handle_signal(signum, frame):
+        logger.info(f"Received signal {signum}, finishing in-flight jobs")
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    stopping.wait()
+    stop_refresh_scheduler()
+    stop_workers()
+    logger.info("Workers stopped")
+
+
+if __name__ == "__main__":
+    main()
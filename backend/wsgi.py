@@ -0,0 +1,12 @@
+"""WSGI entrypoint for production servers.
+
+Usage (from backend/):
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+See gunicorn.conf.py for worker settings. Startup work (index check, job
+workers, refresh scheduler) is run by the gunicorn hooks rather than on
+import, so nothing is started before workers fork.
+"""
+from app import app
+
+__all__ = ["app"]
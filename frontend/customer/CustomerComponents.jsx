@@ -1773,7 +1773,9 @@ const CustomerDashboard = ({ user, onLogout, onNavigateToCreditScore }) => {
     setDataError(null);
 
     try {
-      const result = await apiCall('/api/sandbox/load', 'POST', token);
+      // The load runs as a background job; wait for it before reading the data
+      const job = await apiCall('/api/sandbox/load', 'POST', token);
+      const result = await waitForJob(job.job_id, token);
       console.log('Sandbox data loaded:', result);
 
       // After loading, fetch the actual data
@@ -44,3 +44,20 @@ const apiCall = async (endpoint, method = 'GET', token, body = null) => {
     throw err;
   }
 };
+
+// Poll a background job (sandbox load, Plaid sync) until it finishes.
+// Resolves with the job's result; rejects if the job fails or takes too long.
+const waitForJob = async (jobId, token, { intervalMs = 1000, timeoutMs = 120000 } = {}) => {
+  const deadline = Date.now() + timeoutMs;
+  while (Date.now() < deadline) {
+    const job = await apiCall(`/api/jobs/${jobId}`, 'GET', token);
+    if (job.status === 'succeeded') {
+      return job.result;
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error?.message || 'Background job failed');
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+  throw new Error('Timed out waiting for background job');
+};